@@ -0,0 +1,94 @@
+import argparse
+import multiprocessing
+import os
+import socket
+import threading
+from multiprocessing.managers import BaseManager
+from typing import Tuple
+from services.cluster.shard_worker import ShardWorker
+from services.cluster.transport import Transport, HttpTransport, LoopbackTransport
+
+def logger(*args: object, force=False, action=None, target=None, raw=False) -> None:
+    args_str = " ".join(str(arg) for arg in args) if len(args) > 0 else ""
+    if args_str:
+        print(args_str, flush=True)
+
+class CoordinatorManager(BaseManager):
+    pass
+
+def create_coordinator():
+    from database.connection import Connection
+    from services.bot.bot_manager import BotManager
+    from services.cluster.coordinator import Coordinator
+
+    bot_manager = BotManager(db_connection=Connection(), logger=logger)
+    coordinator = Coordinator(bot_manager=bot_manager)
+    coordinator.prepare()
+    return coordinator
+
+def serve_coordinator(coordinator) -> Tuple[Tuple[str, int], bytes]:
+    # loopback with several processes: one coordinator in this process, the children call it through a proxy
+    authkey = os.urandom(16)
+    CoordinatorManager.register("coordinator", callable=lambda: coordinator)
+    server = CoordinatorManager(address=("127.0.0.1", 0), authkey=authkey).get_server()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.address, authkey
+
+def create_transport(coordinator_url: str | None, loopback: Tuple[Tuple[str, int], bytes] | None = None) -> Transport:
+    if coordinator_url:
+        return HttpTransport(coordinator_url)
+    if loopback:
+        address, authkey = loopback
+        CoordinatorManager.register("coordinator")
+        manager = CoordinatorManager(address=address, authkey=authkey)
+        manager.connect()
+        return LoopbackTransport(manager.coordinator())
+    return LoopbackTransport(create_coordinator())
+
+def run_process(coordinator_url: str | None, threads: int, loopback: Tuple[Tuple[str, int], bytes] | None = None) -> None:
+    transport = create_transport(coordinator_url, loopback)
+    prefix = f"{socket.gethostname()}-{os.getpid()}"
+    workers = [ShardWorker(transport=transport, worker_id=f"{prefix}-{i}", logger=logger) for i in range(threads)]
+    running = [threading.Thread(target=worker.start) for worker in workers]
+    for t in running:
+        t.start()
+    try:
+        for t in running:
+            t.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.stop()
+        for t in running:
+            t.join()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Headless shard worker")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--coordinator", help="coordinator base url, e.g. http://localhost:8000")
+    target.add_argument("--loopback", action="store_true", help="coordinate in this process against the local database")
+    # every leased shard carries its share of the site's RATE_LIMIT, more processes do not raise the total rate
+    parser.add_argument("--processes", type=int, default=1, help="worker processes, they share the configured rate")
+    parser.add_argument("--threads", type=int, default=1, help="shard workers per process")
+    parser.add_argument("--prepare", action="store_true", help="enqueue today's tasks on the coordinator first")
+    args = parser.parse_args()
+
+    if args.prepare and args.coordinator:
+        HttpTransport(args.coordinator).prepare()
+
+    if args.processes <= 1:
+        run_process(args.coordinator, args.threads)
+        return
+
+    # the finishing flush, rollups and archive close run once, in the only coordinator
+    loopback = serve_coordinator(create_coordinator()) if args.loopback else None
+    processes = [
+        multiprocessing.Process(target=run_process, args=(args.coordinator, args.threads, loopback))
+        for _ in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+if __name__ == "__main__":
+    main()
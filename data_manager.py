@@ -1,6 +1,9 @@
 from services.bot.bot_manager import BotManager
 from services.csv_manager import CSVManager
 from services.table_manager import TableManager
+from services.replay_manager import ReplayManager
+from services.export_manager import ExportManager
+from services.schema_manager import SchemaManager
 from services.utils import config, confirm_action
 from database.connection import Connection
 from services.proxy_manager import ProxyManager
@@ -14,6 +17,9 @@ class DataManager:
         self.csv_manager = CSVManager(db_connection=self.db_connection, logger=self.logger)
         self.table_manager = TableManager(db_connection=self.db_connection, logger=self.logger)
         self.proxy_manager = ProxyManager(logger=self.logger)
+        self.replay_manager = ReplayManager(db_connection=self.db_connection, table_manager=self.table_manager, logger=self.logger)
+        self.export_manager = ExportManager(db_connection=self.db_connection, logger=self.logger)
+        self.schema_manager = SchemaManager(db_connection=self.db_connection, logger=self.logger)
 
     def logger(self, *args: object, force=False, action=None, target=None, raw=False) -> None:
         if self.verbose_log or force:
@@ -44,6 +50,12 @@ class DataManager:
         )
         print(f"Geographic data for {country['name']} inserted.")
 
+    def migrate_to_compact(self):
+        self.schema_manager.migrate_to_compact()
+        # columnstore storage waits for the migration, it is provisioned right after it
+        if self.table_manager.partition_manager.enabled:
+            self.table_manager.partition_manager.provision()
+
     def menu(self):        
         menu_items = [
             ('Check Proxy IP', lambda: self.proxy_manager.check_ip()),
@@ -54,6 +66,13 @@ class DataManager:
             ('Import SQL File', lambda: self.table_manager.import_sql_file()),
             ('Create Tables', lambda: self.table_manager.create_tables()),
             ('Transform Bot JSON Data to Tabular', lambda: self.table_manager.tabular_transform()),
+            ('Replay Archived JSON Logs to Tabular', lambda: self.replay_manager.replay_prompt()),
+            ('Export Tabular Data to Parquet', lambda: self.export_manager.export()),
+            ('Rebuild Rollup Tables', lambda: self.table_manager.refresh_rollups(full=True)),
+            ('Learn Price Classes from Archived JSON Logs', lambda: self.bot_manager.scrape_planner.learn()),
+            ('Migrate to Compact Integer Keys', lambda: (
+                self.migrate_to_compact() if confirm_action("Migrate t_value to compact keys? (y/n): ") else print("Canceled.")
+            )),
             ('Drop All Tables', lambda: (
                 self.table_manager.drop_all_tables() if confirm_action("Drop all tables? (y/n): ") else print("Canceled.")
             )),
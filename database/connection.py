@@ -1,14 +1,89 @@
 import os
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text, Engine
 from sqlalchemy.orm import sessionmaker
-from database.models import model_base
-from typing import Generator
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from database.models import model_base, TValueCompact, VALUE_VIEW
+from typing import Any, AsyncGenerator, Dict, Generator, Optional
 from sqlalchemy.orm import Session
-from contextlib import contextmanager
+from contextlib import contextmanager, asynccontextmanager
+from services.utils import config
+import threading
 
 load_dotenv()
 
+# a t_value table is a row mode database from before 'Migrate to Compact Integer Keys', its
+# dimensions have no surrogate keys yet so t_value_compact and the view are left to the migration
+IS_VALUE_TABLE = text("SELECT CASE WHEN OBJECT_ID('t_value', 'U') IS NOT NULL THEN 1 ELSE 0 END;")
+HAS_VALUE_VIEW = text("SELECT CASE WHEN OBJECT_ID('t_value', 'V') IS NOT NULL THEN 1 ELSE 0 END;")
+
+def max_workers() -> int:
+    # DB_POOL_SIZE stays free for routes and managers, more workers would queue for pool_timeout
+    return max(min(config.BOT_MAX_WORKERS, config.DB_MAX_CONNECTIONS - config.DB_POOL_SIZE), 1)
+
+def pool_limits(workers: int) -> Dict[str, int]:
+    # a worker holds one connection at a time: save, transform, ack and planner run one after another
+    pool_size = min(config.DB_POOL_SIZE + workers, config.DB_MAX_CONNECTIONS)
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max(config.DB_MAX_CONNECTIONS - pool_size, 0),
+        "pool_timeout": config.DB_POOL_TIMEOUT
+    }
+
+class EngineRegistry:
+    # one engine (and pool) per database url and process, shared by every Connection
+    def __init__(self):
+        self.engines: Dict[str, Engine] = {}
+        self.async_engines: Dict[str, AsyncEngine] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def engine(self, database_url: str) -> Engine:
+        with self._lock:
+            if database_url not in self.engines:
+                print(f"Using database URL: {database_url}")
+                self.engines[database_url] = create_engine(
+                    database_url,
+                    echo=False,  # log
+                    pool_pre_ping=True,
+                    pool_recycle=300,
+                    fast_executemany=True,
+                    **pool_limits(max_workers())
+                )
+            return self.engines[database_url]
+
+    def async_engine(self, database_url: str) -> AsyncEngine:
+        with self._lock:
+            if database_url not in self.async_engines:
+                self.async_engines[database_url] = create_async_engine(
+                    database_url,
+                    echo=False,
+                    pool_pre_ping=True,
+                    pool_recycle=300,
+                    pool_size=config.DB_ASYNC_POOL_SIZE,
+                    max_overflow=config.DB_ASYNC_MAX_OVERFLOW,
+                    pool_timeout=config.DB_ASYNC_POOL_TIMEOUT,
+                )
+            return self.async_engines[database_url]
+
+    @staticmethod
+    def _pool_status(pool) -> Dict[str, Any]:
+        return {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "status": pool.status()
+        }
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sync": [self._pool_status(engine.pool) for engine in self.engines.values()],
+                "async": [self._pool_status(engine.pool) for engine in self.async_engines.values()]
+            }
+
+engine_registry: EngineRegistry = EngineRegistry()
+
 class Connection:
     def __init__(
         self,
@@ -29,22 +104,37 @@ class Connection:
             self.db_password = db_password or os.getenv("DB_PASSWORD")
 
             self.database_url = f"mssql+pyodbc://{self.db_username}:{self.db_password}@{self.db_hostname}:{self.db_port}/{self.db_database}?driver=ODBC+Driver+18+for+SQL+Server&TrustServerCertificate=yes"
-        
-        print(f"Using database URL: {self.database_url}")
-
-        self.engine = create_engine(
-            self.database_url,
-            echo=False,  # log
-            pool_pre_ping=True,
-            pool_recycle=300,
-        )
+
+        self.engine: Engine = engine_registry.engine(self.database_url)
 
         self.SessionLocal = sessionmaker(
             autocommit=False, autoflush=False, bind=self.engine
         )
 
+        # created on first use, the CLI never needs the async driver
+        self._async_engine: Optional[AsyncEngine] = None
+        self._AsyncSessionLocal: Optional[async_sessionmaker] = None
+
+    @property
+    def async_database_url(self) -> str:
+        return self.database_url.replace("mssql+pyodbc://", "mssql+aioodbc://", 1)
+
+    @property
+    def async_engine(self) -> AsyncEngine:
+        if self._async_engine is None:
+            self._async_engine = engine_registry.async_engine(self.async_database_url)
+            self._AsyncSessionLocal = async_sessionmaker(
+                bind=self._async_engine, autoflush=False, expire_on_commit=False
+            )
+        return self._async_engine
+
     def create_tables(self) -> None:
-        model_base.metadata.create_all(bind=self.engine)
+        with self.engine.begin() as connection:
+            row_mode = bool(connection.execute(IS_VALUE_TABLE).scalar())
+            tables = [table for table in model_base.metadata.sorted_tables if not (row_mode and table is TValueCompact.__table__)]
+            model_base.metadata.create_all(bind=connection, tables=tables)
+            if not row_mode and not connection.execute(HAS_VALUE_VIEW).scalar():
+                connection.execute(text(VALUE_VIEW))
 
     def open_session(self) -> Session:
         return self.SessionLocal()
@@ -57,9 +147,45 @@ class Connection:
         finally:
             session.close()
 
+    @contextmanager
+    def checkout(self) -> Generator[Session, None, None]:
+        # short unit of work: commit on success, rollback on error, connection back to the pool right after
+        session = self.open_session()
+        try:
+            yield session
+            if session.in_transaction():
+                session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
     def get_session_fastapi(self) -> Generator[Session, None, None]:
         session = self.open_session()
         try:
             yield session
         finally:
-            session.close()
\ No newline at end of file
+            session.close()
+
+    def open_async_session(self) -> AsyncSession:
+        self.async_engine
+        return self._AsyncSessionLocal()
+
+    @asynccontextmanager
+    async def get_async_session(self) -> AsyncGenerator[AsyncSession, None]:
+        session = self.open_async_session()
+        try:
+            yield session
+        finally:
+            await session.close()
+
+    async def get_async_session_fastapi(self) -> AsyncGenerator[AsyncSession, None]:
+        session = self.open_async_session()
+        try:
+            yield session
+        finally:
+            await session.close()
+
+    def pool_status(self) -> Dict[str, Any]:
+        return engine_registry.status()
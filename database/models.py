@@ -1,9 +1,21 @@
-from sqlalchemy import Column, String, Text, ForeignKey, Date, Integer, Numeric, DECIMAL, PrimaryKeyConstraint
+from sqlalchemy import Column, String, Text, ForeignKey, Date, DateTime, Integer, SmallInteger, BigInteger, Numeric, DECIMAL, PrimaryKeyConstraint, Index, Computed, Identity
+from sqlalchemy.dialects.mssql import TINYINT
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
 model_base = declarative_base()
 
+# the md5 ids every reader joins on, resolved from the integer keys
+VALUE_VIEW = """
+    CREATE VIEW t_value AS
+    SELECT t_postal_area.pa_id, t_date.d_id, t_hour.h_id, t_component.co_id, t_value_compact.v_value
+    FROM t_value_compact
+    JOIN t_date ON t_date.d_key = t_value_compact.d_key
+    JOIN t_postal_area ON t_postal_area.pa_key = t_value_compact.pa_key
+    JOIN t_hour ON t_hour.h_key = t_value_compact.h_key
+    JOIN t_component ON t_component.co_key = t_value_compact.co_key;
+"""
+
 class TCountry(model_base):
     __tablename__ = 't_country'
 
@@ -46,9 +58,25 @@ class TPostalArea(model_base):
     pa_data = Column(Text)  # JSON or any structured text
     pa_status_code = Column(Integer)
     ci_id = Column(String(32), ForeignKey('t_city.ci_id'), nullable=False)
+    pl_id = Column(String(32), ForeignKey('t_payload.pl_id'))
+    pa_key = Column(Integer, Identity(start=1, increment=1), nullable=False)
+
+    __table_args__ = (
+        Index('ux_t_postal_area_pa_key', 'pa_key', unique=True),
+    )
 
     city = relationship("TCity", back_populates="postal_areas")
-    values = relationship("TValue", back_populates="postal_area")
+    payload = relationship("TPayload", back_populates="postal_areas")
+    values = relationship("TValueCompact", back_populates="postal_area")
+
+
+class TPayload(model_base):
+    __tablename__ = 't_payload'
+
+    pl_id = Column(String(32), primary_key=True)  # md5 of the canonical JSON
+    pl_data = Column(Text, nullable=False)
+
+    postal_areas = relationship("TPostalArea", back_populates="payload")
 
 
 class TDate(model_base):
@@ -56,8 +84,13 @@ class TDate(model_base):
 
     d_id = Column(String(32), primary_key=True)
     d_date = Column(Date, nullable=False, unique=True)
+    d_key = Column(Integer, Computed("YEAR(d_date) * 10000 + MONTH(d_date) * 100 + DAY(d_date)", persisted=True))  # 20261017
 
-    values = relationship("TValue", back_populates="date")
+    __table_args__ = (
+        Index('ux_t_date_d_key', 'd_key', unique=True),
+    )
+
+    values = relationship("TValueCompact", back_populates="date")
 
 
 class THour(model_base):
@@ -65,8 +98,13 @@ class THour(model_base):
 
     h_id = Column(String(32), primary_key=True)
     h_hour = Column(Integer, nullable=False)
+    h_key = Column(TINYINT, Computed("CONVERT(TINYINT, h_hour)", persisted=True))
+
+    __table_args__ = (
+        Index('ux_t_hour_h_key', 'h_key', unique=True),
+    )
 
-    values = relationship("TValue", back_populates="hour")
+    values = relationship("TValueCompact", back_populates="hour")
 
 
 class TComponent(model_base):
@@ -74,24 +112,130 @@ class TComponent(model_base):
 
     co_id = Column(String(32), primary_key=True)
     co_name = Column(String(255), nullable=False, unique=True)
+    co_key = Column(SmallInteger, Identity(start=1, increment=1), nullable=False)
 
-    values = relationship("TValue", back_populates="component")
+    __table_args__ = (
+        Index('ux_t_component_co_key', 'co_key', unique=True),
+    )
 
+    values = relationship("TValueCompact", back_populates="component")
 
-class TValue(model_base):
-    __tablename__ = 't_value'
 
-    pa_id = Column(String(32), ForeignKey('t_postal_area.pa_id'), primary_key=True)
-    d_id = Column(String(32), ForeignKey('t_date.d_id'), primary_key=True)
-    h_id = Column(String(32), ForeignKey('t_hour.h_id'), primary_key=True)
-    co_id = Column(String(32), ForeignKey('t_component.co_id'), primary_key=True)
+# t_value is a read only view over this table (VALUE_VIEW), facts are only written here
+class TValueCompact(model_base):
+    __tablename__ = 't_value_compact'
+
+    d_key = Column(Integer, ForeignKey('t_date.d_key'), primary_key=True)
+    pa_key = Column(Integer, ForeignKey('t_postal_area.pa_key'), primary_key=True)
+    h_key = Column(TINYINT, ForeignKey('t_hour.h_key'), primary_key=True)
+    co_key = Column(SmallInteger, ForeignKey('t_component.co_key'), primary_key=True)
     v_value = Column(DECIMAL(10, 8))
 
     __table_args__ = (
-        PrimaryKeyConstraint('pa_id', 'd_id', 'h_id', 'co_id', name='pk_t_value'),
+        PrimaryKeyConstraint('d_key', 'pa_key', 'h_key', 'co_key', name='pk_t_value_compact'),
     )
 
     postal_area = relationship("TPostalArea", back_populates="values")
     date = relationship("TDate", back_populates="values")
     hour = relationship("THour", back_populates="values")
-    component = relationship("TComponent", back_populates="values")
\ No newline at end of file
+    component = relationship("TComponent", back_populates="values")
+
+
+class TTaskQueue(model_base):
+    __tablename__ = 't_task_queue'
+
+    pa_id = Column(String(32), ForeignKey('t_postal_area.pa_id'), primary_key=True)
+    tq_date = Column(Date, primary_key=True)
+    tq_country = Column(String(255), nullable=False)
+    tq_status = Column(Integer, nullable=False, default=0)  # 0 pending, 1 leased, 2 done, 3 dead, 4 planned
+    tq_attempts = Column(Integer, nullable=False, default=0)
+    tq_lease_until = Column(DateTime)  # lease expiry or earliest next claim
+
+    __table_args__ = (
+        PrimaryKeyConstraint('pa_id', 'tq_date', name='pk_t_task_queue'),
+        Index('ix_t_task_queue_claim', 'tq_country', 'tq_date', 'tq_status', 'tq_lease_until'),
+    )
+
+    postal_area = relationship("TPostalArea")
+
+
+class TPriceClass(model_base):
+    __tablename__ = 't_price_class'
+
+    pa_id = Column(String(32), ForeignKey('t_postal_area.pa_id'), primary_key=True)
+    pc_signature = Column(String(32), nullable=False)  # md5 of the whole payload (power price included) the class was last seen with
+    pc_updated = Column(Date, nullable=False)
+
+    __table_args__ = (
+        PrimaryKeyConstraint('pa_id', name='pk_t_price_class'),
+        Index('ix_t_price_class_signature', 'pc_signature'),
+    )
+
+    postal_area = relationship("TPostalArea")
+
+
+class TDeadLetter(model_base):
+    __tablename__ = 't_dead_letter'
+
+    pa_id = Column(String(32), ForeignKey('t_postal_area.pa_id'), primary_key=True)
+    dl_date = Column(Date, primary_key=True)
+    dl_error = Column(String(255))
+    dl_status_code = Column(Integer)
+    dl_attempts = Column(Integer, nullable=False, default=0)
+    dl_last_attempt = Column(DateTime)
+
+    __table_args__ = (
+        PrimaryKeyConstraint('pa_id', 'dl_date', name='pk_t_dead_letter'),
+    )
+
+    postal_area = relationship("TPostalArea")
+
+
+class TDataVersion(model_base):
+    __tablename__ = 't_data_version'
+
+    dv_id = Column(Integer, primary_key=True)  # single row, 1
+    dv_version = Column(BigInteger, nullable=False, default=0)
+
+
+class TRollupHour(model_base):
+    __tablename__ = 't_rollup_hour'
+
+    rh_level = Column(String(16), primary_key=True)  # country, province, city
+    rh_geo_id = Column(String(32), primary_key=True)  # c_id, p_id or ci_id
+    co_id = Column(String(32), ForeignKey('t_component.co_id'), primary_key=True)
+    d_id = Column(String(32), ForeignKey('t_date.d_id'), primary_key=True)
+    h_id = Column(String(32), ForeignKey('t_hour.h_id'), primary_key=True)
+    rh_min = Column(DECIMAL(10, 8))
+    rh_avg = Column(DECIMAL(10, 8))
+    rh_max = Column(DECIMAL(10, 8))
+    rh_p25 = Column(DECIMAL(10, 8))
+    rh_p50 = Column(DECIMAL(10, 8))
+    rh_p75 = Column(DECIMAL(10, 8))
+    rh_count = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        PrimaryKeyConstraint('rh_level', 'rh_geo_id', 'co_id', 'd_id', 'h_id', name='pk_t_rollup_hour'),
+        Index('ix_t_rollup_hour_date', 'd_id'),
+    )
+
+
+class TRollupDay(model_base):
+    __tablename__ = 't_rollup_day'
+
+    rd_level = Column(String(16), primary_key=True)
+    rd_geo_id = Column(String(32), primary_key=True)
+    co_id = Column(String(32), ForeignKey('t_component.co_id'), primary_key=True)
+    d_id = Column(String(32), ForeignKey('t_date.d_id'), primary_key=True)
+    rd_min = Column(DECIMAL(10, 8))
+    rd_avg = Column(DECIMAL(10, 8))
+    rd_max = Column(DECIMAL(10, 8))
+    rd_p25 = Column(DECIMAL(10, 8))
+    rd_p50 = Column(DECIMAL(10, 8))
+    rd_p75 = Column(DECIMAL(10, 8))
+    rd_count = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        PrimaryKeyConstraint('rd_level', 'rd_geo_id', 'co_id', 'd_id', name='pk_t_rollup_day'),
+        Index('ix_t_rollup_day_date', 'd_id'),
+    )
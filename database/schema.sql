@@ -19,6 +19,11 @@ CREATE TABLE t_city (
     FOREIGN KEY (p_id) REFERENCES t_province(p_id)
 );
 
+CREATE TABLE t_payload (
+    pl_id VARCHAR(32) PRIMARY KEY,
+    pl_data NVARCHAR(MAX) NOT NULL
+);
+
 CREATE TABLE t_postal_area (
     pa_id VARCHAR(32) PRIMARY KEY,
     pa_name VARCHAR(255),
@@ -26,33 +31,146 @@ CREATE TABLE t_postal_area (
     pa_data NVARCHAR(MAX),
     pa_status_code INTEGER,
     ci_id VARCHAR(32) NOT NULL,
-    FOREIGN KEY (ci_id) REFERENCES t_city(ci_id)
+    pl_id VARCHAR(32),
+    pa_key INT IDENTITY(1,1) NOT NULL,
+    FOREIGN KEY (ci_id) REFERENCES t_city(ci_id),
+    FOREIGN KEY (pl_id) REFERENCES t_payload(pl_id)
 );
 
+CREATE UNIQUE INDEX ux_t_postal_area_pa_key ON t_postal_area (pa_key);
+
 CREATE TABLE t_date (
     d_id VARCHAR(32) PRIMARY KEY,
-    d_date DATE NOT NULL UNIQUE
+    d_date DATE NOT NULL UNIQUE,
+    d_key AS (YEAR(d_date) * 10000 + MONTH(d_date) * 100 + DAY(d_date)) PERSISTED
 );
 
+CREATE UNIQUE INDEX ux_t_date_d_key ON t_date (d_key);
+
 CREATE TABLE t_hour (
     h_id VARCHAR(32) PRIMARY KEY,
-    h_hour INTEGER NOT NULL
+    h_hour INTEGER NOT NULL,
+    h_key AS CONVERT(TINYINT, h_hour) PERSISTED
 );
 
+CREATE UNIQUE INDEX ux_t_hour_h_key ON t_hour (h_key);
+
 CREATE TABLE t_component (
     co_id VARCHAR(32) PRIMARY KEY,
-    co_name VARCHAR(255) NOT NULL UNIQUE
+    co_name VARCHAR(255) NOT NULL UNIQUE,
+    co_key SMALLINT IDENTITY(1,1) NOT NULL
+);
+
+CREATE UNIQUE INDEX ux_t_component_co_key ON t_component (co_key);
+
+-- facts are keyed by the integer surrogates, the md5 ids stay the dimension keys used by imports
+CREATE TABLE t_value_compact (
+    d_key INT NOT NULL,
+    pa_key INT NOT NULL,
+    h_key TINYINT NOT NULL,
+    co_key SMALLINT NOT NULL,
+    v_value DECIMAL(10,8),
+    CONSTRAINT pk_t_value_compact PRIMARY KEY (d_key, pa_key, h_key, co_key),
+    FOREIGN KEY (d_key) REFERENCES t_date(d_key),
+    FOREIGN KEY (pa_key) REFERENCES t_postal_area(pa_key),
+    FOREIGN KEY (h_key) REFERENCES t_hour(h_key),
+    FOREIGN KEY (co_key) REFERENCES t_component(co_key)
 );
 
-CREATE TABLE t_value (
+-- read only, exposes the md5 ids to every reader
+CREATE VIEW t_value AS
+SELECT t_postal_area.pa_id, t_date.d_id, t_hour.h_id, t_component.co_id, t_value_compact.v_value
+FROM t_value_compact
+JOIN t_date ON t_date.d_key = t_value_compact.d_key
+JOIN t_postal_area ON t_postal_area.pa_key = t_value_compact.pa_key
+JOIN t_hour ON t_hour.h_key = t_value_compact.h_key
+JOIN t_component ON t_component.co_key = t_value_compact.co_key;
+
+CREATE TABLE t_task_queue (
+    pa_id VARCHAR(32),
+    tq_date DATE,
+    tq_country VARCHAR(255) NOT NULL,
+    tq_status INTEGER NOT NULL DEFAULT 0,
+    tq_attempts INTEGER NOT NULL DEFAULT 0,
+    tq_lease_until DATETIME,
+    CONSTRAINT pk_t_task_queue PRIMARY KEY (pa_id, tq_date),
+    FOREIGN KEY (pa_id) REFERENCES t_postal_area(pa_id)
+);
+
+CREATE INDEX ix_t_task_queue_claim ON t_task_queue (tq_country, tq_date, tq_status, tq_lease_until);
+
+CREATE TABLE t_price_class (
     pa_id VARCHAR(32),
+    pc_signature VARCHAR(32) NOT NULL,
+    pc_updated DATE NOT NULL,
+    CONSTRAINT pk_t_price_class PRIMARY KEY (pa_id),
+    FOREIGN KEY (pa_id) REFERENCES t_postal_area(pa_id)
+);
+
+CREATE INDEX ix_t_price_class_signature ON t_price_class (pc_signature);
+
+CREATE TABLE t_dead_letter (
+    pa_id VARCHAR(32),
+    dl_date DATE,
+    dl_error VARCHAR(255),
+    dl_status_code INTEGER,
+    dl_attempts INTEGER NOT NULL DEFAULT 0,
+    dl_last_attempt DATETIME,
+    CONSTRAINT pk_t_dead_letter PRIMARY KEY (pa_id, dl_date),
+    FOREIGN KEY (pa_id) REFERENCES t_postal_area(pa_id)
+);
+
+-- last write marker, bumped by every process that changes the data so API caches can tell
+CREATE TABLE t_data_version (
+    dv_id INTEGER PRIMARY KEY,
+    dv_version BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE t_rollup_hour (
+    rh_level VARCHAR(16),
+    rh_geo_id VARCHAR(32),
+    co_id VARCHAR(32),
     d_id VARCHAR(32),
     h_id VARCHAR(32),
-    co_id VARCHAR(32),
-    v_value DECIMAL(10,8),
-    CONSTRAINT pk_t_price PRIMARY KEY (pa_id, d_id, h_id, co_id),
-    FOREIGN KEY (pa_id) REFERENCES t_postal_area(pa_id),
+    rh_min DECIMAL(10,8),
+    rh_avg DECIMAL(10,8),
+    rh_max DECIMAL(10,8),
+    rh_p25 DECIMAL(10,8),
+    rh_p50 DECIMAL(10,8),
+    rh_p75 DECIMAL(10,8),
+    rh_count INTEGER NOT NULL,
+    CONSTRAINT pk_t_rollup_hour PRIMARY KEY (rh_level, rh_geo_id, co_id, d_id, h_id),
+    FOREIGN KEY (co_id) REFERENCES t_component(co_id),
     FOREIGN KEY (d_id) REFERENCES t_date(d_id),
-    FOREIGN KEY (h_id) REFERENCES t_hour(h_id),
-    FOREIGN KEY (co_id) REFERENCES t_component(co_id)
-);
\ No newline at end of file
+    FOREIGN KEY (h_id) REFERENCES t_hour(h_id)
+);
+
+CREATE INDEX ix_t_rollup_hour_date ON t_rollup_hour (d_id);
+
+CREATE TABLE t_rollup_day (
+    rd_level VARCHAR(16),
+    rd_geo_id VARCHAR(32),
+    co_id VARCHAR(32),
+    d_id VARCHAR(32),
+    rd_min DECIMAL(10,8),
+    rd_avg DECIMAL(10,8),
+    rd_max DECIMAL(10,8),
+    rd_p25 DECIMAL(10,8),
+    rd_p50 DECIMAL(10,8),
+    rd_p75 DECIMAL(10,8),
+    rd_count INTEGER NOT NULL,
+    CONSTRAINT pk_t_rollup_day PRIMARY KEY (rd_level, rd_geo_id, co_id, d_id),
+    FOREIGN KEY (co_id) REFERENCES t_component(co_id),
+    FOREIGN KEY (d_id) REFERENCES t_date(d_id)
+);
+
+CREATE INDEX ix_t_rollup_day_date ON t_rollup_day (d_id);
+
+-- columnstore storage ("FACT_STORAGE": "columnstore") has one partition boundary per day, it is provisioned
+-- by Create Tables or 'Migrate to Compact Integer Keys' rather than this script:
+-- CREATE PARTITION FUNCTION pf_t_value_date (INT) AS RANGE RIGHT FOR VALUES (<one d_key per day>);
+-- CREATE PARTITION SCHEME ps_t_value_date AS PARTITION pf_t_value_date ALL TO ([PRIMARY]);
+-- CREATE CLUSTERED COLUMNSTORE INDEX cci_t_value_compact ON t_value_compact ON ps_t_value_date (d_key);
+-- ALTER TABLE t_value_compact ADD CONSTRAINT pk_t_value_compact
+--     PRIMARY KEY NONCLUSTERED (d_key, pa_key, h_key, co_key) ON ps_t_value_date (d_key);
+-- t_value_archive mirrors t_value_compact, days older than PARTITION_RETENTION_DAYS are switched into it
@@ -13,7 +13,10 @@ new Vue({
         outputVerboseLog: null,
         outputSaveJsonDb: null,
         outputSaveJsonFile: null,
+        outputFetchAsync: null,
         outputNumTasks: [],
+        outputRateLimits: [],
+        outputTaskStats: {},
         isScrolledToBottom: true,
         inputResetSession: false
     },
@@ -127,6 +130,14 @@ new Vue({
                 }));
             }
         },
+        setFetchAsync() {
+            if (this.ws) {
+                this.ws.send(JSON.stringify({
+                    action: "set_fetch_async",
+                    data: null
+                }));
+            }
+        },
         impotGeos() {
             if (this.ws) {
                 this.ws.send(JSON.stringify({
@@ -163,6 +174,17 @@ new Vue({
         handleSaveJsonFile(data) {
             this.outputSaveJsonFile = data;
         },
+        handleFetchAsync(data) {
+            this.outputFetchAsync = data;
+        },
+        handleTaskStats(data) {
+            if (data === undefined || data === null) return;
+            this.$set(this.outputTaskStats, data.id, data);
+        },
+        handleRateLimits(data) {
+            if (!Array.isArray(data)) return;
+            this.outputRateLimits = data;
+        },
         handleNumTask(data) {
             if (data === undefined || data === null) return;
 
@@ -199,7 +221,10 @@ new Vue({
             get_verbose_log: this.handleVerboseLog,
             get_save_json_db: this.handleSaveJsonDb,
             get_save_json_file: this.handleSaveJsonFile,
-            get_num_task: this.handleNumTask
+            get_fetch_async: this.handleFetchAsync,
+            get_num_task: this.handleNumTask,
+            get_rate_limits: this.handleRateLimits,
+            get_task_stats: this.handleTaskStats
         };
 
         this.ws.onmessage = (event) => {
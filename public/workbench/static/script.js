@@ -5,6 +5,10 @@ new Vue({
         schema: null,
         sqlQuery: '',
         queryResult: null,
+        queryColumns: [],
+        nextCursor: null,
+        streamedQuery: '',
+        fetchingMore: false,
         displayedResults: null,
         queryError: null,
         loadingSchema: false,
@@ -133,42 +137,97 @@ ORDER BY t_postal_area.pa_code, t_date.d_date, t_hour.h_hour;` },
             if (!this.sqlQuery.trim() || this.executing) return;
             
             this.executing = true;
-            this.queryResult = null;
-            this.displayedResults = null;
+            this.queryResult = [];
+            this.displayedResults = [];
+            this.queryColumns = [];
+            this.nextCursor = null;
+            this.streamedQuery = this.sqlQuery;
             this.queryError = null;
             this.currentPage = 1;
             
             try {
-                const response = await fetch('/api/workbench/query', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json',
-                    },
-                    body: JSON.stringify({
-                        query: this.sqlQuery
-                    })
-                });
-                
-                const data = await response.json();
-                
-                if (!response.ok) {
-                    throw new Error(data.detail || 'Query execution failed');
-                }
-                
-                this.queryResult = data.data;
-                this.loadInitialData();
+                await this.streamQuery(null);
             } catch (error) {
                 console.error('Error executing query:', error);
+                this.queryResult = null;
+                this.displayedResults = null;
                 this.queryError = error.message;
             } finally {
                 this.executing = false;
             }
         },
-        loadInitialData() {
-            if (this.queryResult && this.queryResult.length > 0) {
+        async fetchNextPage() {
+            if (!this.nextCursor || this.fetchingMore) return;
+
+            this.fetchingMore = true;
+            try {
+                await this.streamQuery(this.nextCursor);
+            } catch (error) {
+                console.error('Error fetching next page:', error);
+                this.queryError = error.message;
+            } finally {
+                this.fetchingMore = false;
+            }
+        },
+        async streamQuery(cursor) {
+            const response = await fetch('/api/workbench/stream', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({
+                    query: this.streamedQuery,
+                    cursor: cursor
+                })
+            });
+
+            if (!response.ok) {
+                const data = await response.json();
+                throw new Error(data.detail || 'Query execution failed');
+            }
+
+            // NDJSON: one message per line, rows are rendered as soon as their chunk arrives
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
+                lines.forEach(line => line && this.handleStreamMessage(JSON.parse(line)));
+            }
+            if (buffer) {
+                this.handleStreamMessage(JSON.parse(buffer));
+            }
+        },
+        handleStreamMessage(message) {
+            switch (message.type) {
+                case 'columns':
+                    this.queryColumns = message.columns;
+                    break;
+                case 'rows':
+                    this.appendRows(message.rows);
+                    break;
+                case 'end':
+                    this.nextCursor = message.next;
+                    break;
+                case 'error':
+                    throw new Error(message.detail);
+            }
+        },
+        appendRows(rows) {
+            const columns = this.queryColumns;
+            // frozen rows are not made reactive by Vue, large results stay cheap
+            const objects = rows.map(row => {
+                const obj = {};
+                columns.forEach((column, i) => { obj[column] = row[i]; });
+                return Object.freeze(obj);
+            });
+            this.queryResult.push(...objects);
+            if (this.displayedResults.length < this.rowsPerPage) {
                 this.displayedResults = this.queryResult.slice(0, this.rowsPerPage);
-            } else {
-                this.displayedResults = this.queryResult;
             }
         },
         loadMoreData() {
@@ -183,6 +242,8 @@ ORDER BY t_postal_area.pa_code, t_date.d_date, t_hour.h_hour;` },
         clearQuery() {
             this.sqlQuery = '';
             this.queryResult = null;
+            this.queryColumns = [];
+            this.nextCursor = null;
             this.displayedResults = null;
             this.queryError = null;
             this.currentPage = 1;
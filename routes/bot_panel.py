@@ -11,6 +11,8 @@ from services.utils import config
 class BotPanelAPI:
     def __init__(self):
         self.router = APIRouter(prefix="/api/bot_panel", tags=["Bot Panel"])
+        self.router.add_api_route("/pool", self.pool, methods=["GET"])
+        self.router.add_api_route("/planner", self.planner, methods=["GET"])
         self.db_connection: Connection = Connection(db_hostname="mssql")
         self.user_connections = []
         self.timer = 0
@@ -58,6 +60,7 @@ class BotPanelAPI:
         async def background_job():
             while True:
                 await self._send_message({"action": "get_timer", "data": self.timer})
+                self.bot_manager.rate_limit_info()
                 if not self.pause_timer:
                     if self.timer > 0:
                         self.timer -= 1
@@ -73,7 +76,7 @@ class BotPanelAPI:
 
     def run_scheduler(self, new_session=False):
         def run():
-            if self.bot_manager.worker_manager_list:
+            if self.bot_manager.has_workers():
                 if not self.bot_manager.in_process and new_session:
                     self.bot_manager.clear_bot_data_session()
                 self.bot_manager.task_manager_init()
@@ -121,6 +124,7 @@ class BotPanelAPI:
             "set_tasks": self._set_tasks,
             "set_save_json_db": self._set_save_json_db,
             "set_save_json_file": self._set_save_json_file,
+            "set_fetch_async": self._set_fetch_async,
             "import_geos_from_csv": self._import_geos_from_csv
         }
 
@@ -129,12 +133,14 @@ class BotPanelAPI:
         try:
             self.bot_manager.get_set_process(target=websocket)
             self._get_num_tasks(target_ws=websocket)
+            self.bot_manager.rate_limit_info(target=websocket)
             await self._get_num_workers(target_ws=websocket)
             await self._get_scheduler_interval(target_ws=websocket)
             await self._get_pause_timer(target_ws=websocket)
             await self._get_verbose_log(target_ws=websocket)
             await self._get_save_json_db(target_ws=websocket)
             await self._get_save_json_file(target_ws=websocket)
+            await self._get_fetch_async(target_ws=websocket)
             while True:
                 message = await websocket.receive_json()
                 handler = action_map.get(message.get("action"))
@@ -192,11 +198,12 @@ class BotPanelAPI:
             self.run_scheduler(new_session=data)
             #threading.Thread(target=self.bot_manager.run_workers).start()
         else:
-            self.bot_manager.stop_workers()
+            # releasing leased tasks hits the database, keep it off the event loop
+            await asyncio.to_thread(self.bot_manager.stop_workers)
 
-    def _set_tasks(self, data=None):
+    async def _set_tasks(self, data=None):
         try:
-            self.bot_manager.task_manager_init()
+            await asyncio.to_thread(self.bot_manager.task_manager_init)
         except Exception as e:
             self.logger(f"Error: {e}", force=True)
 
@@ -212,6 +219,15 @@ class BotPanelAPI:
         message = f"JSON file saving enabled | Dir Path: {config.JSON_LOG_DIR}" if self.bot_manager.save_json_file else "JSON file saving disabled"
         self.logger(message, force=True)
 
+    async def _set_fetch_async(self, data=None):
+        if not self.bot_manager.in_process:
+            self.bot_manager.fetch_async = not self.bot_manager.fetch_async
+            message = "Async fetch enabled" if self.bot_manager.fetch_async else "Async fetch disabled"
+        else:
+            message = "Failed to switch fetch mode! Stop the process first."
+        await self._get_fetch_async()
+        self.logger(message, force=True)
+
     def _import_geos_from_csv(self, data=None):
         def import_geos():
             threads = []
@@ -244,6 +260,12 @@ class BotPanelAPI:
 
     #################################################
 
+    async def pool(self):
+        return {"data": self.db_connection.pool_status()}
+
+    async def planner(self):
+        return {"data": self.bot_manager.scrape_planner.report()}
+
     async def _get_num_workers(self, target_ws=None):
         message = {"action": "get_num_workers", "data": len(self.bot_manager.worker_manager_list)}
         await self._send_message(message, target_ws=target_ws)
@@ -268,6 +290,10 @@ class BotPanelAPI:
         message = {"action": "get_save_json_file", "data": self.bot_manager.save_json_file}
         await self._send_message(message, target_ws=target_ws)
     
+    async def _get_fetch_async(self, target_ws=None):
+        message = {"action": "get_fetch_async", "data": self.bot_manager.fetch_async}
+        await self._send_message(message, target_ws=target_ws)
+
     def _get_num_tasks(self, target_ws=None):
         for task_manager in self.bot_manager.task_manager_list:
             task_manager.info(target=target_ws)
\ No newline at end of file
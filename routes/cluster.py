@@ -0,0 +1,60 @@
+from fastapi import APIRouter, Header, HTTPException
+from pydantic import BaseModel
+from services.bot.interfaces import IBotManager
+from services.cluster.coordinator import Coordinator
+from services.utils import config
+from typing import Any, Dict, List, Optional
+import asyncio
+import hmac
+
+class LeaseRequest(BaseModel):
+    worker_id: str
+
+class RateRequest(BaseModel):
+    shard_id: str
+
+class SubmitRequest(BaseModel):
+    shard_id: str
+    results: List[Dict[str, Any]]
+
+class ClusterAPI:
+    def __init__(self, bot_manager: IBotManager):
+        self.router = APIRouter(prefix="/api/cluster", tags=["Cluster"])
+        self.router.add_api_route("/prepare", self.prepare, methods=["POST"])
+        self.router.add_api_route("/lease", self.lease, methods=["POST"])
+        self.router.add_api_route("/submit", self.submit, methods=["POST"])
+        self.router.add_api_route("/rate", self.rate, methods=["POST"])
+        self.router.add_api_route("/status", self.status, methods=["GET"])
+        self.coordinator: Coordinator = Coordinator(bot_manager=bot_manager)
+        self.token: str = config.CLUSTER_TOKEN
+
+    def _authorize(self, token: Optional[str]) -> None:
+        # without a configured CLUSTER_TOKEN the cluster endpoints stay closed
+        if not self.token:
+            raise HTTPException(status_code=403, detail="Cluster mode is disabled, set CLUSTER_TOKEN")
+        if token is None or not hmac.compare_digest(token.encode("utf-8"), self.token.encode("utf-8")):
+            raise HTTPException(status_code=403, detail="Invalid cluster token")
+
+    # coordinator calls hit the database, they run in a thread to keep the event loop free
+    async def prepare(self, x_cluster_token: Optional[str] = Header(default=None)):
+        self._authorize(x_cluster_token)
+        await asyncio.to_thread(self.coordinator.prepare)
+        return {"data": await asyncio.to_thread(self.coordinator.status)}
+
+    async def lease(self, body: LeaseRequest, x_cluster_token: Optional[str] = Header(default=None)):
+        self._authorize(x_cluster_token)
+        return {"shard": await asyncio.to_thread(self.coordinator.lease, body.worker_id)}
+
+    async def submit(self, body: SubmitRequest, x_cluster_token: Optional[str] = Header(default=None)):
+        self._authorize(x_cluster_token)
+        return await asyncio.to_thread(self.coordinator.submit, body.shard_id, body.results)
+
+    async def rate(self, body: RateRequest, x_cluster_token: Optional[str] = Header(default=None)):
+        self._authorize(x_cluster_token)
+        return {"rate": await asyncio.to_thread(self.coordinator.rate, body.shard_id)}
+
+    async def status(self, x_cluster_token: Optional[str] = Header(default=None)):
+        self._authorize(x_cluster_token)
+        data = await asyncio.to_thread(self.coordinator.status)
+        data["done"] = await asyncio.to_thread(self.coordinator.is_done)
+        return data
@@ -0,0 +1,205 @@
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.connection import Connection
+from services.tabular.rollup import ROLLUP_QUERIES
+from services.schema_manager import fact_queries, schema_mode
+from services.result_cache import price_cache, data_generation, READ_VERSION
+from services.utils import config
+import services.utils
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Annotated, Any, Dict, List, Literal, Optional, Sequence, Tuple
+import pyarrow as pa
+
+db_connection = Connection(db_hostname="mssql")
+
+LATEST_DATE = text("SELECT MAX(d_date) FROM t_date;")
+
+# a postal code can span several postal areas, values are averaged over them
+HOURLY_PRICES = fact_queries("""
+    SELECT t_hour.h_hour AS hour, SUM(v.v_value) / COUNT(DISTINCT v.{pa_key}) AS price
+    FROM {facts} v
+    JOIN t_postal_area ON t_postal_area.{pa_key} = v.{pa_key}
+    JOIN t_city ON t_city.ci_id = t_postal_area.ci_id
+    JOIN t_province ON t_province.p_id = t_city.p_id
+    JOIN t_country ON t_country.c_id = t_province.c_id
+    JOIN t_date ON t_date.{d_key} = v.{d_key}
+    JOIN t_hour ON t_hour.{h_key} = v.{h_key}
+    WHERE t_country.c_name = :country AND t_postal_area.pa_code = :postal_code AND t_date.d_date = :d_date
+    GROUP BY t_hour.h_hour
+    ORDER BY t_hour.h_hour;
+""")
+
+COMPONENT_PRICES = fact_queries("""
+    SELECT t_hour.h_hour AS hour, t_component.co_name AS component, AVG(v.v_value) AS price
+    FROM {facts} v
+    JOIN t_postal_area ON t_postal_area.{pa_key} = v.{pa_key}
+    JOIN t_city ON t_city.ci_id = t_postal_area.ci_id
+    JOIN t_province ON t_province.p_id = t_city.p_id
+    JOIN t_country ON t_country.c_id = t_province.c_id
+    JOIN t_date ON t_date.{d_key} = v.{d_key}
+    JOIN t_hour ON t_hour.{h_key} = v.{h_key}
+    JOIN t_component ON t_component.{co_key} = v.{co_key}
+    WHERE t_country.c_name = :country AND t_postal_area.pa_code = :postal_code AND t_date.d_date = :d_date
+    GROUP BY t_hour.h_hour, t_component.co_name
+    ORDER BY t_hour.h_hour, t_component.co_name;
+""")
+
+CHEAPEST_HOURS = fact_queries("""
+    SELECT TOP (:limit) t_hour.h_hour AS hour, SUM(v.v_value) / COUNT(DISTINCT v.{pa_key}) AS price
+    FROM {facts} v
+    JOIN t_postal_area ON t_postal_area.{pa_key} = v.{pa_key}
+    JOIN t_city ON t_city.ci_id = t_postal_area.ci_id
+    JOIN t_province ON t_province.p_id = t_city.p_id
+    JOIN t_country ON t_country.c_id = t_province.c_id
+    JOIN t_date ON t_date.{d_key} = v.{d_key}
+    JOIN t_hour ON t_hour.{h_key} = v.{h_key}
+    WHERE t_country.c_name = :country AND t_postal_area.pa_code = :postal_code AND t_date.d_date = :d_date
+    GROUP BY t_hour.h_hour
+    ORDER BY price, t_hour.h_hour;
+""")
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+Format = Literal["json", "arrow"]
+
+def to_columns(keys: Sequence[str], rows: Sequence[Sequence[Any]]) -> Dict[str, List[Any]]:
+    columns = list(zip(*rows)) if rows else [()] * len(keys)
+    data: Dict[str, List[Any]] = {}
+    for key, column in zip(keys, columns):
+        sample = next((value for value in column if value is not None), None)
+        if isinstance(sample, Decimal):
+            data[key] = [None if value is None else float(value) for value in column]
+        elif isinstance(sample, (date, datetime)):
+            data[key] = [None if value is None else value.isoformat() for value in column]
+        else:
+            data[key] = list(column)
+    return data
+
+def to_arrow(data: Dict[str, List[Any]]) -> bytes:
+    table = pa.table(data)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+class PricesAPI:
+    def __init__(self):
+        self.router = APIRouter(prefix="/api/prices", tags=["Prices"])
+        self.max_age: int = config.PRICES_CACHE_MAX_AGE
+        self.router.add_api_route("/hourly", self.hourly, methods=["GET"])
+        self.router.add_api_route("/components", self.components, methods=["GET"])
+        self.router.add_api_route("/regional", self.regional, methods=["GET"])
+        self.router.add_api_route("/cheapest", self.cheapest, methods=["GET"])
+        self.router.add_api_route("/cache", self.cache_stats, methods=["GET"])
+
+    async def _validators(self, request: Request, db: AsyncSession, fmt: str, version: Optional[int]) -> Tuple[str, Optional[datetime]]:
+        # t_data_version moves on every write, the latest t_date is what Last-Modified can express
+        latest: Optional[date] = (await db.execute(LATEST_DATE)).scalar()
+        etag = f'W/"{services.utils.md5_hash(f"{version}|{latest}|{request.url.path}?{request.url.query}|{fmt}")}"'
+        last_modified = datetime.combine(latest, time.min, tzinfo=timezone.utc) if latest else None
+        return etag, last_modified
+
+    def _not_modified(self, request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since and last_modified:
+            try:
+                return last_modified <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _headers(self, etag: str, last_modified: Optional[datetime]) -> Dict[str, str]:
+        headers = {"ETag": etag, "Cache-Control": f"public, max-age={self.max_age}"}
+        if last_modified:
+            headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+        return headers
+
+    async def _respond(self, request: Request, db: AsyncSession, fmt: str, statements: Dict[bool, Any], params: Dict[str, Any]) -> Response:
+        async def load() -> Tuple[str, Optional[datetime], bytes, str]:
+            etag, last_modified = await self._validators(request, db, fmt, version)
+            # compact mode reads t_value_compact on the integer keys instead of the md5 view
+            statement = statements[await schema_mode.compact_async(db)]
+            keys, rows = await self._execute(db, statement, params)
+            data = to_columns(keys, rows)
+            if fmt == "arrow":
+                return etag, last_modified, to_arrow(data), ARROW_MEDIA_TYPE
+            body = JSONResponse({"columns": list(keys), "data": data, "row_count": len(rows)}).body
+            return etag, last_modified, body, "application/json"
+
+        # one primary key read per request, a write from any process starts a new generation
+        version: Optional[int] = (await db.execute(READ_VERSION)).scalar()
+        data_generation.observe(version)
+        # repeated lookups between two data generations are served without another query
+        key = (request.url.path, tuple(sorted(request.query_params.multi_items())), fmt)
+        etag, last_modified, body, media_type = await price_cache.get_or_load_async(key, load)
+        headers = self._headers(etag, last_modified)
+        if self._not_modified(request, etag, last_modified):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type=media_type, headers=headers)
+
+    async def cache_stats(self) -> Dict[str, Any]:
+        return price_cache.stats()
+
+    async def _execute(self, db: AsyncSession, statement, params: Dict[str, Any]) -> Tuple[List[str], List[Sequence[Any]]]:
+        result = await db.execute(statement, params)
+        return list(result.keys()), result.fetchall()
+
+    async def hourly(
+        self,
+        request: Request,
+        db: Annotated[AsyncSession, Depends(db_connection.get_async_session_fastapi)],
+        country: str,
+        postal_code: str,
+        d_date: Annotated[date, Query(alias="date")],
+        fmt: Annotated[Format, Query(alias="format")] = "json"
+    ) -> Response:
+        params = {"country": country, "postal_code": postal_code, "d_date": d_date}
+        return await self._respond(request, db, fmt, HOURLY_PRICES, params)
+
+    async def components(
+        self,
+        request: Request,
+        db: Annotated[AsyncSession, Depends(db_connection.get_async_session_fastapi)],
+        country: str,
+        postal_code: str,
+        d_date: Annotated[date, Query(alias="date")],
+        fmt: Annotated[Format, Query(alias="format")] = "json"
+    ) -> Response:
+        params = {"country": country, "postal_code": postal_code, "d_date": d_date}
+        return await self._respond(request, db, fmt, COMPONENT_PRICES, params)
+
+    async def cheapest(
+        self,
+        request: Request,
+        db: Annotated[AsyncSession, Depends(db_connection.get_async_session_fastapi)],
+        country: str,
+        postal_code: str,
+        d_date: Annotated[date, Query(alias="date")],
+        limit: Annotated[int, Query(ge=1, le=24)] = 3,
+        fmt: Annotated[Format, Query(alias="format")] = "json"
+    ) -> Response:
+        params = {"country": country, "postal_code": postal_code, "d_date": d_date, "limit": limit}
+        return await self._respond(request, db, fmt, CHEAPEST_HOURS, params)
+
+    async def regional(
+        self,
+        request: Request,
+        db: Annotated[AsyncSession, Depends(db_connection.get_async_session_fastapi)],
+        component: str,
+        start: date,
+        end: date,
+        level: Literal["country", "province", "city"] = "province",
+        period: Literal["hour", "day", "month"] = "day",
+        geo_id: Optional[str] = None,
+        fmt: Annotated[Format, Query(alias="format")] = "json"
+    ) -> Response:
+        params = {"component": component, "start": start, "end": end, "geo_id": geo_id}
+        return await self._respond(request, db, fmt, ROLLUP_QUERIES[(level, period)], params)
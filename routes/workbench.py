@@ -1,22 +1,50 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy import text
 from pydantic import BaseModel
 from database.connection import Connection
-from typing import Annotated
-from sqlalchemy.orm import Session
+from typing import Annotated, Any, AsyncIterator, Dict, Iterator, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends
+from decimal import Decimal
+from services.utils import config
+from services.query_pager import is_pageable, page_query, encode_cursor, decode_cursor
+import json
 
 db_connection = Connection(db_hostname="mssql")
 db_connection.create_tables()
 
+READ_ONLY_QUERIES = ["select", "with", "show", "desc", "describe", "explain"]
+
 class SQLQuery(BaseModel):
     query: str
 
+class SQLStreamQuery(BaseModel):
+    query: str
+    cursor: Optional[str] = None
+
+def json_default(value: Any) -> Any:
+    # only called for values json cannot encode itself
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.hex()
+    return str(value)
+
+def ndjson(message: Dict[str, Any]) -> str:
+    return json.dumps(message, default=json_default, separators=(",", ":")) + "\n"
+
 class WorkbenchAPI:
     def __init__(self):
         self.router = APIRouter(prefix="/api/workbench", tags=["Workbench"])
         self.router.add_api_route("/schema", self.schema, methods=["GET"])
         self.router.add_api_route("/query", self.query, methods=["POST"])
+        self.router.add_api_route("/stream", self.stream, methods=["POST"])
+        self.router.add_api_route("/pool", self.pool, methods=["GET"])
+        self.row_limit: int = config.WORKBENCH_ROW_LIMIT
+        self.chunk_size: int = config.WORKBENCH_CHUNK_SIZE
 
     async def schema(self):
         try:
@@ -26,18 +54,21 @@ class WorkbenchAPI:
         except FileNotFoundError:
             raise HTTPException(status_code=404, detail="Schema file not found")
 
-    def query(self, sql: SQLQuery, db: Annotated[Session, Depends(db_connection.get_session_fastapi)]):
+    async def query(self, sql: SQLQuery, db: Annotated[AsyncSession, Depends(db_connection.get_async_session_fastapi)]):
         query_text = sql.query.strip()
         if not query_text:
             raise HTTPException(status_code=400, detail="Missing 'query' in request body")
         
         try:
-            result = db.execute(text(query_text))
-            
             query_lower = query_text.lower()
             
-            read_only_queries = ["select", "with", "show", "desc", "describe", "explain"]
-            is_read_only = any(query_lower.startswith(cmd) for cmd in read_only_queries)
+            is_read_only = any(query_lower.startswith(cmd) for cmd in READ_ONLY_QUERIES)
+
+            # reads go through a streamed result, only the capped rows are fetched
+            if is_read_only:
+                result = await db.stream(text(query_text))
+            else:
+                result = await db.execute(text(query_text))
             
             # commit
             modification_queries = ["insert", "update", "delete", "merge", "truncate", 
@@ -45,10 +76,13 @@ class WorkbenchAPI:
             needs_commit = any(query_lower.startswith(cmd) for cmd in modification_queries)
             
             data = []
+            truncated = False
             
             if is_read_only:
                 try:
-                    rows = result.fetchall()
+                    rows = await result.fetchmany(self.row_limit)
+                    truncated = len(rows) == self.row_limit and await result.fetchone() is not None
+                    await result.close()
                     if rows:
                         columns = list(result.keys())
                         data = []
@@ -67,7 +101,7 @@ class WorkbenchAPI:
             
             elif needs_commit:
                 try:
-                    db.commit()
+                    await db.commit()
                     affected_rows = getattr(result, 'rowcount', 0)
                     
                     try:
@@ -81,7 +115,7 @@ class WorkbenchAPI:
                         data = [{"rows_affected": affected_rows}]
                         
                 except Exception as commit_error:
-                    db.rollback()
+                    await db.rollback()
                     raise HTTPException(status_code=400, detail=f"Commit failed: {str(commit_error)}")
             
             else:
@@ -100,12 +134,13 @@ class WorkbenchAPI:
             return {
                 "data": data,
                 "query_type": "READ" if is_read_only else "WRITE" if needs_commit else "OTHER",
-                "row_count": len(data)
+                "row_count": len(data),
+                "truncated": truncated
             }
             
         except Exception as e:
             try:
-                db.rollback()
+                await db.rollback()
             except:
                 pass
             
@@ -117,4 +152,67 @@ class WorkbenchAPI:
             elif "Syntax error" in error_msg:
                 raise HTTPException(status_code=400, detail=f"SQL syntax error: {error_msg}")
             else:
-                raise HTTPException(status_code=400, detail=f"Query execution failed: {error_msg}")
\ No newline at end of file
+                raise HTTPException(status_code=400, detail=f"Query execution failed: {error_msg}")
+
+    async def pool(self):
+        return {"data": db_connection.pool_status()}
+
+    async def _stream_rows(self, query_text: str, offset: int) -> AsyncIterator[str]:
+        # own session: the request scoped one is closed before the body is streamed
+        pageable = is_pageable(query_text)
+        async with db_connection.get_async_session() as session:
+            try:
+                # one row past the page tells whether there is a next one
+                statement = page_query(query_text, offset, self.row_limit + 1) if pageable else query_text
+                result = await session.stream(
+                    text(statement),
+                    execution_options={"yield_per": self.chunk_size}
+                )
+                yield ndjson({"type": "columns", "columns": list(result.keys())})
+
+                sent = 0
+                while sent < self.row_limit:
+                    chunk = await result.fetchmany(min(self.chunk_size, self.row_limit - sent))
+                    if not chunk:
+                        break
+                    sent += len(chunk)
+                    yield ndjson({"type": "rows", "rows": [tuple(row) for row in chunk]})
+
+                has_more = sent == self.row_limit and await result.fetchone() is not None
+                await result.close()
+                yield ndjson({
+                    "type": "end",
+                    "row_count": sent,
+                    "offset": offset,
+                    "truncated": has_more,
+                    # without an ORDER BY a second run may return the rows in another order
+                    "next": encode_cursor(query_text, offset + sent) if has_more and pageable else None
+                })
+            except Exception as e:
+                await session.rollback()
+                yield ndjson({"type": "error", "detail": f"Query execution failed: {e}"})
+
+    async def stream(self, sql: SQLStreamQuery, db: Annotated[AsyncSession, Depends(db_connection.get_async_session_fastapi)]):
+        query_text = sql.query.strip()
+        if not query_text:
+            raise HTTPException(status_code=400, detail="Missing 'query' in request body")
+
+        if not any(query_text.lower().startswith(cmd) for cmd in READ_ONLY_QUERIES):
+            # writes stay on the regular path, their (small) response is framed like a stream
+            response = await self.query(SQLQuery(query=query_text), db)
+            data = response["data"]
+            columns = list(data[0].keys()) if data else []
+
+            def single() -> Iterator[str]:
+                yield ndjson({"type": "columns", "columns": columns})
+                yield ndjson({"type": "rows", "rows": [[row.get(column) for column in columns] for row in data]})
+                yield ndjson({"type": "end", "row_count": len(data), "offset": 0, "truncated": False, "next": None})
+            return StreamingResponse(single(), media_type="application/x-ndjson")
+
+        try:
+            offset = decode_cursor(query_text, sql.cursor) if sql.cursor else 0
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+        if offset and not is_pageable(query_text):
+            raise HTTPException(status_code=400, detail="Continuation needs a trailing top-level ORDER BY without OFFSET/FETCH")
+        return StreamingResponse(self._stream_rows(query_text, offset), media_type="application/x-ndjson")
@@ -3,6 +3,8 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from routes.workbench import WorkbenchAPI
 from routes.bot_panel import BotPanelAPI
+from routes.prices import PricesAPI
+from routes.cluster import ClusterAPI
 from fastapi.staticfiles import StaticFiles
 
 class App:
@@ -11,7 +13,11 @@ class App:
         self.setup_middleware()
         self.app.mount("/public", StaticFiles(directory="public", html=True), name="public")
         self.app.include_router(WorkbenchAPI().router)
-        self.app.include_router(BotPanelAPI().router)
+        bot_panel = BotPanelAPI()
+        self.app.include_router(bot_panel.router)
+        # remote shard workers feed the same bot manager as the panel's own workers
+        self.app.include_router(ClusterAPI(bot_manager=bot_panel.bot_manager).router)
+        self.app.include_router(PricesAPI().router)
 
     def setup_middleware(self):
         self.app.add_middleware(
@@ -0,0 +1,128 @@
+import httpx
+import asyncio
+import time
+from services.bot.interfaces import IBotManager
+from services.bot.result_handler import ResultHandler
+from services.bot.result_buffer import BufferedResultHandler
+from services.bot.task_manager import TaskManager, Task
+from datetime import date
+from typing import Any, Dict, Optional
+from database.connection import Connection
+from services.utils import config
+
+class AsyncWorkerManager:
+    def __init__(self, bot_manager: IBotManager, db_connection: Connection):
+        self.bot_manager: IBotManager = bot_manager
+        self.db_connection: Connection = db_connection
+        self.result_handler: ResultHandler = ResultHandler(bot_manager=bot_manager)
+        self.buffered_handler: BufferedResultHandler = BufferedResultHandler(bot_manager=bot_manager)
+        self.run: bool = False
+
+    def stop(self) -> None:
+        self.run = False
+
+    def start(self) -> None:
+        self.run = True
+        try:
+            asyncio.run(self._main())
+        except Exception as e:
+            self.bot_manager.logger(f"Error: {e}", force=True)
+
+    def get_concurrency(self, country_name: str) -> int:
+        for country in config.COUNTRY_CONFIG:
+            if country["name"] == country_name:
+                return max(1, int(country.get("concurrency", config.FETCH_CONCURRENCY)))
+        return max(1, int(config.FETCH_CONCURRENCY))
+
+    def _create_client(self, max_connections: int) -> httpx.AsyncClient:
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        mounts = None
+        if self.bot_manager.proxies:
+            mounts = {
+                f"{scheme}://": httpx.AsyncHTTPTransport(proxy=proxy, limits=limits)
+                for scheme, proxy in self.bot_manager.proxies.items()
+            }
+        return httpx.AsyncClient(
+            headers=self.bot_manager.headers,
+            limits=limits,
+            mounts=mounts,
+            timeout=config.FETCH_TIMEOUT
+        )
+
+    async def _main(self) -> None:
+        task_manager_list = list(self.bot_manager.task_manager_list)
+        max_connections = sum(self.get_concurrency(task_manager.target_country) for task_manager in task_manager_list)
+        async with self._create_client(max_connections=max(1, max_connections)) as client:
+            await asyncio.gather(*(self._run_task_manager(client, task_manager) for task_manager in task_manager_list))
+
+    async def _run_task_manager(self, client: httpx.AsyncClient, task_manager: TaskManager) -> None:
+        today = date.today()
+
+        async def fetch_loop() -> None:
+            while self.run:
+                # claiming runs db round trips under a threading lock, keep it off the event loop
+                task = await asyncio.to_thread(task_manager.get_task)
+                if task is None:
+                    if await asyncio.to_thread(task_manager.is_done):
+                        break
+                    # only retries waiting for their backoff are left
+                    # fast path results and planner fan-outs wait in the buffer
+                    await asyncio.to_thread(self.bot_manager.result_buffer.maybe_flush)
+                    await asyncio.sleep(1)
+                    continue
+                await self.work(client=client, task_manager=task_manager, task=task, today=today)
+
+        concurrency = self.get_concurrency(task_manager.target_country)
+        await asyncio.gather(*(fetch_loop() for _ in range(concurrency)))
+
+    async def work(self, client: httpx.AsyncClient, task_manager: TaskManager, task: Task, today: date) -> None:
+        target_url = task_manager.target_url
+        pa_code = task.pa_code
+        if task.pa_status_code == 400:
+            self.bot_manager.logger(task.pa_id, pa_code, "NO DATA!")
+            if self.bot_manager.fast_path:
+                await asyncio.to_thread(self.buffered_handler.no_data, task_manager, task)
+            else:
+                await asyncio.to_thread(task_manager.ack, task.pa_id, False)
+            return
+
+        status_code = None
+        rate_limiter = self.bot_manager.get_rate_limiter(target_url)
+        await rate_limiter.acquire_async()
+        started = time.monotonic()
+        try:
+            self.bot_manager.logger(task.pa_id, f"{target_url}{pa_code}")
+            response = await client.get(f"{target_url}{pa_code}")
+            status_code = response.status_code
+            rate_limiter.feedback(status_code, time.monotonic() - started, response.headers.get("Retry-After"))
+
+            response.raise_for_status()
+            json_data = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            if status_code is None:
+                rate_limiter.feedback(None, time.monotonic() - started)
+            error = type(e).__name__ if status_code is None else f"HTTP {status_code}"
+            await asyncio.to_thread(self._fail, task_manager, task, status_code, error, today)
+            return
+
+        await asyncio.to_thread(self._complete, task_manager, task, status_code, json_data, today)
+
+    def _complete(self, task_manager: TaskManager, task: Task, status_code: Optional[int], json_data: Dict[str, Any], today: date) -> None:
+        try:
+            if self.bot_manager.fast_path:
+                self.buffered_handler.complete(task_manager, task, status_code, json_data, today)
+                return
+            with self.db_connection.checkout() as session:
+                self.result_handler.complete(session, task_manager, task, status_code, json_data, today)
+        except Exception as e:
+            self.bot_manager.logger(task.pa_id, f"Error: {e}")
+
+    def _fail(self, task_manager: TaskManager, task: Task, status_code: Optional[int], error: str, today: date) -> None:
+        try:
+            if self.bot_manager.fast_path:
+                self.buffered_handler.fail(task_manager, task, status_code, error)
+                return
+            with self.db_connection.checkout() as session:
+                self.result_handler.fail(session, task_manager, task, status_code, error, today)
+        except Exception as e:
+            self.bot_manager.logger(task.pa_id, f"Error: {e}")
@@ -2,8 +2,16 @@ from services.table_manager import TableManager
 from services.csv_manager import CSVManager
 from services.bot.task_manager import TaskManager
 from services.bot.worker_manager import WorkerManager
+from services.bot.async_worker_manager import AsyncWorkerManager
+from services.bot.rate_limiter import RateLimiter
+from services.bot.retry_policy import RetryPolicy
+from services.bot.payload_store import PayloadStore
+from services.bot.result_buffer import ResultBuffer
+from services.bot.scrape_planner import ScrapePlanner
 from services.utils import config
-from database.connection import Connection
+from services.result_cache import data_generation
+from services.schema_manager import schema_mode
+from database.connection import Connection, max_workers
 from typing import List, Callable, Dict, Any
 from services.bot.interfaces import IBotManager
 import threading
@@ -16,11 +24,19 @@ class BotManager(TableManager, CSVManager, IBotManager):
 
         self.task_manager_list: List[TaskManager] = []
         self.worker_manager_list: List[WorkerManager] = []
+        self.async_worker_manager: AsyncWorkerManager = AsyncWorkerManager(bot_manager=self, db_connection=self.db_connection)
         self.save_json_file: bool = True
         self.save_json_db: bool = False
         self.transform_to_tabular: bool = True
-        self.fetch_min_delay: int = config.FETCH_MIN_DELAY
-        self.fetch_max_delay: int = config.FETCH_MAX_DELAY
+        self.fetch_async: bool = config.FETCH_ASYNC
+        # workers buffer status codes, acks and fact rows and write them in batches
+        self.fast_path: bool = config.BOT_FAST_PATH
+        self.result_buffer: ResultBuffer = ResultBuffer(bot_manager=self)
+        # fetches representatives per price class and fans their payload out to the members
+        self.scrape_planner: ScrapePlanner = ScrapePlanner(bot_manager=self)
+        self.rate_limiters: Dict[str, RateLimiter] = {}
+        self.retry_policy: RetryPolicy = RetryPolicy.from_config()
+        self.payload_store: PayloadStore = PayloadStore()
         self.proxies: bool | None = config.PROXIES if config.USE_PROXY else None
         self.headers: dict[str, str] = config.FETCH_HEADER
         self.logger: Callable[..., None] = logger
@@ -36,12 +52,30 @@ class BotManager(TableManager, CSVManager, IBotManager):
             self.logger("Failed to reset tasks! Stop the process first before resetting tasks.", force=True)
 
     def add_task(self, country_config: Dict[str, Any]) -> None:
-        task_manager = TaskManager(db_connection=self.db_connection, target_country=country_config['name'], target_url=country_config['url'], logger=self.logger)
+        task_manager = TaskManager(db_connection=self.db_connection, target_country=country_config['name'], target_url=country_config['url'], logger=self.logger, retry_policy=self.retry_policy)
         task_manager.set_task()
         self.task_manager_list.append(task_manager)
+        if country_config['url'] not in self.rate_limiters:
+            self.rate_limiters[country_config['url']] = RateLimiter.from_config(country_config)
         self.logger(f"Task for {country_config['name']} added", force=True)
 
+    def clear_bot_data_session(self) -> None:
+        super().clear_bot_data_session()
+        self.payload_store.clear()
+
+    def get_rate_limiter(self, target_url: str) -> RateLimiter:
+        return self.rate_limiters[target_url]
+
+    def rate_limit_info(self, target=None) -> None:
+        data = [rate_limiter.info() for rate_limiter in self.rate_limiters.values()]
+        self.logger(data, force=True, action='get_rate_limits', target=target, raw=True)
+
     def add_worker(self) -> None:
+        limit = max_workers()
+        if len(self.worker_manager_list) >= limit:
+            # the connection pool has one connection per worker up to this limit
+            self.logger(f"Worker limit reached ({limit})", force=True)
+            return
         self.worker_manager_list.append(WorkerManager(bot_manager=self, db_connection=self.db_connection))
         msg = "1 worker added"
         if self.in_process:
@@ -70,6 +104,12 @@ class BotManager(TableManager, CSVManager, IBotManager):
     def stop_workers(self) -> None:
         for worker_manager in self.worker_manager_list:
             worker_manager.stop()
+        self.async_worker_manager.stop()
+        for task_manager in self.task_manager_list:
+            try:
+                task_manager.release()
+            except Exception as e:
+                self.logger(f"Error: {e}", force=True)
         self.logger(f"Workers forced to stop", force=True)
 
     def get_set_process(self, status=None, target=None):
@@ -80,19 +120,33 @@ class BotManager(TableManager, CSVManager, IBotManager):
         self.logger(message, force=True, target=target)
         self.logger(self.in_process, force=True, action='get_process', target=target, raw=True)
 
+    def has_workers(self) -> bool:
+        return self.fetch_async or bool(self.worker_manager_list)
+
     def run_workers(self) -> None:
         if self.task_manager_list:
-            if self.worker_manager_list:
+            if self.has_workers():
                 if not self.in_process:
                     self.get_set_process(status=True)
-                    threads = []
-                    for worker_manager in self.worker_manager_list:
-                        t = threading.Thread(target=worker_manager.start)
-                        t.start()
-                        threads.append(t)
+                    # the scheduler keeps the process alive for days, the storage mode is asked again and
+                    # next partitions are split before each run
+                    schema_mode.reset()
+                    self.partition_manager.maintain()
+                    if self.fetch_async:
+                        self.async_worker_manager.start()
+                    else:
+                        threads = []
+                        for worker_manager in self.worker_manager_list:
+                            t = threading.Thread(target=worker_manager.start)
+                            t.start()
+                            threads.append(t)
 
-                    for t in threads:
-                        t.join()
+                        for t in threads:
+                            t.join()
+                    self.result_buffer.flush()
+                    self.payload_store.close()
+                    self._tabular_transform_finish()
+                    data_generation.bump(self.db_connection)
                     self.get_set_process(status=False)
                 else:
                     self.logger("the previous process is still running!", force=True)
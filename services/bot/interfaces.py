@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import List, Callable
+from typing import Any, Dict, List, Callable
 from sqlalchemy.orm import Session
 from database.connection import Connection
 
@@ -11,8 +11,13 @@ class IBotManager(ABC):
     save_json_file: bool
     save_json_db: bool
     transform_to_tabular: bool
-    fetch_min_delay: int
-    fetch_max_delay: int
+    fetch_async: bool
+    fast_path: bool
+    result_buffer: Any
+    scrape_planner: Any
+    rate_limiters: Dict
+    retry_policy: Any
+    payload_store: Any
     proxies: bool | None
     headers: dict[str, str]
     logger: Callable[..., None]
@@ -25,6 +30,10 @@ class IBotManager(ABC):
     def add_worker(self):
         pass
 
+    @abstractmethod
+    def get_rate_limiter(self, target_url: str):
+        pass
+
     @abstractmethod
     def _tabular_transform_tr(self):
         pass
\ No newline at end of file
@@ -0,0 +1,45 @@
+import json
+import threading
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from datetime import date
+from typing import Any, Dict, Set, Tuple
+import services.utils
+from services.json_archive import JsonArchiveWriter
+
+MERGE_PAYLOAD = text("""
+    MERGE t_payload WITH (HOLDLOCK) AS target
+    USING (SELECT :pl_id AS pl_id) AS source
+    ON target.pl_id = source.pl_id
+    WHEN NOT MATCHED THEN INSERT (pl_id, pl_data) VALUES (:pl_id, :pl_data);
+""")
+
+class PayloadStore:
+    def __init__(self):
+        self.stored_db: Set[str] = set()
+        self.archive: JsonArchiveWriter = JsonArchiveWriter()
+        self._lock: threading.Lock = threading.Lock()
+
+    @staticmethod
+    def canonical(json_data: Dict[str, Any]) -> Tuple[str, str]:
+        payload = json.dumps(json_data, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        return services.utils.md5_hash(payload), payload
+
+    def save_db(self, session: Session, pl_id: str, payload: str) -> None:
+        # caller commits together with the postal area mapping
+        if pl_id not in self.stored_db:
+            session.execute(MERGE_PAYLOAD, {"pl_id": pl_id, "pl_data": payload})
+
+    def mark_saved_db(self, pl_id: str) -> None:
+        with self._lock:
+            self.stored_db.add(pl_id)
+
+    def save_file(self, today: date, target_country: str, pa_code: str, pl_id: str, payload: str) -> None:
+        self.archive.append(today, target_country, pa_code, pl_id, payload)
+
+    def close(self) -> None:
+        self.archive.close()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.stored_db.clear()
@@ -0,0 +1,108 @@
+import time
+import asyncio
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+from services.utils import config
+
+class RateLimiter:
+    def __init__(
+        self,
+        name: str,
+        initial_rate: float,
+        min_rate: float,
+        max_rate: float,
+        burst: float,
+        increase: float,
+        decrease: float,
+        target_latency: float
+    ):
+        self.name: str = name
+        self.rate: float = initial_rate
+        self.min_rate: float = min_rate
+        self.max_rate: float = max_rate
+        self.burst: float = max(1.0, burst)
+        # configured bounds, a later cap to a larger share restores them
+        self.base_min_rate: float = min_rate
+        self.base_burst: float = self.burst
+        self.increase: float = increase
+        self.decrease: float = decrease
+        self.target_latency: float = target_latency
+        self.tokens: float = self.burst
+        self.updated: float = time.monotonic()
+        self.blocked_until: float = 0.0
+        self.throttled: int = 0
+        self._lock: threading.Lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, country_config: Dict[str, Any]) -> "RateLimiter":
+        settings = {**config.RATE_LIMIT, **country_config.get("rate_limit", {})}
+        return cls(name=country_config["name"], **settings)
+
+    def _reserve(self) -> float:
+        # take one token, a negative balance is a reservation the caller has to wait for
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.blocked_until - now)
+
+    def acquire(self) -> None:
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def cap(self, max_rate: float) -> None:
+        # this limiter only gets a share of the configured rate, the rest is used by other workers;
+        # the share changes as shards open and close, a larger one is grown into by feedback
+        with self._lock:
+            self.max_rate = max_rate
+            self.min_rate = min(self.base_min_rate, max_rate)
+            self.rate = min(self.rate, max_rate)
+            self.burst = max(1.0, min(self.base_burst, max_rate))
+            self.tokens = min(self.tokens, self.burst)
+
+    def feedback(self, status_code: Optional[int], latency: float, retry_after: Optional[str] = None) -> None:
+        with self._lock:
+            now = time.monotonic()
+            # AIMD: multiplicative decrease on overload, additive increase otherwise
+            if status_code is None or status_code == 429 or status_code >= 500:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self.throttled += 1
+                delay = self.parse_retry_after(retry_after)
+                if delay:
+                    self.blocked_until = max(self.blocked_until, now + delay)
+            elif latency > self.target_latency:
+                self.rate = max(self.min_rate, self.rate * (1 - (1 - self.decrease) / 4))
+            else:
+                # spread over one second of requests so the rate grows by ~increase per second
+                self.rate = min(self.max_rate, self.rate + self.increase / max(self.rate, 1.0))
+
+    @staticmethod
+    def parse_retry_after(retry_after: Optional[str]) -> Optional[float]:
+        if not retry_after:
+            return None
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            blocked = max(0.0, self.blocked_until - time.monotonic())
+            return {"id": self.name, "rate": round(self.rate, 2), "blocked": round(blocked, 1), "throttled": self.throttled}
@@ -0,0 +1,192 @@
+import threading
+import time
+from sqlalchemy import text
+from services.bot.interfaces import IBotManager
+from services.bot.task_manager import TaskManager, Task
+from services.tabular.parser import TabularRows, fan_out, payload_rows_cache
+from services.bot.payload_store import MERGE_PAYLOAD
+from services.bot.scrape_planner import MERGE_PRICE_CLASS
+from services.utils import config
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+UPDATE_STATUS = text("UPDATE t_postal_area SET pa_status_code = :status_code WHERE pa_id = :pa_id;")
+UPDATE_STATUS_PAYLOAD = text("UPDATE t_postal_area SET pa_status_code = :status_code, pl_id = :pl_id WHERE pa_id = :pa_id;")
+
+class ResultBuffer:
+    def __init__(self, bot_manager: IBotManager, flush_size: Optional[int] = None, flush_interval: Optional[float] = None):
+        self.bot_manager: IBotManager = bot_manager
+        self.flush_size: int = flush_size or config.BOT_FLUSH_SIZE
+        self.flush_interval: float = flush_interval or config.BOT_FLUSH_INTERVAL
+        # pa_id -> (status code, pl_id), a later result for the same postal area wins
+        self.statuses: Dict[str, Tuple[Optional[int], Optional[str]]] = {}
+        self.payloads: Dict[str, str] = {}
+        self.acks: Dict[TaskManager, List[Tuple[str, bool]]] = {}
+        self.rows: TabularRows = TabularRows()
+        # pa_id -> (signature, date) of the planner's price classes
+        self.price_classes: Dict[str, Tuple[str, date]] = {}
+        self.pending: int = 0
+        self.last_flush: float = time.monotonic()
+        self._lock: threading.Lock = threading.Lock()
+        # one flush at a time, results keep being buffered while it runs
+        self._flush_lock: threading.Lock = threading.Lock()
+
+    def add(
+        self,
+        task_manager: TaskManager,
+        pa_id: str,
+        status_code: Optional[int],
+        success: bool,
+        pl_id: Optional[str] = None,
+        payload: Optional[str] = None,
+        rows: Optional[TabularRows] = None,
+        ack: bool = True
+    ) -> None:
+        with self._lock:
+            self.statuses[pa_id] = (status_code, pl_id)
+            if pl_id and payload is not None:
+                self.payloads[pl_id] = payload
+            if ack:
+                self.acks.setdefault(task_manager, []).append((pa_id, success))
+            if rows is not None:
+                self.rows.extend(rows)
+            self.pending += 1
+        self.maybe_flush()
+
+    def add_price_class(self, pa_id: str, signature: str, today: date) -> None:
+        # counted like a result, a learned class is written by the same size/interval trigger
+        with self._lock:
+            self.price_classes[pa_id] = (signature, today)
+            self.pending += 1
+        self.maybe_flush()
+
+    def _requeue(
+        self,
+        statuses: Dict[str, Tuple[Optional[int], Optional[str]]],
+        payloads: Dict[str, str],
+        acks: Dict[TaskManager, List[Tuple[str, bool]]],
+        rows: TabularRows,
+        price_classes: Dict[str, Tuple[str, date]],
+        pending: int
+    ) -> None:
+        # a failed flush goes back in front of what was buffered meanwhile, later results still win
+        with self._lock:
+            self.statuses = {**statuses, **self.statuses}
+            self.payloads = {**payloads, **self.payloads}
+            self.price_classes = {**price_classes, **self.price_classes}
+            for task_manager, results in self.acks.items():
+                acks.setdefault(task_manager, []).extend(results)
+            self.acks = acks
+            rows.extend(self.rows)
+            self.rows = rows
+            self.pending += pending
+
+    def maybe_flush(self) -> int:
+        with self._lock:
+            due = self.pending >= self.flush_size or (
+                self.pending and time.monotonic() - self.last_flush >= self.flush_interval
+            )
+        return self.flush() if due else 0
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                statuses, self.statuses = self.statuses, {}
+                payloads, self.payloads = self.payloads, {}
+                acks, self.acks = self.acks, {}
+                rows, self.rows = self.rows, TabularRows()
+                price_classes, self.price_classes = self.price_classes, {}
+                pending, self.pending = self.pending, 0
+                self.last_flush = time.monotonic()
+            if not pending:
+                return 0
+
+            # facts first, an ack must never be committed for a postal area whose rows were lost
+            if not rows.is_empty():
+                try:
+                    writer = self.bot_manager.create_tabular_writer()
+                    writer.add(rows)
+                    writer.flush()
+                    self.bot_manager.mark_dirty(writer)
+                except Exception as e:
+                    # kept for the next flush, nothing is acked until the facts are written
+                    self.bot_manager.logger(f"Error writing tabular batch: {e}", force=True)
+                    self._requeue(statuses, payloads, acks, rows, price_classes, pending)
+                    return 0
+
+            payload_store = self.bot_manager.payload_store
+            new_payloads = [
+                {"pl_id": pl_id, "pl_data": payload}
+                for pl_id, payload in payloads.items() if pl_id not in payload_store.stored_db
+            ]
+            plain = [{"pa_id": pa_id, "status_code": status_code} for pa_id, (status_code, pl_id) in statuses.items() if not pl_id]
+            linked = [{"pa_id": pa_id, "status_code": status_code, "pl_id": pl_id} for pa_id, (status_code, pl_id) in statuses.items() if pl_id]
+
+            try:
+                # one round trip per statement for the whole batch
+                with self.bot_manager.db_connection.checkout() as session:
+                    if new_payloads:
+                        session.execute(MERGE_PAYLOAD, new_payloads)
+                    if plain:
+                        session.execute(UPDATE_STATUS, plain)
+                    if linked:
+                        session.execute(UPDATE_STATUS_PAYLOAD, linked)
+                    if price_classes:
+                        session.execute(MERGE_PRICE_CLASS, [
+                            {"pa_id": pa_id, "pc_signature": signature, "pc_updated": pc_updated}
+                            for pa_id, (signature, pc_updated) in price_classes.items()
+                        ])
+                    for task_manager, results in acks.items():
+                        task_manager.ack_many(session, [pa_id for pa_id, _ in results])
+            except Exception as e:
+                # the facts are committed, only the statuses, payload links, classes and acks are retried
+                self.bot_manager.logger(f"Error flushing {pending} results: {e}", force=True)
+                self._requeue(statuses, payloads, acks, TabularRows(), price_classes, pending)
+                return 0
+
+            for payload in new_payloads:
+                payload_store.mark_saved_db(payload["pl_id"])
+            for task_manager, results in acks.items():
+                task_manager.record_acks(sum(1 for _, success in results if success), len(results))
+            return pending
+
+class BufferedResultHandler:
+    def __init__(self, bot_manager: IBotManager):
+        self.bot_manager: IBotManager = bot_manager
+
+    def complete(self, task_manager: TaskManager, task: Task, status_code: Optional[int], json_data: Dict[str, Any], today: date) -> None:
+        payload_store = self.bot_manager.payload_store
+        pl_id, payload = payload_store.canonical(json_data)
+
+        if self.bot_manager.save_json_file:
+            payload_store.save_file(today, task_manager.target_country, task.pa_code, pl_id, payload)
+
+        rows = None
+        if self.bot_manager.transform_to_tabular:
+            rows = fan_out(payload_rows_cache.get(pl_id, json_data), [task.pa_id])
+
+        save_db = self.bot_manager.save_json_db
+        self.bot_manager.result_buffer.add(
+            task_manager, task.pa_id, status_code, True,
+            pl_id=pl_id if save_db else None, payload=payload if save_db else None, rows=rows
+        )
+        self.bot_manager.scrape_planner.observe(task_manager, task, json_data, today)
+
+    def fail(self, task_manager: TaskManager, task: Task, status_code: Optional[int], error: str) -> None:
+        retry_policy = self.bot_manager.retry_policy
+        if retry_policy.is_retryable(status_code):
+            if retry_policy.can_retry(task.attempts) and task_manager.take_retry():
+                delay = retry_policy.backoff(task.attempts)
+                self.bot_manager.logger(task.pa_id, f"Retry {task.attempts}/{retry_policy.max_attempts} in {delay:.1f}s | {error}")
+                task_manager.retry(task.pa_id, delay)
+                return
+
+            self.bot_manager.logger(task.pa_id, f"Dead letter after {task.attempts} attempts | {error}")
+            task_manager.dead_letter(task, status_code, error)
+            self.bot_manager.result_buffer.add(task_manager, task.pa_id, status_code, False, ack=False)
+            return
+
+        self.bot_manager.result_buffer.add(task_manager, task.pa_id, status_code, False)
+
+    def no_data(self, task_manager: TaskManager, task: Task) -> None:
+        self.bot_manager.result_buffer.add(task_manager, task.pa_id, task.pa_status_code, False)
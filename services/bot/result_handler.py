@@ -0,0 +1,80 @@
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from database.models import TPostalArea
+from services.bot.interfaces import IBotManager
+from services.bot.task_manager import TaskManager, Task
+from datetime import date
+from typing import Any, Dict, Optional
+
+class ResultHandler:
+    def __init__(self, bot_manager: IBotManager):
+        self.bot_manager: IBotManager = bot_manager
+
+    def complete(self, session: Session, task_manager: TaskManager, task: Task, status_code: Optional[int], json_data: Dict[str, Any], today: date) -> None:
+        t_postal_area = session.get(TPostalArea, task.pa_id)
+        self.save(session, t_postal_area, status_code, json_data, task_manager.target_country, today)
+        task_manager.ack(task.pa_id, session=session)
+        self.bot_manager.scrape_planner.observe(task_manager, task, json_data, today)
+
+    def fail(self, session: Session, task_manager: TaskManager, task: Task, status_code: Optional[int], error: str, today: date) -> None:
+        retry_policy = self.bot_manager.retry_policy
+        if retry_policy.is_retryable(status_code):
+            if retry_policy.can_retry(task.attempts) and task_manager.take_retry():
+                delay = retry_policy.backoff(task.attempts)
+                self.bot_manager.logger(task.pa_id, f"Retry {task.attempts}/{retry_policy.max_attempts} in {delay:.1f}s | {error}")
+                task_manager.retry(task.pa_id, delay)
+                return
+
+            self.bot_manager.logger(task.pa_id, f"Dead letter after {task.attempts} attempts | {error}")
+            t_postal_area = session.get(TPostalArea, task.pa_id)
+            self.save(session, t_postal_area, status_code, None, task_manager.target_country, today)
+            task_manager.dead_letter(task, status_code, error)
+            return
+
+        t_postal_area = session.get(TPostalArea, task.pa_id)
+        self.save(session, t_postal_area, status_code, None, task_manager.target_country, today)
+        task_manager.ack(task.pa_id, success=False, session=session)
+
+    def save(self, session: Session, t_postal_area: TPostalArea, status_code: Optional[int], json_data: Optional[Dict[str, Any]], target_country: str, today: date) -> None:
+        t_postal_area.pa_status_code = status_code
+        # read before the commit expires them, a later attribute access would reload the row on a second connection
+        pa_id = t_postal_area.pa_id
+        pa_code = t_postal_area.pa_code
+
+        if json_data is None:
+            # commit status code
+            self.bot_manager.logger(pa_id, "Status Code:", status_code)
+            session.commit()
+            return
+
+        try:
+            payload_store = self.bot_manager.payload_store
+            pl_id, payload = payload_store.canonical(json_data)
+
+            if self.bot_manager.save_json_db:
+                self.bot_manager.logger(pa_id, "Saving JSON in Database", pl_id)
+                payload_store.save_db(session, pl_id, payload)
+                t_postal_area.pl_id = pl_id
+
+            self.bot_manager.logger(pa_id, "Data: ", payload[0:200]+"...")
+            session.commit()
+            if self.bot_manager.save_json_db:
+                payload_store.mark_saved_db(pl_id)
+
+            if self.bot_manager.save_json_file:
+                self.bot_manager.logger(pa_id, "Saving JSON File", pl_id)
+                payload_store.save_file(today, target_country, pa_code, pl_id, payload)
+
+            if self.bot_manager.transform_to_tabular:
+                self.bot_manager.logger(pa_id, "Transforming JSON..")
+                self.bot_manager._tabular_transform_tr(pa_id=pa_id, json_data=json_data, log=True, pl_id=pl_id)
+
+        except IntegrityError as e:
+            # commit status code
+            self.bot_manager.logger(pa_id, "Duplicate")
+            session.rollback()
+            t_postal_area.pa_status_code = status_code
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            self.bot_manager.logger(pa_id, f"Error: {e}")
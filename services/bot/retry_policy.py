@@ -0,0 +1,30 @@
+import random
+from typing import Any, Dict, List, Optional
+from services.utils import config
+
+class RetryPolicy:
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float, budget_ratio: float, min_budget: int, status_codes: List[int]):
+        self.max_attempts: int = max_attempts
+        self.base_delay: float = base_delay
+        self.max_delay: float = max_delay
+        self.budget_ratio: float = budget_ratio
+        self.min_budget: int = min_budget
+        self.status_codes: List[int] = status_codes
+
+    @classmethod
+    def from_config(cls, settings: Optional[Dict[str, Any]] = None) -> "RetryPolicy":
+        return cls(**(settings or config.RETRY_POLICY))
+
+    def is_retryable(self, status_code: Optional[int]) -> bool:
+        # no status code means timeout or connection error
+        return status_code is None or status_code in self.status_codes
+
+    def can_retry(self, attempts: int) -> bool:
+        return attempts < self.max_attempts
+
+    def backoff(self, attempts: int) -> float:
+        # exponential backoff with full jitter
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** max(attempts - 1, 0)))
+
+    def budget(self, total_tasks: int) -> int:
+        return max(self.min_budget, int(total_tasks * self.budget_ratio))
@@ -0,0 +1,219 @@
+import json
+import threading
+from collections import deque
+from datetime import date, timedelta
+from sqlalchemy import text
+from services.bot.interfaces import IBotManager
+from services.bot.task_manager import TaskManager, Task
+from services.bot.payload_store import PayloadStore
+from services.json_archive import JsonArchiveReader
+from services.tabular.parser import fan_out, payload_rows_cache
+from services.utils import config
+import services.utils
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# known classes of one country, loaded once per run instead of one lookup per payload
+SELECT_COUNTRY_SIGNATURES = text("""
+    SELECT t_price_class.pa_id, t_price_class.pc_signature
+    FROM t_price_class
+    JOIN t_postal_area ON t_postal_area.pa_id = t_price_class.pa_id
+    JOIN t_city ON t_city.ci_id = t_postal_area.ci_id
+    JOIN t_province ON t_province.p_id = t_city.p_id
+    JOIN t_country ON t_country.c_id = t_province.c_id
+    WHERE t_country.c_name = :country;
+""")
+
+MERGE_PRICE_CLASS = text("""
+    MERGE t_price_class WITH (HOLDLOCK) AS target
+    USING (SELECT :pa_id AS pa_id) AS source
+    ON target.pa_id = source.pa_id
+    WHEN MATCHED THEN UPDATE SET pc_signature = :pc_signature, pc_updated = :pc_updated
+    WHEN NOT MATCHED THEN INSERT (pa_id, pc_signature, pc_updated) VALUES (:pa_id, :pc_signature, :pc_updated);
+""")
+
+# planned members of the representative's class, leased so a second representative finds none
+CLAIM_MEMBERS = text("""
+    UPDATE t_task_queue
+    SET tq_status = 1,
+        tq_attempts = tq_attempts + 1,
+        tq_lease_until = DATEADD(second, :lease_seconds, SYSUTCDATETIME())
+    OUTPUT inserted.pa_id, t_postal_area.pa_code, inserted.tq_attempts
+    FROM t_task_queue
+    JOIN t_price_class ON t_price_class.pa_id = t_task_queue.pa_id
+    JOIN t_postal_area ON t_postal_area.pa_id = t_task_queue.pa_id
+    WHERE t_task_queue.tq_country = :country AND t_task_queue.tq_date = :tq_date
+      AND t_task_queue.tq_status = 4 AND t_price_class.pc_signature = :pc_signature;
+""")
+
+SELECT_COUNTRY_AREAS = text("""
+    SELECT t_postal_area.pa_code, t_postal_area.pa_id
+    FROM t_postal_area
+    JOIN t_city ON t_city.ci_id = t_postal_area.ci_id
+    JOIN t_province ON t_province.p_id = t_city.p_id
+    JOIN t_country ON t_country.c_id = t_province.c_id
+    WHERE t_country.c_name = :country;
+""")
+
+def class_signature(json_data: Dict[str, Any]) -> Optional[str]:
+    # the whole payload, power price included: a member is only ever given data its class agreed on
+    if not any(json_data.get("energy", {}).get(date_component_config) for date_component_config in config.DATE_COMPONENTS_CONFIG):
+        return None
+    return PayloadStore.canonical(json_data)[0]
+
+class ScrapePlanner:
+    def __init__(self, bot_manager: IBotManager):
+        self.bot_manager: IBotManager = bot_manager
+        self.enabled: bool = config.PLANNER_ENABLED
+        self.representatives: int = max(config.PLANNER_REPRESENTATIVES, 1)
+        self.fanned_out: int = 0
+        self.audited: int = 0
+        self.drift_count: int = 0
+        self.drift: Deque[Dict[str, Any]] = deque(maxlen=100)
+        # (country, task date) -> pa_id -> signature
+        self.signatures: Dict[Tuple[str, date], Dict[str, str]] = {}
+        # (country, task date, learned class) -> today's payload signature, agreeing representatives, closed
+        self.classes: Dict[Tuple[str, date, str], Dict[str, Any]] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def known_signatures(self, task_manager: TaskManager) -> Dict[str, str]:
+        key = (task_manager.target_country, task_manager.task_date)
+        with self._lock:
+            if key in self.signatures:
+                return self.signatures[key]
+        with self.bot_manager.db_connection.get_session() as session:
+            loaded = {
+                pa_id: signature
+                for pa_id, signature in session.execute(SELECT_COUNTRY_SIGNATURES, {"country": task_manager.target_country})
+            }
+        with self._lock:
+            # earlier days are not asked for again
+            for stale in [other for other in self.signatures if other[1] != key[1]]:
+                del self.signatures[stale]
+            for stale in [other for other in self.classes if other[1] != key[1]]:
+                del self.classes[stale]
+            return self.signatures.setdefault(key, loaded)
+
+    def observe(self, task_manager: TaskManager, task: Task, json_data: Dict[str, Any], today: date) -> int:
+        if not self.enabled:
+            return 0
+        signature = class_signature(json_data)
+        if signature is None:
+            return 0
+
+        signatures = self.known_signatures(task_manager)
+        with self._lock:
+            known = signatures.get(task.pa_id)
+            signatures[task.pa_id] = signature
+        # today's payload is the area's class from now on, written with the next batch of results
+        self.bot_manager.result_buffer.add_price_class(task.pa_id, signature, today)
+        if known is None:
+            return 0
+
+        # the class was learned from equal payloads on an earlier day, its members are only filled in
+        # once PLANNER_REPRESENTATIVES of them returned the same payload again today
+        key = (task_manager.target_country, task_manager.task_date, known)
+        with self._lock:
+            self.audited += 1
+            state = self.classes.setdefault(key, {"signature": signature, "agreed": 0, "closed": False})
+            if state["signature"] != signature:
+                # the representatives disagree, nobody in the class is filled in today
+                state["closed"] = True
+                expected, ready = state["signature"], False
+            else:
+                state["agreed"] += 1
+                expected, ready = None, not state["closed"] and state["agreed"] >= self.representatives
+                state["closed"] = state["closed"] or ready
+        if expected is not None:
+            # members stay planned and are released for fetching one by one
+            self.report_drift(task_manager, task, expected, signature, today)
+            return 0
+        if not ready:
+            return 0
+        return self.fan_out_members(task_manager, task, known, signature, json_data, today)
+
+    def report_drift(self, task_manager: TaskManager, task: Task, expected: str, actual: str, today: date) -> None:
+        # the postal area no longer returns its class's payload, the class is not fanned out today
+        with self._lock:
+            self.drift_count += 1
+            self.drift.append({
+                "date": str(today),
+                "country": task_manager.target_country,
+                "pa_id": task.pa_id,
+                "pa_code": task.pa_code,
+                "expected": expected,
+                "actual": actual
+            })
+        self.bot_manager.logger(task.pa_id, f"DRIFT | {task.pa_code} no longer matches its price class", force=True)
+
+    def fan_out_members(self, task_manager: TaskManager, task: Task, known: str, signature: str, json_data: Dict[str, Any], today: date) -> int:
+        with self.bot_manager.db_connection.checkout() as session:
+            members = session.execute(CLAIM_MEMBERS, {
+                "country": task_manager.target_country,
+                "tq_date": task_manager.task_date,
+                "pc_signature": known,
+                "lease_seconds": task_manager.lease_seconds
+            }).fetchall()
+        if not members:
+            return 0
+
+        payload_store = self.bot_manager.payload_store
+        pl_id, payload = payload_store.canonical(json_data)
+        template = payload_rows_cache.get(pl_id, json_data) if self.bot_manager.transform_to_tabular else None
+        save_db = self.bot_manager.save_json_db
+        for pa_id, pa_code, _ in members:
+            if self.bot_manager.save_json_file:
+                # index line only, the payload member is already in the archive
+                payload_store.save_file(today, task_manager.target_country, pa_code, pl_id, payload)
+            # acked together with the facts, a lost batch leaves the lease to run out
+            self.bot_manager.result_buffer.add(
+                task_manager, pa_id, 200, True,
+                pl_id=pl_id if save_db else None, payload=payload if save_db else None,
+                rows=fan_out(template, [pa_id]) if template is not None else None
+            )
+            self.bot_manager.result_buffer.add_price_class(pa_id, signature, today)
+        with self._lock:
+            self.fanned_out += len(members)
+        self.bot_manager.logger(task.pa_id, f"FAN-OUT | {len(members)} postal areas")
+        return len(members)
+
+    def learn(self, days: Optional[int] = None) -> int:
+        with self._lock:
+            self.signatures.clear()
+            self.classes.clear()
+        # classes from archived payloads, later days overwrite earlier ones
+        reader = JsonArchiveReader()
+        since = str(date.today() - timedelta(days=days or config.PLANNER_LEARN_DAYS))
+        learned = 0
+        for day in [day for day in reader.days() if day >= since]:
+            for country in reader.countries(day):
+                with self.bot_manager.db_connection.get_session() as session:
+                    areas: Dict[str, List[str]] = {}
+                    for pa_code, pa_id in session.execute(SELECT_COUNTRY_AREAS, {"country": country}):
+                        areas.setdefault(pa_code, []).append(pa_id)
+
+                params = []
+                for _, pa_codes, payload in reader.iter_payloads(day, country):
+                    signature = class_signature(json.loads(payload))
+                    if signature is None:
+                        continue
+                    params.extend(
+                        {"pa_id": pa_id, "pc_signature": signature, "pc_updated": day}
+                        for pa_code in pa_codes for pa_id in areas.get(pa_code, [])
+                    )
+                if params:
+                    with self.bot_manager.db_connection.checkout() as session:
+                        session.execute(MERGE_PRICE_CLASS, params)
+                learned += len(params)
+                self.bot_manager.logger(f"{day} | {country} | {len(params)} postal areas classified", force=True)
+        return learned
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "fanned_out": self.fanned_out,
+                "audited": self.audited,
+                "drift_count": self.drift_count,
+                "drift_ratio": round(self.drift_count / self.audited, 4) if self.audited else 0.0,
+                "drift": list(self.drift)
+            }
@@ -1,51 +1,320 @@
-from database.models import TCountry, TProvince, TCity, TPostalArea
-from sqlalchemy import or_
-from typing import List, Optional, Callable
+from database.models import TPostalArea
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from typing import Deque, List, NamedTuple, Optional, Callable
+from collections import deque
+from datetime import date
 import threading
+import time
 from database.connection import Connection
+from services.utils import config
+from services.bot.retry_policy import RetryPolicy
+
+TASK_PENDING = 0
+TASK_LEASED = 1
+TASK_DONE = 2
+TASK_DEAD = 3
+TASK_PLANNED = 4
+
+ENQUEUE_TASKS = text("""
+    IF NOT EXISTS (SELECT 1 FROM t_task_queue WHERE tq_country = :country AND tq_date = :tq_date)
+    INSERT INTO t_task_queue (pa_id, tq_date, tq_country, tq_status, tq_attempts)
+    SELECT t_postal_area.pa_id, :tq_date, :country, 0, 0
+    FROM t_postal_area
+    JOIN t_city ON t_city.ci_id = t_postal_area.ci_id
+    JOIN t_province ON t_province.p_id = t_city.p_id
+    JOIN t_country ON t_country.c_id = t_province.c_id
+    WHERE t_country.c_name = :country
+      AND (t_postal_area.pa_status_code != 200 OR t_postal_area.pa_status_code IS NULL);
+""")
+
+COUNT_TASKS = text("""
+    SELECT COUNT(*) AS total,
+        COALESCE(SUM(CASE WHEN tq_status IN (2, 3) THEN 1 ELSE 0 END), 0) AS done,
+        COALESCE(SUM(CASE WHEN tq_status = 3 THEN 1 ELSE 0 END), 0) AS dead
+    FROM t_task_queue
+    WHERE tq_country = :country AND tq_date = :tq_date;
+""")
+
+COUNT_OPEN_TASKS = text("""
+    SELECT COUNT(*)
+    FROM t_task_queue
+    WHERE tq_country = :country AND tq_date = :tq_date AND tq_status IN (0, 1);
+""")
+
+# claims pending rows and rows whose lease expired, READPAST lets concurrent claimers skip each other
+CLAIM_TASKS = text("""
+    WITH claim AS (
+        SELECT TOP (:batch_size) *
+        FROM t_task_queue WITH (ROWLOCK, UPDLOCK, READPAST)
+        WHERE tq_country = :country AND tq_date = :tq_date
+          AND tq_status IN (0, 1)
+          AND (tq_lease_until IS NULL OR tq_lease_until < SYSUTCDATETIME())
+        ORDER BY pa_id
+    )
+    UPDATE claim
+    SET tq_status = 1,
+        tq_attempts = tq_attempts + 1,
+        tq_lease_until = DATEADD(second, :lease_seconds, SYSUTCDATETIME())
+    OUTPUT inserted.pa_id, inserted.tq_attempts;
+""")
+
+ACK_TASK = text("""
+    UPDATE t_task_queue
+    SET tq_status = 2, tq_lease_until = NULL
+    WHERE pa_id = :pa_id AND tq_date = :tq_date;
+""")
+
+RELEASE_TASK = text("""
+    UPDATE t_task_queue
+    SET tq_status = 0, tq_lease_until = NULL, tq_attempts = tq_attempts - 1
+    WHERE pa_id = :pa_id AND tq_date = :tq_date AND tq_status = 1;
+""")
+
+# back to pending, but not claimable before the backoff delay has passed
+RETRY_TASK = text("""
+    UPDATE t_task_queue
+    SET tq_status = 0, tq_lease_until = DATEADD(millisecond, :delay_ms, SYSUTCDATETIME())
+    WHERE pa_id = :pa_id AND tq_date = :tq_date;
+""")
+
+DEAD_TASK = text("""
+    UPDATE t_task_queue
+    SET tq_status = 3, tq_lease_until = NULL
+    WHERE pa_id = :pa_id AND tq_date = :tq_date;
+""")
+
+MERGE_DEAD_LETTER = text("""
+    MERGE t_dead_letter WITH (HOLDLOCK) AS target
+    USING (SELECT :pa_id AS pa_id, :dl_date AS dl_date) AS source
+    ON target.pa_id = source.pa_id AND target.dl_date = source.dl_date
+    WHEN MATCHED THEN UPDATE SET
+        dl_error = :dl_error, dl_status_code = :dl_status_code, dl_attempts = :dl_attempts, dl_last_attempt = SYSUTCDATETIME()
+    WHEN NOT MATCHED THEN INSERT (pa_id, dl_date, dl_error, dl_status_code, dl_attempts, dl_last_attempt)
+        VALUES (:pa_id, :dl_date, :dl_error, :dl_status_code, :dl_attempts, SYSUTCDATETIME());
+""")
+
+# members of a known price class wait as planned (4) for the fan-out of a fetched representative,
+# a few representatives and a rotating audit sample per class stay pending; the seed rotates daily
+PLAN_TASKS = text("""
+    WITH ranked AS (
+        SELECT t_task_queue.pa_id,
+            ROW_NUMBER() OVER (
+                PARTITION BY t_price_class.pc_signature
+                ORDER BY CHECKSUM(t_task_queue.pa_id, :seed), t_task_queue.pa_id
+            ) AS rn,
+            ABS(CHECKSUM(:seed, t_task_queue.pa_id) % 10000) AS audit_slot
+        FROM t_task_queue
+        JOIN t_price_class ON t_price_class.pa_id = t_task_queue.pa_id
+        WHERE t_task_queue.tq_country = :country AND t_task_queue.tq_date = :tq_date
+          AND t_task_queue.tq_status = 0 AND t_task_queue.tq_attempts = 0
+    )
+    UPDATE t_task_queue
+    SET tq_status = 4
+    FROM t_task_queue
+    JOIN ranked ON ranked.pa_id = t_task_queue.pa_id
+    WHERE t_task_queue.tq_date = :tq_date
+      AND ranked.rn > :representatives AND ranked.audit_slot >= :audit_slots;
+""")
+
+# nothing open is left to fan out from (representative failed or drifted), fetch the rest one by one
+RELEASE_PLANNED = text("""
+    UPDATE t_task_queue
+    SET tq_status = 0, tq_lease_until = NULL
+    WHERE tq_country = :country AND tq_date = :tq_date AND tq_status = 4;
+""")
+
+class Task(NamedTuple):
+    pa_id: str
+    pa_code: str
+    pa_status_code: Optional[int]
+    attempts: int
 
 class TaskManager:
-    def __init__(self, db_connection: Connection, target_country: str, target_url: str, logger: Callable[..., None]):
+    def __init__(self, db_connection: Connection, target_country: str, target_url: str, logger: Callable[..., None], retry_policy: Optional[RetryPolicy] = None):
         self.db_connection: Connection = db_connection
         self.target_country: str = target_country
         self.target_url: str = target_url
-        self.task_list: List[TPostalArea] = []
+        self.task_date: date = date.today()
+        self.task_buffer: Deque[Task] = deque()
+        self.total: int = 0
         self.index: int = 0
+        self.success: int = 0
+        self.retried: int = 0
+        self.dead: int = 0
+        self.retry_policy: RetryPolicy = retry_policy or RetryPolicy.from_config()
+        self.retry_budget: int = 0
+        self.next_claim: float = 0.0
+        self.batch_size: int = config.TASK_QUEUE_BATCH_SIZE
+        self.lease_seconds: int = config.TASK_QUEUE_LEASE_SECONDS
+        self.plan_enabled: bool = config.PLANNER_ENABLED
+        self.planned: int = 0
         self.logger: Callable[..., None] = logger
         self._lock: threading.Lock = threading.Lock()
-    
+
     def info(self, target=None) -> None:
-        self.logger({"id":self.target_country, "data":f"{self.index}/{len(self.task_list)}"}, force=True, action='get_num_task', target=target, raw=True)
+        self.logger({"id":self.target_country, "data":f"{self.index}/{self.total}"}, force=True, action='get_num_task', target=target, raw=True)
+        self.logger(
+            {"id": self.target_country, "success": self.success, "retry": self.retried, "dead": self.dead},
+            force=True, action='get_task_stats', target=target, raw=True
+        )
 
     def set_task(self) -> None:
         try:
-            with self.db_connection.get_session() as session:   
-                self.task_list = (
-                    session.query(TPostalArea)
-                    .select_from(TPostalArea)
-                    .join(TCity, TCity.ci_id == TPostalArea.ci_id)
-                    .join(TProvince, TProvince.p_id == TCity.p_id)
-                    .join(TCountry, TCountry.c_id == TProvince.c_id)
-                    .filter(
-                        or_(
-                            TPostalArea.pa_status_code != 200,
-                            TPostalArea.pa_status_code.is_(None)
-                        ),
-                        TCountry.c_name == self.target_country
-                    )
-                    .all()
-                )
-                self.index = 0
+            with self.db_connection.get_session() as session:
+                self.task_date = date.today()
+                params = {"country": self.target_country, "tq_date": self.task_date}
+                session.execute(ENQUEUE_TASKS, params)
+                session.commit()
+                if self.plan_enabled:
+                    self.planned = self.plan(session)
+
+                counts = session.execute(COUNT_TASKS, params).one()
+                self.total = counts.total
+                self.index = counts.done
+                self.dead = counts.dead
+                self.success = 0
+                self.retried = 0
+                self.retry_budget = self.retry_policy.budget(self.total - self.index)
+                self.task_buffer.clear()
+                self.next_claim = 0.0
         except Exception as e:
             self.logger(f"Error: {e}", force=True)
         self.info()
 
-    def get_task(self) -> Optional[TPostalArea]:
+    def plan(self, session: Session) -> int:
+        planned = session.execute(PLAN_TASKS, {
+            "country": self.target_country,
+            "tq_date": self.task_date,
+            "seed": self.task_date.toordinal(),
+            "representatives": config.PLANNER_REPRESENTATIVES,
+            "audit_slots": int(config.PLANNER_AUDIT_RATIO * 10000)
+        }).rowcount or 0
+        session.commit()
+        if planned:
+            self.logger(f"{self.target_country} | {planned} postal areas planned for fan-out", force=True)
+        return max(planned, 0)
+
+    def _claim(self, batch_size: Optional[int] = None) -> List[Task]:
+        with self.db_connection.get_session() as session:
+            claimed = {
+                row.pa_id: row.tq_attempts
+                for row in session.execute(CLAIM_TASKS, {
+                    "batch_size": batch_size or self.batch_size,
+                    "country": self.target_country,
+                    "tq_date": self.task_date,
+                    "lease_seconds": self.lease_seconds
+                })
+            }
+            session.commit()
+
+            if not claimed:
+                return []
+
+            rows = (
+                session.query(TPostalArea.pa_id, TPostalArea.pa_code, TPostalArea.pa_status_code)
+                .filter(TPostalArea.pa_id.in_(list(claimed)))
+                .all()
+            )
+            return [
+                Task(pa_id=row.pa_id, pa_code=row.pa_code, pa_status_code=row.pa_status_code, attempts=claimed[row.pa_id])
+                for row in rows
+            ]
+
+    def claim_shard(self, size: int) -> List[Task]:
+        # a leased run of open tasks in pa_id order, handed to a remote worker as a whole
+        return self._claim(batch_size=size)
+
+    def get_task(self) -> Optional[Task]:
+        with self._lock:
+            if not self.task_buffer and time.monotonic() >= self.next_claim:
+                try:
+                    self.task_buffer.extend(self._claim())
+                except Exception as e:
+                    self.logger(f"Error: {e}", force=True)
+                if not self.task_buffer:
+                    # nothing claimable right now, poll again later
+                    self.next_claim = time.monotonic() + 1
+            if self.task_buffer:
+                return self.task_buffer.popleft()
+            return None
+
+    def is_done(self) -> bool:
+        with self._lock:
+            if self.task_buffer:
+                return False
+        try:
+            with self.db_connection.get_session() as session:
+                params = {"country": self.target_country, "tq_date": self.task_date}
+                if session.execute(COUNT_OPEN_TASKS, params).scalar() != 0:
+                    return False
+                if self.plan_enabled:
+                    released = session.execute(RELEASE_PLANNED, params).rowcount or 0
+                    session.commit()
+                    if released > 0:
+                        self.logger(f"{self.target_country} | {released} planned postal areas released for fetching", force=True)
+                        return False
+                return True
+        except Exception as e:
+            self.logger(f"Error: {e}", force=True)
+            return True
+
+    def ack(self, pa_id: str, success: bool = True, session: Optional[Session] = None) -> None:
+        # a worker passes its own session, it never holds a second connection for the ack
+        if session is not None:
+            session.execute(ACK_TASK, {"pa_id": pa_id, "tq_date": self.task_date})
+            session.commit()
+        else:
+            with self.db_connection.get_session() as own_session:
+                own_session.execute(ACK_TASK, {"pa_id": pa_id, "tq_date": self.task_date})
+                own_session.commit()
+        self.record_acks(1 if success else 0, 1)
+
+    def ack_many(self, session: Session, pa_ids: List[str]) -> None:
+        # caller commits, the counters follow with record_acks once it did
+        if pa_ids:
+            session.execute(ACK_TASK, [{"pa_id": pa_id, "tq_date": self.task_date} for pa_id in pa_ids])
+
+    def record_acks(self, success: int, total: int) -> None:
+        with self._lock:
+            self.index += total
+            self.success += success
+        self.info()
+
+    def take_retry(self) -> bool:
+        with self._lock:
+            if self.retried < self.retry_budget:
+                self.retried += 1
+                return True
+            return False
+
+    def retry(self, pa_id: str, delay: float) -> None:
+        with self.db_connection.get_session() as session:
+            session.execute(RETRY_TASK, {"pa_id": pa_id, "tq_date": self.task_date, "delay_ms": int(delay * 1000)})
+            session.commit()
+        self.info()
+
+    def dead_letter(self, task: Task, status_code: Optional[int], error: str) -> None:
+        with self.db_connection.get_session() as session:
+            session.execute(MERGE_DEAD_LETTER, {
+                "pa_id": task.pa_id,
+                "dl_date": self.task_date,
+                "dl_error": error[:255],
+                "dl_status_code": status_code,
+                "dl_attempts": task.attempts
+            })
+            session.execute(DEAD_TASK, {"pa_id": task.pa_id, "tq_date": self.task_date})
+            session.commit()
+        with self._lock:
+            self.index += 1
+            self.dead += 1
+        self.info()
+
+    def release(self) -> None:
         with self._lock:
-            self.info()
-            if self.index < len(self.task_list):
-                task = self.task_list[self.index]
-                self.index += 1
-                return task
-            else:
-                return None
\ No newline at end of file
+            tasks = list(self.task_buffer)
+            self.task_buffer.clear()
+        if tasks:
+            with self.db_connection.get_session() as session:
+                session.execute(RELEASE_TASK, [{"pa_id": task.pa_id, "tq_date": self.task_date} for task in tasks])
+                session.commit()
@@ -1,15 +1,10 @@
 import requests
 import time
-import random
-import os
-import json
-from sqlalchemy.exc import IntegrityError
-from database.models import TPostalArea
 from services.bot.interfaces import IBotManager
-from sqlalchemy.orm import Session
+from services.bot.result_handler import ResultHandler
+from services.bot.result_buffer import BufferedResultHandler
 from datetime import date
-from services.bot.task_manager import TaskManager
-from typing import Optional
+from services.bot.task_manager import TaskManager, Task
 from database.connection import Connection
 from services.utils import config
 
@@ -17,93 +12,83 @@ class WorkerManager:
     def __init__(self, bot_manager: IBotManager, db_connection: Connection):
         self.bot_manager: IBotManager = bot_manager
         self.db_connection: Connection = db_connection
-        self.session: Optional[Session] = None
+        self.result_handler: ResultHandler = ResultHandler(bot_manager=bot_manager)
+        self.buffered_handler: BufferedResultHandler = BufferedResultHandler(bot_manager=bot_manager)
         self.run: bool = False
 
-    def close_session(self) -> None:
-        if self.session:
-            self.session.close()
-
     def stop(self) -> None:
         self.run = False
 
     def start(self) -> None:
         self.run = True
-        self.session = self.db_connection.open_session()
         try:
             while self.run:
                 completed_tasks = 0
+                worked = False
                 today = date.today()
                 for task_manager in self.bot_manager.task_manager_list:
                     task_manager: TaskManager
                     task = task_manager.get_task()
                     if task is not None:
-                        self.work(target_url=task_manager.target_url,
-                                target_country=task_manager.target_country,
-                                t_postal_area=task,
-                                today=today)
-                    else:
+                        self.work(task_manager=task_manager, task=task, today=today)
+                        worked = True
+                    elif task_manager.is_done():
                         completed_tasks += 1
                         #self.bot_manager.logger(f"Completed Tasks: {completed_tasks}/{len(self.bot_manager.task_manager_list)}", force=True)
-                
+
                 if completed_tasks == len(self.bot_manager.task_manager_list):
                     break
+                if not worked:
+                    # only retries waiting for their backoff are left
+                    # fast path results and planner fan-outs wait in the buffer
+                    self.bot_manager.result_buffer.maybe_flush()
+                    time.sleep(1)
         except Exception as e:
             self.bot_manager.logger(f"Error: {e}", force=True)
-        finally:
-            self.close_session()
-
-    def work(self, target_url: str, target_country: str, t_postal_area: TPostalArea, today: date) -> None:
-        t_postal_area = self.session.merge(t_postal_area)
-
-        pa_code = t_postal_area.pa_code
-        if t_postal_area.pa_status_code != 400:
-            status_code_tmp = None
-            try:
-                self.bot_manager.logger(t_postal_area.pa_id, f"{target_url}{pa_code}")
-                response = requests.get(f"{target_url}{pa_code}", proxies=self.bot_manager.proxies, headers=self.bot_manager.headers)
-                
-                t_postal_area.pa_status_code = response.status_code
-                status_code_tmp = response.status_code
-
-                response.raise_for_status()
 
-                if self.bot_manager.save_json_db:
-                    self.bot_manager.logger(t_postal_area.pa_id, "Saving JSON in Database")
-                    t_postal_area.pa_data = json.dumps(response.json())
+    def work(self, task_manager: TaskManager, task: Task, today: date) -> None:
+        target_url = task_manager.target_url
+        pa_code = task.pa_code
+        if task.pa_status_code == 400:
+            self.bot_manager.logger(task.pa_id, pa_code, "NO DATA!")
+            if self.bot_manager.fast_path:
+                self.buffered_handler.no_data(task_manager, task)
+            else:
+                task_manager.ack(task.pa_id, success=False)
+            return
 
-                self.bot_manager.logger(t_postal_area.pa_id, "Data: ", str(t_postal_area.pa_data)[0:200]+"...")
-                self.session.commit()
-
-                if self.bot_manager.save_json_file:
-                    self.bot_manager.logger(t_postal_area.pa_id, "Saving JSON File")
-                    folder = f"{config.JSON_LOG_DIR}/{today}/{target_country}"
-                    os.makedirs(folder, exist_ok=True)
-
-                    filename = f"{pa_code}.json"
-                    filepath = os.path.join(folder, filename)
+        status_code = None
+        rate_limiter = self.bot_manager.get_rate_limiter(target_url)
+        rate_limiter.acquire()
+        started = time.monotonic()
+        try:
+            self.bot_manager.logger(task.pa_id, f"{target_url}{pa_code}")
+            response = requests.get(f"{target_url}{pa_code}", proxies=self.bot_manager.proxies, headers=self.bot_manager.headers, timeout=config.FETCH_TIMEOUT)
+            status_code = response.status_code
+            rate_limiter.feedback(status_code, time.monotonic() - started, response.headers.get("Retry-After"))
 
-                    with open(filepath, "w", encoding="utf-8") as f:
-                        json.dump(response.json(), f, ensure_ascii=False, indent=4)
-                
-                if self.bot_manager.transform_to_tabular:
-                    self.bot_manager.logger(t_postal_area.pa_id, "Transforming JSON..")
-                    self.bot_manager._tabular_transform_tr(pa_id=t_postal_area.pa_id, json_data=response.json(), log=True)
-            
-            except IntegrityError as e:
-                # commit status code
-                self.bot_manager.logger(t_postal_area.pa_id, "Duplicate")
-                self.session.rollback()
-                t_postal_area.pa_status_code = status_code_tmp
-                self.session.commit()
-            except requests.RequestException as e:
-                # commit status code
-                self.bot_manager.logger(t_postal_area.pa_id, "Status Code:", t_postal_area.pa_status_code)
-                self.session.commit()
+            response.raise_for_status()
+            json_data = response.json()
+        except requests.RequestException as e:
+            if status_code is None:
+                rate_limiter.feedback(None, time.monotonic() - started)
+            error = type(e).__name__ if status_code is None else f"HTTP {status_code}"
+            try:
+                if self.bot_manager.fast_path:
+                    self.buffered_handler.fail(task_manager, task, status_code, error)
+                    return
+                with self.db_connection.checkout() as session:
+                    self.result_handler.fail(session, task_manager, task, status_code, error, today)
             except Exception as e:
-                self.session.rollback()
-                self.bot_manager.logger(t_postal_area.pa_id, f"Error: {e}")
+                self.bot_manager.logger(task.pa_id, f"Error: {e}")
+            return
 
-            time.sleep(random.uniform(self.bot_manager.fetch_min_delay, self.bot_manager.fetch_max_delay))
-        else:
-            self.bot_manager.logger(t_postal_area.pa_id, pa_code, "NO DATA!")
\ No newline at end of file
+        # connection is only held for the write, not while waiting on the network
+        try:
+            if self.bot_manager.fast_path:
+                self.buffered_handler.complete(task_manager, task, status_code, json_data, today)
+                return
+            with self.db_connection.checkout() as session:
+                self.result_handler.complete(session, task_manager, task, status_code, json_data, today)
+        except Exception as e:
+            self.bot_manager.logger(task.pa_id, f"Error: {e}")
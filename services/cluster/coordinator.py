@@ -0,0 +1,143 @@
+import threading
+import uuid
+from datetime import date
+from typing import Any, Dict, List, NamedTuple, Optional
+from services.bot.interfaces import IBotManager
+from services.bot.result_buffer import BufferedResultHandler
+from services.bot.task_manager import TaskManager, Task
+from services.result_cache import data_generation
+from services.utils import config
+
+class Shard(NamedTuple):
+    shard_id: str
+    worker_id: str
+    task_manager: TaskManager
+    tasks: Dict[str, Task]
+    today: date
+
+class Coordinator:
+    def __init__(self, bot_manager: IBotManager, shard_size: Optional[int] = None):
+        self.bot_manager: IBotManager = bot_manager
+        self.shard_size: int = shard_size or config.CLUSTER_SHARD_SIZE
+        self.handler: BufferedResultHandler = BufferedResultHandler(bot_manager=bot_manager)
+        # shards handed out and not yet submitted, the t_task_queue lease is the source of truth
+        self.shards: Dict[str, Shard] = {}
+        self.finished: bool = True
+        self._lock: threading.Lock = threading.Lock()
+
+    def prepare(self) -> None:
+        # enqueueing is idempotent per country and day, every coordinator may call it
+        self.bot_manager.task_manager_init()
+        with self._lock:
+            self.finished = False
+
+    def lease(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        for task_manager in list(self.bot_manager.task_manager_list):
+            task_manager: TaskManager
+            tasks = task_manager.claim_shard(self.shard_size)
+            if not tasks:
+                continue
+            shard = Shard(
+                shard_id=uuid.uuid4().hex,
+                worker_id=worker_id,
+                task_manager=task_manager,
+                tasks={task.pa_id: task for task in tasks},
+                today=date.today()
+            )
+            with self._lock:
+                self.shards[shard.shard_id] = shard
+                self.finished = False
+            rate = self.share(task_manager.target_url)
+            self.bot_manager.logger(f"Shard {shard.shard_id} | {task_manager.target_country} | {len(tasks)} tasks -> {worker_id}")
+            return {
+                "shard_id": shard.shard_id,
+                "country": task_manager.target_country,
+                "url": task_manager.target_url,
+                "rate": rate,
+                "tasks": [[task.pa_id, task.pa_code, task.pa_status_code] for task in tasks]
+            }
+
+        self._maybe_finish()
+        return None
+
+    def share(self, target_url: str) -> float:
+        # every open shard of the same site gets an equal share of its configured rate
+        with self._lock:
+            active = sum(1 for shard in self.shards.values() if shard.task_manager.target_url == target_url)
+        return self.bot_manager.get_rate_limiter(target_url).max_rate / max(active, 1)
+
+    def rate(self, shard_id: str) -> Optional[float]:
+        # polled by the workers while they run a shard, the share shrinks when another shard of
+        # the site opens and grows again when one is submitted
+        with self._lock:
+            shard = self.shards.get(shard_id)
+        if shard is None:
+            return None
+        return self.share(shard.task_manager.target_url)
+
+    def submit(self, shard_id: str, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        with self._lock:
+            shard = self.shards.pop(shard_id, None)
+        if shard is None:
+            # lease lost (coordinator restart), the tasks are claimed again once it runs out
+            return {"accepted": 0, "error": "unknown shard"}
+
+        accepted = 0
+        for result in results:
+            task = shard.tasks.get(result.get("pa_id"))
+            if task is None:
+                continue
+            status_code = result.get("status_code")
+            try:
+                if result.get("skipped"):
+                    self.handler.no_data(shard.task_manager, task)
+                elif result.get("data") is not None:
+                    self.handler.complete(shard.task_manager, task, status_code, result["data"], shard.today)
+                else:
+                    self.handler.fail(shard.task_manager, task, status_code, result.get("error") or f"HTTP {status_code}")
+                accepted += 1
+            except Exception as e:
+                self.bot_manager.logger(task.pa_id, f"Error: {e}")
+
+        self.bot_manager.result_buffer.maybe_flush()
+        return {"accepted": accepted}
+
+    def is_done(self) -> bool:
+        with self._lock:
+            if self.shards:
+                return False
+        return all(task_manager.is_done() for task_manager in self.bot_manager.task_manager_list)
+
+    def _maybe_finish(self) -> None:
+        with self._lock:
+            if self.finished:
+                return
+        # buffered acks still count as open tasks
+        self.bot_manager.result_buffer.flush()
+        if not self.is_done():
+            return
+        with self._lock:
+            if self.finished:
+                return
+            self.finished = True
+        # the same closing steps run_workers takes after its threads joined
+        self.bot_manager.result_buffer.flush()
+        self.bot_manager.payload_store.close()
+        self.bot_manager._tabular_transform_finish()
+        data_generation.bump(self.bot_manager.db_connection)
+        self.bot_manager.logger("All shards completed!", force=True)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            leased = [
+                {"shard_id": shard.shard_id, "worker_id": shard.worker_id, "country": shard.task_manager.target_country, "tasks": len(shard.tasks)}
+                for shard in self.shards.values()
+            ]
+        return {
+            "shard_size": self.shard_size,
+            "leased": leased,
+            "countries": [
+                {"country": task_manager.target_country, "done": task_manager.index, "total": task_manager.total}
+                for task_manager in self.bot_manager.task_manager_list
+            ]
+        }
@@ -0,0 +1,92 @@
+import requests
+import time
+from typing import Any, Callable, Dict, List, Optional
+from services.bot.rate_limiter import RateLimiter
+from services.cluster.transport import Transport
+from services.utils import config
+
+class ShardWorker:
+    def __init__(self, transport: Transport, worker_id: str, logger: Callable[..., None]):
+        self.transport: Transport = transport
+        self.worker_id: str = worker_id
+        self.logger: Callable[..., None] = logger
+        self.session: requests.Session = requests.Session()
+        self.session.headers.update(config.FETCH_HEADER)
+        self.proxies: Optional[Dict[str, str]] = config.PROXIES if config.USE_PROXY else None
+        # per worker, capped by the share of the site's rate that comes with every shard
+        self.rate_limiters: Dict[str, RateLimiter] = {}
+        self.run: bool = False
+
+    def get_rate_limiter(self, country_name: str, target_url: str) -> RateLimiter:
+        if target_url not in self.rate_limiters:
+            country_config = next((country for country in config.COUNTRY_CONFIG if country["name"] == country_name), {})
+            self.rate_limiters[target_url] = RateLimiter.from_config(country_config)
+        return self.rate_limiters[target_url]
+
+    def fetch(self, rate_limiter: RateLimiter, target_url: str, pa_id: str, pa_code: str) -> Dict[str, Any]:
+        status_code = None
+        rate_limiter.acquire()
+        started = time.monotonic()
+        try:
+            response = self.session.get(f"{target_url}{pa_code}", proxies=self.proxies, timeout=config.FETCH_TIMEOUT)
+            status_code = response.status_code
+            rate_limiter.feedback(status_code, time.monotonic() - started, response.headers.get("Retry-After"))
+            response.raise_for_status()
+            return {"pa_id": pa_id, "status_code": status_code, "data": response.json()}
+        except (requests.RequestException, ValueError) as e:
+            if status_code is None:
+                rate_limiter.feedback(None, time.monotonic() - started)
+            error = type(e).__name__ if status_code is None else f"HTTP {status_code}"
+            return {"pa_id": pa_id, "status_code": status_code, "error": error}
+
+    def refresh_rate(self, rate_limiter: RateLimiter, shard_id: str) -> None:
+        # the share follows the shards of the site that are open right now
+        try:
+            rate = self.transport.rate(shard_id)
+        except Exception as e:
+            self.logger(f"{self.worker_id} | Rate refresh failed: {e}")
+            return
+        if rate:
+            rate_limiter.cap(rate)
+
+    def work(self, shard: Dict[str, Any]) -> List[Dict[str, Any]]:
+        rate_limiter = self.get_rate_limiter(shard["country"], shard["url"])
+        rate_limiter.cap(shard["rate"])
+        refreshed = time.monotonic()
+        results = []
+        for pa_id, pa_code, pa_status_code in shard["tasks"]:
+            if not self.run:
+                # unsent tasks stay leased and are claimed again when the lease runs out
+                break
+            if time.monotonic() - refreshed >= config.CLUSTER_POLL_INTERVAL:
+                self.refresh_rate(rate_limiter, shard["shard_id"])
+                refreshed = time.monotonic()
+            if pa_status_code == 400:
+                results.append({"pa_id": pa_id, "status_code": pa_status_code, "skipped": True})
+                continue
+            result = self.fetch(rate_limiter, shard["url"], pa_id, pa_code)
+            self.logger(self.worker_id, pa_id, pa_code, result["status_code"])
+            results.append(result)
+        return results
+
+    def stop(self) -> None:
+        self.run = False
+
+    def start(self) -> None:
+        self.run = True
+        while self.run:
+            try:
+                shard = self.transport.lease(self.worker_id)
+                if shard is None:
+                    if self.transport.is_done():
+                        break
+                    # only retries waiting for their backoff are left
+                    time.sleep(config.CLUSTER_POLL_INTERVAL)
+                    continue
+                results = self.work(shard)
+                response = self.transport.submit(shard["shard_id"], results)
+                self.logger(f"{self.worker_id} | shard {shard['shard_id']} | {response.get('accepted', 0)}/{len(shard['tasks'])} accepted")
+            except Exception as e:
+                self.logger(f"{self.worker_id} | Error: {e}")
+                time.sleep(config.CLUSTER_POLL_INTERVAL)
+        self.logger(f"{self.worker_id} | done")
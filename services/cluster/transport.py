@@ -0,0 +1,74 @@
+import json
+import requests
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+from services.cluster.coordinator import Coordinator
+from services.utils import config
+
+class Transport(ABC):
+    @abstractmethod
+    def lease(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def submit(self, shard_id: str, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        pass
+
+    @abstractmethod
+    def rate(self, shard_id: str) -> Optional[float]:
+        pass
+
+    @abstractmethod
+    def is_done(self) -> bool:
+        pass
+
+class LoopbackTransport(Transport):
+    def __init__(self, coordinator: Coordinator):
+        self.coordinator: Coordinator = coordinator
+
+    @staticmethod
+    def _wire(message: Any) -> Any:
+        # same json round trip as over http, so anything that would not serialize fails here too
+        return json.loads(json.dumps(message))
+
+    def lease(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        return self._wire(self.coordinator.lease(worker_id))
+
+    def submit(self, shard_id: str, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return self._wire(self.coordinator.submit(shard_id, self._wire(results)))
+
+    def rate(self, shard_id: str) -> Optional[float]:
+        return self._wire(self.coordinator.rate(shard_id))
+
+    def is_done(self) -> bool:
+        return self.coordinator.is_done()
+
+class HttpTransport(Transport):
+    def __init__(self, base_url: str, token: Optional[str] = None):
+        self.base_url: str = base_url.rstrip("/")
+        self.session: requests.Session = requests.Session()
+        token = token if token is not None else config.CLUSTER_TOKEN
+        if token:
+            self.session.headers["X-Cluster-Token"] = token
+
+    def _post(self, path: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        response = self.session.post(f"{self.base_url}/api/cluster{path}", json=body, timeout=config.FETCH_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+
+    def prepare(self) -> Dict[str, Any]:
+        return self._post("/prepare", {})
+
+    def lease(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        return self._post("/lease", {"worker_id": worker_id}).get("shard")
+
+    def submit(self, shard_id: str, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return self._post("/submit", {"shard_id": shard_id, "results": results})
+
+    def rate(self, shard_id: str) -> Optional[float]:
+        return self._post("/rate", {"shard_id": shard_id}).get("rate")
+
+    def is_done(self) -> bool:
+        response = self.session.get(f"{self.base_url}/api/cluster/status", timeout=config.FETCH_TIMEOUT)
+        response.raise_for_status()
+        return bool(response.json().get("done"))
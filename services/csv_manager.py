@@ -1,7 +1,9 @@
 import pandas as pd
 from database.models import TCountry, TProvince, TCity, TPostalArea
 import services.utils
-from typing import Callable
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from typing import Callable, Set
 from database.connection import Connection
 
 class CSVManager:
@@ -14,6 +16,21 @@ class CSVManager:
             return str(val).strip().lower()
         raise ValueError("Input value is NaN or None")
 
+    def safe_lower_series(self, series: pd.Series) -> pd.Series:
+        return series.astype(str).str.strip().str.lower()
+
+    def md5_hash_series(self, series: pd.Series) -> pd.Series:
+        # hash every distinct key once, then map back onto the frame
+        hashes = {key: services.utils.md5_hash(key) for key in series.unique()}
+        return series.map(hashes)
+
+    def bulk_insert(self, session: Session, model, frame: pd.DataFrame) -> int:
+        records = frame.to_dict("records")
+        batch_size = services.utils.config.IMPORT_BATCH_SIZE
+        for start in range(0, len(records), batch_size):
+            session.execute(insert(model), records[start:start + batch_size])
+        return len(records)
+
     def import_geo(self, csv_path, sep, country_name, country_vat, country_currency, province_header, city_header, additional_header, postal_code_header) -> None:
         try:
             with self.db_connection.get_session() as session:
@@ -29,71 +46,73 @@ class CSVManager:
                     session.commit()
 
                 self.logger("25% [Province]", country_name, force=True)
-                province_count = 0
-                provinces_seen = set()
-                for province_name in df[province_header].dropna().unique():
-                    province_key = self.safe_lower(province_name)
-                    p_id = services.utils.md5_hash(country_key + province_key)
-                    if p_id not in provinces_seen:
-                        provinces_seen.add(p_id)
-                        if not session.query(TProvince).filter_by(p_id=p_id).first():
-                            province = TProvince(p_id=p_id, p_name=province_name, c_id=c_id)
-                            session.add(province)
-                            province_count += 1
+                provinces = df[[province_header]].dropna()
+                provinces = provinces.assign(p_id=self.md5_hash_series(country_key + self.safe_lower_series(provinces[province_header])))
+                provinces = provinces.drop_duplicates(subset="p_id")
+
+                existing_provinces: Set[str] = {
+                    p_id for (p_id,) in session.query(TProvince.p_id).filter(TProvince.c_id == c_id)
+                }
+                new_provinces = provinces[~provinces["p_id"].isin(existing_provinces)]
+                province_count = self.bulk_insert(
+                    session,
+                    TProvince,
+                    pd.DataFrame({"p_id": new_provinces["p_id"], "p_name": new_provinces[province_header], "c_id": c_id})
+                )
                 session.commit()
 
                 self.logger("50% [City]", country_name, force=True)
-                city_count = 0
-                cities_seen = set()
-                for _, row in df.iterrows():
-                    city_name = row.get(city_header)
-                    province_name = row.get(province_header)
-                    if pd.notna(city_name) and pd.notna(province_name):
-                        city_key = self.safe_lower(city_name)
-                        province_key = self.safe_lower(province_name)
-                        ci_id = services.utils.md5_hash(country_key + province_key + city_key)
-                        if ci_id not in cities_seen:
-                            cities_seen.add(ci_id)
-                            p_id = services.utils.md5_hash(country_key + province_key)
-                            if not session.query(TCity).filter_by(ci_id=ci_id).first():
-                                city = TCity(ci_id=ci_id, ci_name=city_name, p_id=p_id)
-                                session.add(city)
-                                city_count += 1
+                geo = df[df[city_header].notna() & df[province_header].notna()]
+                province_keys = country_key + self.safe_lower_series(geo[province_header])
+                geo = geo.assign(
+                    p_id=self.md5_hash_series(province_keys),
+                    ci_id=self.md5_hash_series(province_keys + self.safe_lower_series(geo[city_header]))
+                )
+                cities = geo.drop_duplicates(subset="ci_id")
+
+                existing_cities: Set[str] = {
+                    ci_id for (ci_id,) in (
+                        session.query(TCity.ci_id)
+                        .join(TProvince, TProvince.p_id == TCity.p_id)
+                        .filter(TProvince.c_id == c_id)
+                    )
+                }
+                new_cities = cities[~cities["ci_id"].isin(existing_cities)]
+                city_count = self.bulk_insert(
+                    session,
+                    TCity,
+                    pd.DataFrame({"ci_id": new_cities["ci_id"], "ci_name": new_cities[city_header], "p_id": new_cities["p_id"]})
+                )
                 session.commit()
 
                 self.logger("75% [Postal Area]", country_name, force=True)
-                postal_count = 0
-                postal_seen = set()
-                for _, row in df.iterrows():
-                    city_name = row.get(city_header)
-                    province_name = row.get(province_header)
-                    additional = row.get(additional_header) if additional_header in row else None
-                    postal_code = row.get(postal_code_header)
-
-                    if pd.notna(city_name) and pd.notna(province_name) and pd.notna(postal_code):
-                        postal_code = postal_code.replace(' ', '')
-                        city_key = self.safe_lower(city_name)
-                        province_key = self.safe_lower(province_name)
-                        postal_key = self.safe_lower(postal_code)
-                        
-                        pa_id = services.utils.md5_hash(country_key + postal_key) # uniq postal pro country
-
-                        if pa_id not in postal_seen:
-                            postal_seen.add(pa_id)
-                            pa_name = None
-                            if pd.notna(additional) and str(additional).strip():
-                                pa_name = str(additional).strip()
+                postal = geo[geo[postal_code_header].notna()]
+                postal_codes = postal[postal_code_header].astype(str).str.replace(' ', '', regex=False)
+                postal = postal.assign(
+                    pa_code=postal_codes,
+                    pa_id=self.md5_hash_series(country_key + self.safe_lower_series(postal_codes)) # uniq postal pro country
+                )
+                if additional_header in postal.columns:
+                    pa_names = postal[additional_header].fillna("").astype(str).str.strip()
+                    postal = postal.assign(pa_name=pa_names.astype(object).mask(pa_names == "", None))
+                else:
+                    postal = postal.assign(pa_name=None)
+                postal = postal.drop_duplicates(subset="pa_id")
 
-                            ci_id = services.utils.md5_hash(country_key + province_key + city_key)
-                            if not session.query(TPostalArea).filter_by(pa_id=pa_id).first():
-                                postal_area = TPostalArea(
-                                    pa_id=pa_id,
-                                    pa_name=pa_name,
-                                    pa_code=postal_code,
-                                    ci_id=ci_id
-                                )
-                                session.add(postal_area)
-                                postal_count += 1
+                existing_postal_areas: Set[str] = {
+                    pa_id for (pa_id,) in (
+                        session.query(TPostalArea.pa_id)
+                        .join(TCity, TCity.ci_id == TPostalArea.ci_id)
+                        .join(TProvince, TProvince.p_id == TCity.p_id)
+                        .filter(TProvince.c_id == c_id)
+                    )
+                }
+                new_postal_areas = postal[~postal["pa_id"].isin(existing_postal_areas)]
+                postal_count = self.bulk_insert(
+                    session,
+                    TPostalArea,
+                    new_postal_areas[["pa_id", "pa_name", "pa_code", "ci_id"]]
+                )
                 session.commit()
 
                 self.logger("100% [Done]", force=True)
@@ -103,4 +122,4 @@ class CSVManager:
                 self.logger(f"➤  Cities added        : {city_count}", force=True)
                 self.logger(f"➤  Postal Areas added  : {postal_count}", force=True)
         except Exception as e:
-            self.logger(f"Error: {e}", force=True)
\ No newline at end of file
+            self.logger(f"Error: {e}", force=True)
@@ -0,0 +1,137 @@
+import os
+import json
+import pandas as pd
+from sqlalchemy import text
+from database.connection import Connection
+from services.schema_manager import fact_queries, schema_mode
+from services.utils import config
+from typing import Callable, Dict, List, Tuple
+
+# rows per (country, date) from the day rollups, one row per country, component and day instead of every fact
+ROLLUP_PARTITIONS = text("""
+    SELECT t_country.c_name, t_date.d_date, SUM(t_rollup_day.rd_count) AS v_count
+    FROM t_rollup_day
+    JOIN t_country ON t_country.c_id = t_rollup_day.rd_geo_id
+    JOIN t_date ON t_date.d_id = t_rollup_day.d_id
+    WHERE t_rollup_day.rd_level = 'country'
+    GROUP BY t_country.c_name, t_date.d_date;
+""")
+
+# exact count of one candidate partition
+COUNT_PARTITION = fact_queries("""
+    SELECT COUNT(*)
+    FROM {facts} v
+    JOIN t_date ON t_date.{d_key} = v.{d_key}
+    JOIN t_postal_area ON t_postal_area.{pa_key} = v.{pa_key}
+    JOIN t_city ON t_city.ci_id = t_postal_area.ci_id
+    JOIN t_province ON t_province.p_id = t_city.p_id
+    JOIN t_country ON t_country.c_id = t_province.c_id
+    WHERE t_country.c_name = :country AND t_date.d_date = :d_date;
+""")
+
+SELECT_PARTITION = fact_queries("""
+    SELECT t_province.p_name AS province, t_city.ci_name AS city, t_postal_area.pa_code AS postal_code,
+        t_hour.h_hour AS hour, t_component.co_name AS component, v.v_value AS value
+    FROM {facts} v
+    JOIN t_date ON t_date.{d_key} = v.{d_key}
+    JOIN t_hour ON t_hour.{h_key} = v.{h_key}
+    JOIN t_component ON t_component.{co_key} = v.{co_key}
+    JOIN t_postal_area ON t_postal_area.{pa_key} = v.{pa_key}
+    JOIN t_city ON t_city.ci_id = t_postal_area.ci_id
+    JOIN t_province ON t_province.p_id = t_city.p_id
+    JOIN t_country ON t_country.c_id = t_province.c_id
+    WHERE t_country.c_name = :country AND t_date.d_date = :d_date
+    ORDER BY t_postal_area.pa_code, t_hour.h_hour, t_component.co_name;
+""")
+
+# repeated labels are stored once per column chunk (parquet dictionary pages)
+CATEGORY_COLUMNS = ["province", "city", "postal_code", "component"]
+MANIFEST_FILE = "_manifest.json"
+
+class ExportManager:
+    def __init__(self, db_connection: Connection, logger: Callable[..., None]):
+        self.db_connection: Connection = db_connection
+        self.logger: Callable[..., None] = logger
+        self.export_dir: str = config.EXPORT_DIR
+        self.compression: str = config.EXPORT_COMPRESSION
+
+    def partition_path(self, country: str, d_date: str) -> str:
+        # hive layout, pd.read_parquet(export_dir) restores country/date as columns
+        return os.path.join(self.export_dir, f"country={country}", f"date={d_date}", "part-0.parquet")
+
+    def load_manifest(self) -> Dict[str, int]:
+        path = os.path.join(self.export_dir, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_manifest(self, manifest: Dict[str, int]) -> None:
+        path = os.path.join(self.export_dir, MANIFEST_FILE)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=4, sort_keys=True)
+        os.replace(f"{path}.tmp", path)
+
+    def pending_partitions(self, manifest: Dict[str, int]) -> List[Tuple[str, str, int]]:
+        # the rollups name the candidates, only those are counted against t_value
+        with self.db_connection.get_session() as session:
+            count_partition = COUNT_PARTITION[schema_mode.compact(self.db_connection, session)]
+            candidates = [
+                (row.c_name, str(row.d_date))
+                for row in session.execute(ROLLUP_PARTITIONS)
+                if manifest.get(f"{row.c_name}/{row.d_date}") != row.v_count
+                or not os.path.exists(self.partition_path(row.c_name, str(row.d_date)))
+            ]
+            partitions = [
+                (country, d_date, session.execute(count_partition, {"country": country, "d_date": d_date}).scalar())
+                for country, d_date in candidates
+            ]
+        return sorted(
+            (country, d_date, rows) for country, d_date, rows in partitions
+            if rows and (manifest.get(f"{country}/{d_date}") != rows
+            or not os.path.exists(self.partition_path(country, d_date)))
+        )
+
+    def read_partition(self, country: str, d_date: str) -> pd.DataFrame:
+        with self.db_connection.get_session() as session:
+            statement = SELECT_PARTITION[schema_mode.compact(self.db_connection, session)]
+            frame = pd.read_sql(statement, session.connection(), params={"country": country, "d_date": d_date})
+        for column in CATEGORY_COLUMNS:
+            frame[column] = frame[column].astype("category")
+        frame["hour"] = frame["hour"].astype("int8")
+        frame["value"] = frame["value"].astype("float64")
+        return frame
+
+    def write_partition(self, country: str, d_date: str, frame: pd.DataFrame) -> None:
+        path = self.partition_path(country, d_date)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # dot-prefixed temp files are skipped by dataset readers until the rename
+        tmp_path = os.path.join(os.path.dirname(path), ".part-0.parquet.tmp")
+        frame.to_parquet(tmp_path, engine="pyarrow", compression=self.compression, index=False)
+        os.replace(tmp_path, path)
+
+    def export(self, full: bool = False) -> None:
+        manifest = {} if full else self.load_manifest()
+        try:
+            partitions = self.pending_partitions(manifest)
+        except Exception as e:
+            self.logger(f"Export failed: {e}")
+            return
+
+        if not partitions:
+            self.logger("Export is up to date!")
+            return
+
+        self.logger(f"Exporting {len(partitions)} partitions to {self.export_dir}")
+        exported = 0
+        for index, (country, d_date, rows) in enumerate(partitions, start=1):
+            try:
+                self.write_partition(country, d_date, self.read_partition(country, d_date))
+                manifest[f"{country}/{d_date}"] = rows
+                self.save_manifest(manifest)
+                exported += rows
+            except Exception as e:
+                self.logger(f"\nError exporting {country} {d_date}: {e}")
+            self.logger(f"\r{index}/{len(partitions)} | {country} {d_date} | Exported Rows: {exported}")
+
+        self.logger("\nExport completed!")
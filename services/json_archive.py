@@ -0,0 +1,143 @@
+import os
+import gzip
+import json
+import threading
+from datetime import date
+from typing import Any, BinaryIO, Dict, Iterator, List, NamedTuple, Optional, TextIO, Tuple
+from services.utils import config
+
+# <JSON_LOG_DIR>/<date>/<country>.jsonl.gz holds one gzip member (one json line) per distinct payload,
+# so the whole file still reads as plain jsonl with zcat / gzip.open.
+# <JSON_LOG_DIR>/<date>/<country>.idx maps every pa_code to the member that answers it.
+ARCHIVE_SUFFIX = ".jsonl.gz"
+INDEX_SUFFIX = ".idx"
+
+class ArchiveEntry(NamedTuple):
+    pa_code: str
+    pl_id: str
+    offset: int
+    length: int
+
+class _ArchiveFile:
+    def __init__(self, archive_path: str, index_path: str):
+        self.members: Dict[str, Tuple[int, int]] = {}
+        if os.path.exists(index_path):
+            with open(index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    entry = parse_index_line(line)
+                    if entry:
+                        self.members[entry.pl_id] = (entry.offset, entry.length)
+        self.archive: BinaryIO = open(archive_path, "ab")
+        self.index: TextIO = open(index_path, "a", encoding="utf-8")
+
+    def close(self) -> None:
+        self.archive.close()
+        self.index.close()
+
+def parse_index_line(line: str) -> Optional[ArchiveEntry]:
+    parts = line.rstrip("\n").split("\t")
+    if len(parts) != 4:
+        return None
+    return ArchiveEntry(pa_code=parts[0], pl_id=parts[1], offset=int(parts[2]), length=int(parts[3]))
+
+def archive_paths(base_dir: str, day: date | str, country: str) -> Tuple[str, str]:
+    folder = os.path.join(base_dir, str(day))
+    return os.path.join(folder, f"{country}{ARCHIVE_SUFFIX}"), os.path.join(folder, f"{country}{INDEX_SUFFIX}")
+
+class JsonArchiveWriter:
+    def __init__(self, base_dir: Optional[str] = None, compresslevel: Optional[int] = None):
+        self.base_dir: str = base_dir or config.JSON_LOG_DIR
+        self.compresslevel: int = compresslevel or config.JSON_ARCHIVE_COMPRESSLEVEL
+        self.files: Dict[Tuple[str, str], _ArchiveFile] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def _get_file(self, day: date | str, country: str) -> _ArchiveFile:
+        key = (str(day), country)
+        archive_file = self.files.get(key)
+        if archive_file is None:
+            archive_path, index_path = archive_paths(self.base_dir, day, country)
+            os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+            archive_file = _ArchiveFile(archive_path, index_path)
+            self.files[key] = archive_file
+        return archive_file
+
+    def append(self, day: date | str, country: str, pa_code: str, pl_id: str, payload: str) -> ArchiveEntry:
+        with self._lock:
+            archive_file = self._get_file(day, country)
+            member = archive_file.members.get(pl_id)
+            if member is None:
+                # payload first, index line second: a crash leaves at most an unreferenced member
+                data = gzip.compress(f"{payload}\n".encode("utf-8"), compresslevel=self.compresslevel)
+                archive_file.archive.seek(0, os.SEEK_END)
+                offset = archive_file.archive.tell()
+                archive_file.archive.write(data)
+                archive_file.archive.flush()
+                member = (offset, len(data))
+                archive_file.members[pl_id] = member
+
+            entry = ArchiveEntry(pa_code=pa_code, pl_id=pl_id, offset=member[0], length=member[1])
+            archive_file.index.write(f"{entry.pa_code}\t{entry.pl_id}\t{entry.offset}\t{entry.length}\n")
+            archive_file.index.flush()
+            return entry
+
+    def close(self) -> None:
+        with self._lock:
+            for archive_file in self.files.values():
+                archive_file.close()
+            self.files.clear()
+
+class JsonArchiveReader:
+    def __init__(self, base_dir: Optional[str] = None):
+        self.base_dir: str = base_dir or config.JSON_LOG_DIR
+        self._indexes: Dict[Tuple[str, str], Dict[str, ArchiveEntry]] = {}
+
+    def days(self) -> List[str]:
+        if not os.path.isdir(self.base_dir):
+            return []
+        return sorted(name for name in os.listdir(self.base_dir) if os.path.isdir(os.path.join(self.base_dir, name)))
+
+    def countries(self, day: date | str) -> List[str]:
+        folder = os.path.join(self.base_dir, str(day))
+        if not os.path.isdir(folder):
+            return []
+        return sorted(name[:-len(INDEX_SUFFIX)] for name in os.listdir(folder) if name.endswith(INDEX_SUFFIX))
+
+    def iter_index(self, day: date | str, country: str) -> Iterator[ArchiveEntry]:
+        _, index_path = archive_paths(self.base_dir, day, country)
+        if not os.path.exists(index_path):
+            return
+        with open(index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                entry = parse_index_line(line)
+                if entry:
+                    yield entry
+
+    def read_at(self, day: date | str, country: str, offset: int, length: int) -> str:
+        archive_path, _ = archive_paths(self.base_dir, day, country)
+        with open(archive_path, "rb") as f:
+            f.seek(offset)
+            return gzip.decompress(f.read(length)).decode("utf-8").rstrip("\n")
+
+    def get(self, day: date | str, country: str, pa_code: str) -> Optional[Dict[str, Any]]:
+        key = (str(day), country)
+        if key not in self._indexes:
+            # later lines win, a re-fetched postal code points to its newest payload
+            self._indexes[key] = {entry.pa_code: entry for entry in self.iter_index(day, country)}
+        entry = self._indexes[key].get(pa_code)
+        if entry is None:
+            return None
+        return json.loads(self.read_at(day, country, entry.offset, entry.length))
+
+    def iter_payloads(self, day: date | str, country: str) -> Iterator[Tuple[str, List[str], str]]:
+        # sequential scan: (pl_id, pa_codes, payload json) in file order
+        latest: Dict[str, ArchiveEntry] = {entry.pa_code: entry for entry in self.iter_index(day, country)}
+        members: Dict[int, Tuple[ArchiveEntry, List[str]]] = {}
+        for entry in latest.values():
+            members.setdefault(entry.offset, (entry, []))[1].append(entry.pa_code)
+
+        archive_path, _ = archive_paths(self.base_dir, day, country)
+        with open(archive_path, "rb") as f:
+            for offset in sorted(members):
+                entry, pa_codes = members[offset]
+                f.seek(offset)
+                yield entry.pl_id, pa_codes, gzip.decompress(f.read(entry.length)).decode("utf-8").rstrip("\n")
@@ -0,0 +1,196 @@
+from sqlalchemy import text
+from database.connection import Connection
+from services.schema_manager import schema_mode
+from services.result_cache import data_generation
+from services.utils import config
+from datetime import date, timedelta
+from typing import Callable, List
+
+# one partition per day on the compact date key (20261017), RANGE RIGHT: a boundary starts its own day
+PARTITION_FUNCTION = "pf_t_value_date"
+PARTITION_SCHEME = "ps_t_value_date"
+
+IS_PROVISIONED = text("SELECT CASE WHEN EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'cci_t_value_compact') THEN 1 ELSE 0 END;")
+SELECT_DATE_KEYS = text("SELECT d_key FROM t_date ORDER BY d_key;")
+SELECT_LAST_BOUNDARY = text(f"""
+    SELECT MAX(CAST(prv.value AS INT))
+    FROM sys.partition_range_values prv
+    JOIN sys.partition_functions pf ON pf.function_id = prv.function_id
+    WHERE pf.name = '{PARTITION_FUNCTION}';
+""")
+
+CREATE_FUNCTION = f"""
+    IF NOT EXISTS (SELECT 1 FROM sys.partition_functions WHERE name = '{PARTITION_FUNCTION}')
+        CREATE PARTITION FUNCTION {PARTITION_FUNCTION} (INT) AS RANGE RIGHT FOR VALUES ({{boundaries}});
+"""
+
+CREATE_SCHEME = text(f"""
+    IF NOT EXISTS (SELECT 1 FROM sys.partition_schemes WHERE name = '{PARTITION_SCHEME}')
+        CREATE PARTITION SCHEME {PARTITION_SCHEME} AS PARTITION {PARTITION_FUNCTION} ALL TO ([PRIMARY]);
+""")
+
+# the rowstore primary key is rebuilt as a partition aligned nonclustered index, the writer's
+# insert-if-not-exists keeps seeking on it while scans go through the columnstore
+DROP_PRIMARY_KEY = text("ALTER TABLE t_value_compact DROP CONSTRAINT pk_t_value_compact;")
+CREATE_PARTITIONED_INDEX = text(f"CREATE CLUSTERED INDEX cci_t_value_compact ON t_value_compact (d_key) ON {PARTITION_SCHEME} (d_key);")
+CREATE_COLUMNSTORE = text(f"""
+    CREATE CLUSTERED COLUMNSTORE INDEX cci_t_value_compact ON t_value_compact
+    WITH (DROP_EXISTING = ON) ON {PARTITION_SCHEME} (d_key);
+""")
+ADD_PRIMARY_KEY = text(f"""
+    ALTER TABLE t_value_compact ADD CONSTRAINT pk_t_value_compact
+    PRIMARY KEY NONCLUSTERED (d_key, pa_key, h_key, co_key) ON {PARTITION_SCHEME} (d_key);
+""")
+
+# switch target, same columns and indexes on the same scheme so a switch only moves metadata
+CREATE_ARCHIVE = text(f"""
+    IF OBJECT_ID('t_value_archive', 'U') IS NULL
+    BEGIN
+        CREATE TABLE t_value_archive (
+            d_key INT NOT NULL,
+            pa_key INT NOT NULL,
+            h_key TINYINT NOT NULL,
+            co_key SMALLINT NOT NULL,
+            v_value DECIMAL(10,8)
+        ) ON {PARTITION_SCHEME} (d_key);
+        CREATE CLUSTERED COLUMNSTORE INDEX cci_t_value_archive ON t_value_archive ON {PARTITION_SCHEME} (d_key);
+        ALTER TABLE t_value_archive ADD CONSTRAINT pk_t_value_archive
+            PRIMARY KEY NONCLUSTERED (d_key, pa_key, h_key, co_key) ON {PARTITION_SCHEME} (d_key);
+    END
+""")
+
+# splitting the empty partition at the end never moves rows
+SPLIT_PARTITION = f"""
+    ALTER PARTITION SCHEME {PARTITION_SCHEME} NEXT USED [PRIMARY];
+    ALTER PARTITION FUNCTION {PARTITION_FUNCTION} () SPLIT RANGE ({{boundary}});
+"""
+
+EXPIRED_PARTITIONS = text(f"""
+    SELECT p.partition_number, p.rows
+    FROM sys.partitions p
+    WHERE p.object_id = OBJECT_ID('t_value_compact') AND p.index_id = 1 AND p.rows > 0
+      AND p.partition_number < $PARTITION.{PARTITION_FUNCTION}(:cutoff)
+    ORDER BY p.partition_number;
+""")
+
+SWITCH_PARTITION = "ALTER TABLE t_value_compact SWITCH PARTITION {number} TO t_value_archive PARTITION {number};"
+
+# trickle inserts land in delta rowgroups, compress them so scans stay in batch mode
+COMPRESS_ROWGROUPS = text("ALTER INDEX cci_t_value_compact ON t_value_compact REORGANIZE WITH (COMPRESS_ALL_ROW_GROUPS = ON);")
+
+DROP_SCHEME = text(f"IF EXISTS (SELECT 1 FROM sys.partition_schemes WHERE name = '{PARTITION_SCHEME}') DROP PARTITION SCHEME {PARTITION_SCHEME};")
+DROP_FUNCTION = text(f"IF EXISTS (SELECT 1 FROM sys.partition_functions WHERE name = '{PARTITION_FUNCTION}') DROP PARTITION FUNCTION {PARTITION_FUNCTION};")
+
+def date_key(day: date) -> int:
+    return day.year * 10000 + day.month * 100 + day.day
+
+def key_date(d_key: int) -> date:
+    return date(d_key // 10000, d_key // 100 % 100, d_key % 100)
+
+class PartitionManager:
+    def __init__(self, db_connection: Connection, logger: Callable[..., None]):
+        self.db_connection: Connection = db_connection
+        self.logger: Callable[..., None] = logger
+        self.enabled: bool = config.FACT_STORAGE == "columnstore"
+        self.days_ahead: int = config.PARTITION_DAYS_AHEAD
+        # 0 keeps every day in t_value_compact
+        self.retention_days: int = config.PARTITION_RETENTION_DAYS
+
+    def is_provisioned(self) -> bool:
+        with self.db_connection.get_session() as session:
+            return bool(session.execute(IS_PROVISIONED).scalar())
+
+    def initial_boundaries(self) -> List[int]:
+        with self.db_connection.get_session() as session:
+            keys = [d_key for (d_key,) in session.execute(SELECT_DATE_KEYS)]
+        first = key_date(keys[0]) if keys else date.today()
+        last = date.today() + timedelta(days=self.days_ahead)
+        return [date_key(first + timedelta(days=offset)) for offset in range((last - first).days + 1)]
+
+    def provision(self) -> None:
+        if not schema_mode.compact(self.db_connection):
+            # partitions need an ordered date key, the md5 d_id has none; the migration rewrites t_value
+            # and is only run from its own confirmed menu entry
+            self.logger("Columnstore storage needs compact keys, run 'Migrate to Compact Integer Keys' first.")
+            return
+
+        if self.is_provisioned():
+            self.ensure_partitions()
+            return
+
+        try:
+            self.logger("Provisioning columnstore storage for t_value_compact...")
+            boundaries = ", ".join(str(boundary) for boundary in self.initial_boundaries())
+            with self.db_connection.checkout() as session:
+                session.execute(text(CREATE_FUNCTION.format(boundaries=boundaries)))
+                session.execute(CREATE_SCHEME)
+                session.execute(DROP_PRIMARY_KEY)
+                session.execute(CREATE_PARTITIONED_INDEX)
+                session.execute(CREATE_COLUMNSTORE)
+                session.execute(ADD_PRIMARY_KEY)
+                session.execute(CREATE_ARCHIVE)
+            data_generation.bump(self.db_connection)
+            self.logger("Columnstore storage provisioned.")
+        except Exception as e:
+            self.logger(f"Columnstore provisioning failed: {e}")
+
+    def ensure_partitions(self) -> int:
+        with self.db_connection.get_session() as session:
+            last_boundary = session.execute(SELECT_LAST_BOUNDARY).scalar()
+        if last_boundary is None:
+            return 0
+
+        day = key_date(last_boundary) + timedelta(days=1)
+        until = date.today() + timedelta(days=self.days_ahead)
+        created = 0
+        while day <= until:
+            with self.db_connection.checkout() as session:
+                session.execute(text(SPLIT_PARTITION.format(boundary=date_key(day))))
+            created += 1
+            day += timedelta(days=1)
+        if created:
+            self.logger(f"Created {created} new date partitions.")
+        return created
+
+    def switch_out_expired(self) -> int:
+        if not self.retention_days:
+            return 0
+        cutoff = date_key(date.today() - timedelta(days=self.retention_days))
+        with self.db_connection.checkout() as session:
+            expired = session.execute(EXPIRED_PARTITIONS, {"cutoff": cutoff}).fetchall()
+            for number, _ in expired:
+                session.execute(text(SWITCH_PARTITION.format(number=int(number))))
+        switched = sum(rows for _, rows in expired)
+        if expired:
+            # rollups of archived days are kept, only the raw facts leave t_value
+            data_generation.bump(self.db_connection)
+            self.logger(f"Switched {len(expired)} partitions ({switched} rows) to t_value_archive.")
+        return switched
+
+    def compress(self) -> None:
+        with self.db_connection.checkout() as session:
+            session.execute(COMPRESS_ROWGROUPS)
+
+    def maintain(self) -> None:
+        if not self.enabled or not self.is_provisioned():
+            return
+        try:
+            self.ensure_partitions()
+            self.switch_out_expired()
+        except Exception as e:
+            self.logger(f"Partition maintenance failed: {e}")
+
+    def finish(self) -> None:
+        # rowgroups are closed by the run's writes, compressing them at start would only find the previous run's
+        if not self.enabled or not self.is_provisioned():
+            return
+        try:
+            self.compress()
+        except Exception as e:
+            self.logger(f"Rowgroup compression failed: {e}")
+
+    def drop(self) -> None:
+        # the tables using the scheme have to be dropped first
+        with self.db_connection.checkout() as session:
+            session.execute(DROP_SCHEME)
+            session.execute(DROP_FUNCTION)
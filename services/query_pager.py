@@ -0,0 +1,53 @@
+import base64
+import json
+import re
+import services.utils
+
+# workbench continuation: a read with a stable order is paged by the server with OFFSET ... FETCH,
+# the cursor carries the next offset and the query it was issued for
+
+ORDER_BY = re.compile(r"\border\s+by\b", re.IGNORECASE)
+OFFSET_FETCH = re.compile(r"\boffset\s+\S+\s+rows?\b", re.IGNORECASE)
+# clauses that may not follow the appended OFFSET ... FETCH
+AFTER_ORDER_BY = re.compile(r"\b(option|for|union|except|intersect)\b", re.IGNORECASE)
+LITERAL = re.compile(r"--[^\n]*|/\*.*?\*/|'(?:[^']|'')*'|\"[^\"]*\"|\[[^\]]*\]", re.DOTALL)
+PARENTHESES = re.compile(r"\([^()]*\)")
+
+def outer_statement(query_text: str) -> str:
+    # literals, comments and every parenthesised group (subqueries, CTE bodies, OVER clauses)
+    # are dropped, what is left is the outermost statement
+    statement = LITERAL.sub(" ", query_text)
+    while True:
+        stripped = PARENTHESES.sub(" ", statement)
+        if stripped == statement:
+            return statement
+        statement = stripped
+
+def is_pageable(query_text: str) -> bool:
+    # continuation needs a stable order
+    if not query_text.lower().startswith(("select", "with")):
+        return False
+    statement = outer_statement(query_text)
+    order_by = list(ORDER_BY.finditer(statement))
+    if not order_by:
+        return False
+    trailing = statement[order_by[-1].end():]
+    return AFTER_ORDER_BY.search(trailing) is None and OFFSET_FETCH.search(statement) is None
+
+def page_query(query_text: str, offset: int, limit: int) -> str:
+    return f"{query_text.rstrip().rstrip(';')} OFFSET {int(offset)} ROWS FETCH NEXT {int(limit)} ROWS ONLY;"
+
+def encode_cursor(query_text: str, offset: int) -> str:
+    token = json.dumps({"hash": services.utils.md5_hash(query_text), "offset": offset})
+    return base64.urlsafe_b64encode(token.encode("utf-8")).decode("ascii")
+
+def decode_cursor(query_text: str, cursor: str) -> int:
+    # ValueError for a malformed cursor or one issued for another query
+    try:
+        token = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        offset = int(token["offset"])
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError(f"malformed cursor: {e}")
+    if token.get("hash") != services.utils.md5_hash(query_text):
+        raise ValueError("cursor belongs to another query")
+    return max(offset, 0)
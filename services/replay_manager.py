@@ -0,0 +1,111 @@
+import os
+from datetime import date
+from sqlalchemy import select
+from database.models import TCountry, TProvince, TCity, TPostalArea
+from database.connection import Connection
+from services.json_archive import JsonArchiveReader
+from services.tabular.pipeline import PayloadGroup
+from services.table_manager import TableManager
+from services.utils import config
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+class ReplayManager:
+    def __init__(self, db_connection: Connection, table_manager: TableManager, logger: Callable[..., None]):
+        self.db_connection: Connection = db_connection
+        self.table_manager: TableManager = table_manager
+        self.logger: Callable[..., None] = logger
+        self.reader: JsonArchiveReader = JsonArchiveReader()
+        self.chunk_size: int = config.TRANSFORM_CHUNK_SIZE
+
+    def days(self, start: Optional[str] = None, end: Optional[str] = None) -> List[str]:
+        # day folders are iso dates, so string order is date order
+        return [day for day in self.reader.days() if (not start or day >= start) and (not end or day <= end)]
+
+    def countries(self, day: str) -> Set[str]:
+        folder = os.path.join(self.reader.base_dir, day)
+        legacy = {name for name in os.listdir(folder) if os.path.isdir(os.path.join(folder, name))}
+        return set(self.reader.countries(day)) | legacy
+
+    def load_postal_index(self, countries: Set[str]) -> Dict[Tuple[str, str], str]:
+        with self.db_connection.get_session() as session:
+            rows = session.execute(
+                select(TCountry.c_name, TPostalArea.pa_code, TPostalArea.pa_id)
+                .join(TProvince, TProvince.c_id == TCountry.c_id)
+                .join(TCity, TCity.p_id == TProvince.p_id)
+                .join(TPostalArea, TPostalArea.ci_id == TCity.ci_id)
+                .where(TCountry.c_name.in_(list(countries)))
+            )
+            return {(c_name, pa_code): pa_id for c_name, pa_code, pa_id in rows}
+
+    def iter_legacy(self, day: str, country: str) -> Iterator[Tuple[List[str], str]]:
+        # (pa_codes, payload json) of the original <day>/<country>/<pa_code>.json files
+        folder = os.path.join(self.reader.base_dir, day, country)
+        if not os.path.isdir(folder):
+            return
+
+        for filename in os.listdir(folder):
+            if filename.endswith(".json"):
+                with open(os.path.join(folder, filename), "r", encoding="utf-8") as f:
+                    yield [filename[:-len(".json")]], f.read()
+
+    def iter_day(self, day: str, country: str) -> Iterator[Tuple[List[str], str]]:
+        for _, pa_codes, payload in self.reader.iter_payloads(day, country):
+            yield pa_codes, payload
+        yield from self.iter_legacy(day, country)
+
+    def count_day(self, day: str, country: str, postal_index: Dict[Tuple[str, str], str]) -> int:
+        # only reads index lines and file names, payloads are read once during the load
+        pa_codes = {entry.pa_code for entry in self.reader.iter_index(day, country)}
+        folder = os.path.join(self.reader.base_dir, day, country)
+        if os.path.isdir(folder):
+            pa_codes.update(filename[:-len(".json")] for filename in os.listdir(folder) if filename.endswith(".json"))
+        return sum(1 for pa_code in pa_codes if (country, pa_code) in postal_index)
+
+    def iter_groups(self, days: List[str], postal_index: Dict[Tuple[str, str], str]) -> Iterator[List[PayloadGroup]]:
+        chunk: List[PayloadGroup] = []
+        missing = 0
+        for day in days:
+            for country in sorted(self.countries(day)):
+                for pa_codes, payload in self.iter_day(day, country):
+                    pa_ids = [postal_index[(country, pa_code)] for pa_code in pa_codes if (country, pa_code) in postal_index]
+                    missing += len(pa_codes) - len(pa_ids)
+                    if pa_ids:
+                        chunk.append((pa_ids, payload))
+                    if len(chunk) >= self.chunk_size:
+                        yield chunk
+                        chunk = []
+        if chunk:
+            yield chunk
+        if missing:
+            self.logger(f"\n{missing} archived postal codes are unknown and were skipped")
+
+    def replay(self, start: Optional[str] = None, end: Optional[str] = None, workers: Optional[int] = None) -> None:
+        days = self.days(start, end)
+        if not days:
+            self.logger("Nothing can be done!")
+            return
+
+        countries: Set[str] = set()
+        for day in days:
+            countries |= self.countries(day)
+        postal_index = self.load_postal_index(countries)
+        self.logger(f"Replaying {len(days)} days ({days[0]} - {days[-1]}) for {', '.join(sorted(countries))}")
+        self.logger(f"Postal index loaded: {len(postal_index)} postal areas")
+
+        total = sum(self.count_day(day, country, postal_index) for day in days for country in self.countries(day))
+
+        self.table_manager._tabular_transform_init()
+        self.table_manager.load_payload_groups(self.iter_groups(days, postal_index), total, workers if workers is not None else config.TRANSFORM_WORKERS)
+        self.logger("\nReplay completed!")
+        self.table_manager._tabular_transform_finish()
+
+    def replay_prompt(self) -> None:
+        try:
+            start = input("Start date (YYYY-MM-DD, empty = first): ").strip()
+            end = input("End date (YYYY-MM-DD, empty = last): ").strip()
+            start = date.fromisoformat(start).isoformat() if start else None
+            end = date.fromisoformat(end).isoformat() if end else None
+        except ValueError:
+            self.logger("Invalid date!")
+            return
+        self.replay(start, end)
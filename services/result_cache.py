@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import text
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from database.connection import Connection
+from services.utils import config
+
+# last write marker shared by every process on the database, a writer bumps it after its data committed
+BUMP_VERSION = text("""
+    IF OBJECT_ID('t_data_version', 'U') IS NOT NULL
+    BEGIN
+        UPDATE t_data_version WITH (HOLDLOCK) SET dv_version = dv_version + 1 WHERE dv_id = 1;
+        IF @@ROWCOUNT = 0
+            INSERT INTO t_data_version (dv_id, dv_version) VALUES (1, 1);
+    END
+""")
+READ_VERSION = text("SELECT dv_version FROM t_data_version WHERE dv_id = 1;")
+
+class DataGeneration:
+    def __init__(self):
+        self.value: int = 0
+        # last t_data_version a reader saw
+        self.version: Optional[int] = None
+        self._lock: threading.Lock = threading.Lock()
+
+    def bump(self, db_connection: Optional[Connection] = None) -> int:
+        if db_connection is not None:
+            with db_connection.checkout() as session:
+                session.execute(BUMP_VERSION)
+        with self._lock:
+            self.value += 1
+            return self.value
+
+    def observe(self, version: Optional[int]) -> int:
+        # a write from another process (cluster worker, CLI bot, menu) moves the marker but not this value
+        with self._lock:
+            if version != self.version:
+                self.version = version
+                self.value += 1
+            return self.value
+
+class ResultCache:
+    def __init__(self, generation: DataGeneration, maxsize: int, ttl: float):
+        self.generation: DataGeneration = generation
+        self.maxsize: int = maxsize
+        # upper bound for changes made without bumping the generation, e.g. by hand in the workbench
+        self.ttl: float = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._seen_generation: int = generation.value
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.expirations: int = 0
+        self.invalidations: int = 0
+        self._lock: threading.Lock = threading.Lock()
+
+    def _sync_generation(self) -> None:
+        # every key belongs to one generation, older entries can never hit again
+        if self._seen_generation != self.generation.value:
+            self._seen_generation = self.generation.value
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        with self._lock:
+            self._sync_generation()
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return False, None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._sync_generation()
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        generation = self.generation.value
+        hit, value = self.get(key)
+        if hit:
+            return value
+        value = loader()
+        # a bump while loading means the value may already be stale, serve it once but do not keep it
+        if generation == self.generation.value:
+            self.put(key, value)
+        return value
+
+    async def get_or_load_async(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        generation = self.generation.value
+        hit, value = self.get(key)
+        if hit:
+            return value
+        value = await loader()
+        if generation == self.generation.value:
+            self.put(key, value)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "generation": self.generation.value,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
+
+data_generation: DataGeneration = DataGeneration()
+price_cache: ResultCache = ResultCache(
+    generation=data_generation,
+    maxsize=config.RESULT_CACHE_SIZE,
+    ttl=config.RESULT_CACHE_TTL
+)
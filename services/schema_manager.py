@@ -0,0 +1,213 @@
+from sqlalchemy import text, TextClause
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.connection import Connection, IS_VALUE_TABLE
+from database.models import VALUE_VIEW
+from services.result_cache import data_generation
+from typing import Callable, Dict, List, Optional
+import threading
+
+# compact mode: facts live in t_value_compact keyed by integer surrogates, t_value becomes a view
+# that still exposes the md5 ids, every reader keeps working unchanged
+IS_COMPACT = text("SELECT CASE WHEN OBJECT_ID('t_value_compact', 'U') IS NOT NULL AND OBJECT_ID('t_value', 'V') IS NOT NULL THEN 1 ELSE 0 END;")
+
+# fact table and join columns per mode, hot readers skip the view and join the dimensions on the integer keys
+FACT_COLUMNS: Dict[bool, Dict[str, str]] = {
+    False: {"facts": "t_value", "d_key": "d_id", "pa_key": "pa_id", "h_key": "h_id", "co_key": "co_id"},
+    True: {"facts": "t_value_compact", "d_key": "d_key", "pa_key": "pa_key", "h_key": "h_key", "co_key": "co_key"},
+}
+
+def fact_queries(template: str) -> Dict[bool, TextClause]:
+    return {compact: text(template.format(**columns)) for compact, columns in FACT_COLUMNS.items()}
+
+# the md5 ids stay the dimension primary keys, the surrogates are unique alternate keys next to them
+ADD_SURROGATE_KEYS = [
+    # 20261017, sorts like the date and needs no lookup to compute
+    ("t_date", "d_key", text("""
+        IF COL_LENGTH('t_date', 'd_key') IS NULL
+            ALTER TABLE t_date ADD d_key AS (YEAR(d_date) * 10000 + MONTH(d_date) * 100 + DAY(d_date)) PERSISTED;
+    """)),
+    # 0-23
+    ("t_hour", "h_key", text("""
+        IF COL_LENGTH('t_hour', 'h_key') IS NULL
+            ALTER TABLE t_hour ADD h_key AS CONVERT(TINYINT, h_hour) PERSISTED;
+    """)),
+    ("t_component", "co_key", text("""
+        IF COL_LENGTH('t_component', 'co_key') IS NULL
+            ALTER TABLE t_component ADD co_key SMALLINT IDENTITY(1,1) NOT NULL;
+    """)),
+    ("t_postal_area", "pa_key", text("""
+        IF COL_LENGTH('t_postal_area', 'pa_key') IS NULL
+            ALTER TABLE t_postal_area ADD pa_key INT IDENTITY(1,1) NOT NULL;
+    """)),
+]
+
+CREATE_KEY_INDEX = """
+    IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'ux_{table}_{column}')
+        CREATE UNIQUE INDEX ux_{table}_{column} ON {table} ({column});
+"""
+
+# 12 bytes of key per fact instead of 128, date first so new days append at the end of the index
+CREATE_VALUE_COMPACT = text("""
+    IF OBJECT_ID('t_value_compact', 'U') IS NULL
+    CREATE TABLE t_value_compact (
+        d_key INT NOT NULL,
+        pa_key INT NOT NULL,
+        h_key TINYINT NOT NULL,
+        co_key SMALLINT NOT NULL,
+        v_value DECIMAL(10,8),
+        CONSTRAINT pk_t_value_compact PRIMARY KEY (d_key, pa_key, h_key, co_key),
+        FOREIGN KEY (d_key) REFERENCES t_date(d_key),
+        FOREIGN KEY (pa_key) REFERENCES t_postal_area(pa_key),
+        FOREIGN KEY (h_key) REFERENCES t_hour(h_key),
+        FOREIGN KEY (co_key) REFERENCES t_component(co_key)
+    );
+""")
+
+# dates already in t_value_compact were copied in one transaction each, a rerun picks up where it stopped
+PENDING_DATES = text("""
+    SELECT t_date.d_id, t_date.d_date
+    FROM t_date
+    WHERE EXISTS (SELECT 1 FROM t_value WHERE t_value.d_id = t_date.d_id)
+      AND NOT EXISTS (SELECT 1 FROM t_value_compact WHERE t_value_compact.d_key = t_date.d_key)
+    ORDER BY t_date.d_date;
+""")
+
+COPY_DATE = text("""
+    INSERT INTO t_value_compact (d_key, pa_key, h_key, co_key, v_value)
+    SELECT t_date.d_key, t_postal_area.pa_key, t_hour.h_key, t_component.co_key, t_value.v_value
+    FROM t_value
+    JOIN t_date ON t_date.d_id = t_value.d_id
+    JOIN t_postal_area ON t_postal_area.pa_id = t_value.pa_id
+    JOIN t_hour ON t_hour.h_id = t_value.h_id
+    JOIN t_component ON t_component.co_id = t_value.co_id
+    WHERE t_value.d_id = :d_id;
+""")
+
+# facts written while the dates were copied, t_value is locked exclusively until the swap commits
+COPY_REMAINING = text("""
+    INSERT INTO t_value_compact (d_key, pa_key, h_key, co_key, v_value)
+    SELECT t_date.d_key, t_postal_area.pa_key, t_hour.h_key, t_component.co_key, t_value.v_value
+    FROM t_value WITH (TABLOCKX, HOLDLOCK)
+    JOIN t_date ON t_date.d_id = t_value.d_id
+    JOIN t_postal_area ON t_postal_area.pa_id = t_value.pa_id
+    JOIN t_hour ON t_hour.h_id = t_value.h_id
+    JOIN t_component ON t_component.co_id = t_value.co_id
+    WHERE NOT EXISTS (
+        SELECT 1 FROM t_value_compact c
+        WHERE c.d_key = t_date.d_key AND c.pa_key = t_postal_area.pa_key
+          AND c.h_key = t_hour.h_key AND c.co_key = t_component.co_key
+    );
+""")
+
+COUNT_VALUE = text("SELECT COUNT_BIG(*) FROM t_value;")
+COUNT_VALUE_COMPACT = text("SELECT COUNT_BIG(*) FROM t_value_compact;")
+
+RENAME_VALUE = text("EXEC sp_rename 't_value', 't_value_md5';")
+
+CREATE_VALUE_VIEW = text(VALUE_VIEW)
+
+DROP_VALUE_MD5 = text("DROP TABLE t_value_md5;")
+
+class SchemaMode:
+    def __init__(self):
+        self._compact: Optional[bool] = None
+        self._lock: threading.Lock = threading.Lock()
+
+    def compact(self, db_connection: Connection, session: Optional[Session] = None) -> bool:
+        # cached until the next run start, the writer checks it on every flush
+        with self._lock:
+            if self._compact is None:
+                if session is not None:
+                    self._compact = bool(session.execute(IS_COMPACT).scalar())
+                else:
+                    with db_connection.get_session() as own_session:
+                        self._compact = bool(own_session.execute(IS_COMPACT).scalar())
+            return self._compact
+
+    async def compact_async(self, session: AsyncSession) -> bool:
+        if self._compact is None:
+            compact = bool((await session.execute(IS_COMPACT)).scalar())
+            with self._lock:
+                if self._compact is None:
+                    self._compact = compact
+        return self._compact
+
+    def refresh(self, session: Session) -> bool:
+        # asked again after a failed write, True when another process migrated in the meantime
+        with self._lock:
+            cached, self._compact = self._compact, bool(session.execute(IS_COMPACT).scalar())
+            return cached is not None and cached != self._compact
+
+    def reset(self) -> None:
+        with self._lock:
+            self._compact = None
+
+schema_mode: SchemaMode = SchemaMode()
+
+class SchemaManager:
+    def __init__(self, db_connection: Connection, logger: Callable[..., None]):
+        self.db_connection: Connection = db_connection
+        self.logger: Callable[..., None] = logger
+
+    def add_surrogate_keys(self) -> None:
+        with self.db_connection.checkout() as session:
+            for table, column, statement in ADD_SURROGATE_KEYS:
+                session.execute(statement)
+                session.execute(text(CREATE_KEY_INDEX.format(table=table, column=column)))
+            session.execute(CREATE_VALUE_COMPACT)
+
+    def copy_dates(self) -> int:
+        with self.db_connection.get_session() as session:
+            pending: List = session.execute(PENDING_DATES).fetchall()
+
+        copied = 0
+        for index, (d_id, d_date) in enumerate(pending, start=1):
+            with self.db_connection.checkout() as session:
+                copied += max(session.execute(COPY_DATE, {"d_id": d_id}).rowcount or 0, 0)
+            self.logger(f"\r{index}/{len(pending)} | {d_date} | Copied Rows: {copied}")
+        return copied
+
+    def swap(self) -> int:
+        with self.db_connection.checkout() as session:
+            remaining = max(session.execute(COPY_REMAINING).rowcount or 0, 0)
+            md5_rows = session.execute(COUNT_VALUE).scalar()
+            compact_rows = session.execute(COUNT_VALUE_COMPACT).scalar()
+            if md5_rows != compact_rows:
+                raise RuntimeError(f"row count mismatch: t_value {md5_rows}, t_value_compact {compact_rows}")
+            session.execute(RENAME_VALUE)
+            session.execute(CREATE_VALUE_VIEW)
+        return remaining
+
+    def migrate_to_compact(self) -> None:
+        if schema_mode.compact(self.db_connection):
+            self.logger("Schema already uses compact keys!")
+            return
+
+        with self.db_connection.get_session() as session:
+            if not session.execute(IS_VALUE_TABLE).scalar():
+                self.logger("Table t_value not found, create the tables first!")
+                return
+
+        try:
+            self.logger("Adding surrogate keys...")
+            self.add_surrogate_keys()
+            self.logger("Copying facts to t_value_compact...")
+            copied = self.copy_dates()
+            copied += self.swap()
+            self.logger(f"\nCopied {copied} rows, t_value is now a view over t_value_compact.")
+        except Exception as e:
+            self.logger(f"\nMigration failed: {e}")
+            return
+        finally:
+            schema_mode.reset()
+
+        # only dropped after the swap committed, a failure above leaves the md5 facts in place
+        try:
+            with self.db_connection.checkout() as session:
+                session.execute(DROP_VALUE_MD5)
+        except Exception as e:
+            self.logger(f"Could not drop t_value_md5: {e}")
+
+        data_generation.bump(self.db_connection)
+        self.logger("Migration completed!")
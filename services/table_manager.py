@@ -1,29 +1,40 @@
-from database.models import TPostalArea, TValue, TDate, THour, TComponent
-import services.utils
-import json
-from sqlalchemy import text
+from database.models import TPostalArea, TPayload, TDate
+from sqlalchemy import text, select, func, or_, Row, Select
 import sqlparse
-from sqlalchemy.exc import IntegrityError
+from services.tabular.parser import parse_price_overview, fan_out, payload_rows_cache
+from services.tabular.pipeline import TabularPipeline, PayloadGroup, parse_groups, count_areas
+import services.utils
+from services.tabular.writer import TabularWriter
+from services.tabular.dimensions import dimension_registry
+from services.schema_manager import schema_mode
+from services.partition_manager import PartitionManager
+from services.tabular.rollup import RollupManager
+from services.result_cache import data_generation
 from typing import Callable
 from database.connection import Connection
-from typing import Any, Dict, Set
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set
 import threading
 
 class TableManager:
     def __init__(self, db_connection: Connection, logger: Callable[..., None]):
         self.db_connection: Connection = db_connection
         self.logger: Callable[..., None] = logger
-        self.existing_dates: Set[str] = set()
-        self.existing_hours: Set[str] = set()
-        self.existing_components: Set[str] = set()
+        self.dirty_dates: Set[str] = set()
+        self.rollup_manager: RollupManager = RollupManager(db_connection=db_connection, logger=logger)
+        self.partition_manager: PartitionManager = PartitionManager(db_connection=db_connection, logger=logger)
         self._lock: threading.Lock = threading.Lock()
 
     def create_tables(self) -> None:
         try:
             self.db_connection.create_tables()
+            # a new database starts out compact
+            schema_mode.reset()
             self.logger("All tables created successfully.")
         except Exception as e:
             self.logger(f"Failed to create tables: {e}")
+            return
+        if self.partition_manager.enabled:
+            self.partition_manager.provision()
 
     def import_sql_file(self) -> None:
         with self.db_connection.get_session() as session:
@@ -70,6 +81,8 @@ class TableManager:
                     continue
 
                 self.logger(f"\nDone. {success_count} statements executed successfully. {error_count} failed.\n")
+                if self.partition_manager.enabled:
+                    self.partition_manager.provision()
 
     def drop_all_tables(self) -> None:
         with self.db_connection.get_session() as session:
@@ -85,6 +98,17 @@ class TableManager:
             EXEC sp_executesql @sql;
             """
 
+            # compact mode turns t_value into a view
+            drop_views = """
+            DECLARE @sql NVARCHAR(MAX) = N'';
+
+            SELECT @sql += 'DROP VIEW ' + QUOTENAME(s.name) + '.' + QUOTENAME(v.name) + ';' + CHAR(13)
+            FROM sys.views v
+            JOIN sys.schemas s ON v.schema_id = s.schema_id;
+
+            EXEC sp_executesql @sql;
+            """
+
             drop_tables = """
             DECLARE @sql NVARCHAR(MAX) = N'';
 
@@ -97,8 +121,12 @@ class TableManager:
 
             try:
                 session.execute(text(drop_fks))
+                session.execute(text(drop_views))
                 session.execute(text(drop_tables))
                 session.commit()
+                self.partition_manager.drop()
+                dimension_registry.reset()
+                schema_mode.reset()
                 self.logger("All tables dropped successfully.")
             except Exception as e:
                 session.rollback()
@@ -114,9 +142,17 @@ class TableManager:
                 query = """
                     UPDATE t_postal_area
                     SET pa_status_code = NULL,
-                        pa_data = NULL;
+                        pa_data = NULL,
+                        pl_id = NULL;
                 """
                 session.execute(text(query))
+                session.execute(text("DELETE FROM t_payload;"))
+                session.execute(text("DELETE FROM t_task_queue;"))
+                # dead letters are kept for inspection, only the ones past their retention go
+                session.execute(
+                    text("DELETE FROM t_dead_letter WHERE dl_date < DATEADD(day, -:days, CAST(GETDATE() AS DATE));"),
+                    {"days": services.utils.config.DEAD_LETTER_RETENTION_DAYS}
+                )
                 session.commit()
                 self.logger("pa_data cleanup complete.")
             except Exception as e:
@@ -125,132 +161,152 @@ class TableManager:
                 raise
 
     def _tabular_transform_init(self) -> None:
+        # process wide: the bot, the menu transform and the replay share one registry
+        dimension_registry.load(self.db_connection)
+        # a migration run from the CLI is picked up by the next run of a long lived server
+        schema_mode.reset()
+        self.partition_manager.maintain()
+        counts = dimension_registry.counts()
+        self.logger(f"\nCache initialized: {counts['date']} dates, {counts['hour']} hours, {counts['component']} components")
+
+    def _tabular_transform_finish(self) -> None:
+        # after the last batch of a run: compressed rowgroups first, the rollups then scan them
+        self.partition_manager.finish()
+        self.refresh_rollups()
+
+    def create_tabular_writer(self) -> TabularWriter:
+        return TabularWriter(db_connection=self.db_connection, dimensions=dimension_registry)
+
+    def _tabular_transform_tr(self, pa_id: str, json_data: Dict[str, Any], log: bool = False, pl_id: Optional[str] = None) -> None:
+        try:
+            if pl_id:
+                rows = fan_out(payload_rows_cache.get(pl_id, json_data), [pa_id])
+            else:
+                rows = parse_price_overview(pa_id, json_data)
+            writer = self.create_tabular_writer()
+            writer.add(rows)
+            inserted = writer.flush()
+            self.mark_dirty(writer)
+            if log:
+                if inserted:
+                    self.logger(pa_id, f"TRANSFORM | success | {inserted} rows")
+                else:
+                    self.logger(pa_id, "TRANSFORM | already exists")
+        except Exception as e:
+            self.logger(pa_id, f"Error transforming data: {str(e)}")
+            raise
+
+    def iter_keyset(self, stmt: Select, key_column, page_size: Optional[int] = None, chunk_size: Optional[int] = None) -> Iterator[Sequence[Row]]:
+        # keyset pagination on key_column (first selected column), every page is streamed from the cursor in chunks
+        page_size = page_size or services.utils.config.TRANSFORM_PAGE_SIZE
+        chunk_size = chunk_size or services.utils.config.TRANSFORM_CHUNK_SIZE
+        last_key: Optional[str] = None
+
         with self.db_connection.get_session() as session:
-            """Load ID"""
-            # Load dates
-            existing_date_ids = session.query(TDate.d_id).all()
-            self.existing_dates = {date_id[0] for date_id in existing_date_ids}
-            
-            # Load hours
-            existing_hour_ids = session.query(THour.h_id).all()
-            self.existing_hours = {hour_id[0] for hour_id in existing_hour_ids}
-            
-            # Load components
-            existing_component_ids = session.query(TComponent.co_id).all()
-            self.existing_components = {comp_id[0] for comp_id in existing_component_ids}
-            
-            self.logger(f"\nCache initialized: {len(self.existing_dates)} dates, {len(self.existing_hours)} hours, {len(self.existing_components)} components")
-
-    def _tabular_transform_tr(self, pa_id: str, json_data: Dict[str, Any], log: bool = False) -> None:
-        with self.db_connection.get_session() as session:
-            try:
-                if "energy" not in json_data:
-                    raise ValueError(f"Invalid JSON structure for postal area {pa_id}")
+            while True:
+                page = stmt if last_key is None else stmt.where(key_column > last_key)
+                page = page.order_by(key_column).limit(page_size)
 
-                for date_component_config in services.utils.config.DATE_COMPONENTS_CONFIG:
-                    try:
-                        hours_json = json_data["energy"][date_component_config]
-                        
-                        for hour_json in hours_json:
-                            date = hour_json["date"]
-                            hour = hour_json["hour"]
-
-                            # Generate unique IDs
-                            date_id = services.utils.md5_hash(date)
-                            hour_id = services.utils.md5_hash(str(hour))
-
-                            # Check cache
-                            if date_id not in self.existing_dates:
-                                t_date = TDate(d_id=date_id, d_date=date)
-                                session.merge(t_date)
-                                with self._lock:
-                                    self.existing_dates.add(date_id)
-                                session.flush()
-
-                            if hour_id not in self.existing_hours:
-                                t_hour = THour(h_id=hour_id, h_hour=hour)
-                                session.merge(t_hour)
-                                with self._lock:
-                                    self.existing_hours.add(hour_id)
-                                session.flush()
-                            
-                            for price_component in hour_json["priceComponents"]:
-                                for price_component_config in services.utils.config.PRICE_COMPONENTS_CONFIG:
-                                    if price_component["type"] in price_component_config["alias"]:
-                                        component_id = services.utils.md5_hash(price_component_config["name"])
-                                        if component_id not in self.existing_components:
-                                            t_component = TComponent(
-                                                co_id=component_id, 
-                                                co_name=price_component_config["name"]
-                                            )
-                                            session.merge(t_component)
-                                            with self._lock:
-                                                self.existing_components.add(component_id)
-                                            session.flush()
-
-                                        t_value = TValue(
-                                            pa_id=pa_id,
-                                            d_id=date_id,
-                                            h_id=hour_id,
-                                            co_id=component_id, 
-                                            v_value=price_component["priceExcludingVat"]
-                                        )
-                                        session.add(t_value)
-
-                        session.commit()
-                        if log:
-                            self.logger(pa_id, f"TRANSFORM {date_component_config} | success")
-                    except IntegrityError as e:
-                        session.rollback()
-                        if log:
-                            self.logger(pa_id, f"TRANSFORM {date_component_config} | Primary key violation")
-                        continue
-            except Exception as e:
-                session.rollback()
-                self.logger(pa_id, f"Error transforming data: {str(e)}")
-                raise
+                result = session.execute(page, execution_options={"stream_results": True, "yield_per": chunk_size})
+                page_count = 0
+                for chunk in result.partitions():
+                    page_count += len(chunk)
+                    last_key = chunk[-1][0]
+                    yield chunk
+
+                if page_count < page_size:
+                    break
+
+    def iter_payload_groups(self) -> Iterator[List[PayloadGroup]]:
+        # deduplicated payloads: parsed once, fanned out to every mapped postal area
+        shared = (
+            select(TPayload.pl_id, TPayload.pl_data)
+            .where(select(TPostalArea.pa_id).where(TPostalArea.pl_id == TPayload.pl_id).exists())
+        )
+        for chunk in self.iter_keyset(shared, TPayload.pl_id):
+            payloads = {row.pl_id: row.pl_data for row in chunk}
+            members: Dict[str, List[str]] = {pl_id: [] for pl_id in payloads}
+            with self.db_connection.get_session() as session:
+                for pa_id, pl_id in session.execute(
+                    select(TPostalArea.pa_id, TPostalArea.pl_id).where(TPostalArea.pl_id.in_(list(payloads)))
+                ):
+                    members[pl_id].append(pa_id)
+            yield [(members[pl_id], payload) for pl_id, payload in payloads.items() if members[pl_id]]
+
+        # legacy rows that still carry their own pa_data
+        legacy = (
+            select(TPostalArea.pa_id, TPostalArea.pa_data)
+            .where(TPostalArea.pa_data.isnot(None), TPostalArea.pl_id.is_(None))
+        )
+        for chunk in self.iter_keyset(legacy, TPostalArea.pa_id):
+            yield [([row.pa_id], row.pa_data) for row in chunk]
+
+    def tabular_transform(self, workers: Optional[int] = None) -> None:
+        self._tabular_transform_init()
+        # 0/1 parses in-process, the process pool is opt-in
+        workers = workers if workers is not None else services.utils.config.TRANSFORM_WORKERS
 
-    def tabular_transform(self) -> None:
         with self.db_connection.get_session() as session:
-            self._tabular_transform_init()
-            
-            areas = (
-                session.query(TPostalArea.pa_id)
-                .filter(TPostalArea.pa_data.isnot(None))
-                .all()
+            total = (
+                session.query(func.count(TPostalArea.pa_id))
+                .filter(or_(TPostalArea.pa_data.isnot(None), TPostalArea.pl_id.isnot(None)))
+                .scalar()
             )
 
-            if areas:
-                self.logger(f"Found {len(areas)} rows!")
-            else:
-                self.logger("Nothing can be done!")
-                return
+        if total:
+            self.logger(f"Found {total} rows!")
+        else:
+            self.logger("Nothing can be done!")
+            return
 
-            input_data = 0
-            for index, area in enumerate(areas, start=1):
-                try:
-                    t_postal_area = (
-                        session.query(TPostalArea.pa_data)
-                        .filter(TPostalArea.pa_id == area.pa_id)
-                        .first()
-                    )
-
-                    if not t_postal_area:
-                        print(f"Postal area {area.pa_id} not found")
-                        continue
-                    
-                    postal_json_data = json.loads(t_postal_area.pa_data)
-                    
-                    self._tabular_transform_tr(area.pa_id, postal_json_data)
-
-                    input_data += 1
-                except IntegrityError as e:
-                    pass
-                except Exception as e:
-                    self.logger(f"\nError processing postal area {area.pa_id}: {e}")
-                    continue
+        self.load_payload_groups(self.iter_payload_groups(), total, workers)
+        self.logger("\nData transformation completed!")
+        self._tabular_transform_finish()
+
+    def load_payload_groups(self, chunks: Iterable[Sequence[PayloadGroup]], total: int, workers: int) -> int:
+        writer = self.create_tabular_writer()
+        if workers > 1:
+            self.logger(f"Parsing with {workers} worker processes")
+            TabularPipeline(writer=writer, logger=self.logger, workers=workers).run(chunks, total)
+            self.mark_dirty(writer)
+            return writer.inserted
+
+        index = 0
+        for chunk in chunks:
+            rows, errors = parse_groups(chunk)
+            for pa_id, error in errors:
+                self.logger(f"\nError processing postal area {pa_id}: {error}")
+            index += count_areas(chunk)
+
+            try:
+                writer.add(rows)
+            except Exception as e:
+                self.logger(f"\nError writing tabular batch: {e}")
+
+            self.logger(f"\r{index}/{total} | New Tabular Data: {writer.inserted}")
+
+        try:
+            writer.flush()
+        except Exception as e:
+            self.logger(f"\nError writing tabular batch: {e}")
+        self.logger(f"\r{index}/{total} | New Tabular Data: {writer.inserted}")
+        self.mark_dirty(writer)
+        return writer.inserted
+
+    def mark_dirty(self, writer: TabularWriter) -> None:
+        with self._lock:
+            self.dirty_dates.update(writer.touched_dates)
 
-                if index % 10 == 0 or index == len(areas):
-                    self.logger(f"\r{index}/{len(areas)} | New Tabular Data: {input_data}")
+    def refresh_rollups(self, full: bool = False) -> None:
+        with self._lock:
+            if full:
+                with self.db_connection.get_session() as session:
+                    self.dirty_dates.update(d_id for (d_id,) in session.query(TDate.d_id))
+            d_ids, self.dirty_dates = sorted(self.dirty_dates), set()
 
-            self.logger("\nData transformation completed!")
\ No newline at end of file
+        if not d_ids:
+            return
+        self.logger(f"Refreshing rollups for {len(d_ids)} dates..")
+        refreshed = self.rollup_manager.refresh(d_ids)
+        data_generation.bump(self.db_connection)
+        self.logger(f"Rollups refreshed: {refreshed}/{len(d_ids)} dates")
@@ -0,0 +1,121 @@
+from sqlalchemy import text
+from database.connection import Connection
+from services.tabular.parser import TabularRows
+from typing import Dict, List, Set, Tuple
+import threading
+
+MERGE_DATE = text("""
+    MERGE t_date WITH (HOLDLOCK) AS target
+    USING (SELECT :d_id AS d_id, :d_date AS d_date) AS source
+    ON target.d_id = source.d_id
+    WHEN NOT MATCHED THEN INSERT (d_id, d_date) VALUES (source.d_id, source.d_date);
+""")
+
+MERGE_HOUR = text("""
+    MERGE t_hour WITH (HOLDLOCK) AS target
+    USING (SELECT :h_id AS h_id, :h_hour AS h_hour) AS source
+    ON target.h_id = source.h_id
+    WHEN NOT MATCHED THEN INSERT (h_id, h_hour) VALUES (source.h_id, source.h_hour);
+""")
+
+MERGE_COMPONENT = text("""
+    MERGE t_component WITH (HOLDLOCK) AS target
+    USING (SELECT :co_id AS co_id, :co_name AS co_name) AS source
+    ON target.co_id = source.co_id
+    WHEN NOT MATCHED THEN INSERT (co_id, co_name) VALUES (source.co_id, source.co_name);
+""")
+
+SELECT_DATES = text("SELECT d_id FROM t_date;")
+SELECT_HOURS = text("SELECT h_id FROM t_hour;")
+SELECT_COMPONENTS = text("SELECT co_id FROM t_component;")
+
+# (kind, id)
+DimensionKey = Tuple[str, str]
+
+class DimensionRegistry:
+    def __init__(self):
+        self.known: Dict[str, Set[str]] = {"date": set(), "hour": set(), "component": set()}
+        self.loaded: bool = False
+        # keys another thread is inserting right now, waiters block on the event instead of inserting too
+        self._pending: Dict[DimensionKey, threading.Event] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def load(self, db_connection: Connection) -> None:
+        with db_connection.get_session() as session:
+            dates = {d_id for (d_id,) in session.execute(SELECT_DATES)}
+            hours = {h_id for (h_id,) in session.execute(SELECT_HOURS)}
+            components = {co_id for (co_id,) in session.execute(SELECT_COMPONENTS)}
+        with self._lock:
+            self.known = {"date": dates, "hour": hours, "component": components}
+            self.loaded = True
+
+    def reset(self) -> None:
+        with self._lock:
+            self.known = {"date": set(), "hour": set(), "component": set()}
+            self.loaded = False
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return {kind: len(ids) for kind, ids in self.known.items()}
+
+    def _claim(self, wanted: Dict[DimensionKey, object]) -> Tuple[Dict[DimensionKey, object], List[threading.Event]]:
+        own: Dict[DimensionKey, object] = {}
+        waits: List[threading.Event] = []
+        with self._lock:
+            for key, value in wanted.items():
+                kind, key_id = key
+                if key_id in self.known[kind]:
+                    continue
+                event = self._pending.get(key)
+                if event is not None:
+                    waits.append(event)
+                else:
+                    self._pending[key] = threading.Event()
+                    own[key] = value
+        return own, waits
+
+    def _insert(self, db_connection: Connection, own: Dict[DimensionKey, object]) -> None:
+        dates = [{"d_id": key_id, "d_date": value} for (kind, key_id), value in own.items() if kind == "date"]
+        hours = [{"h_id": key_id, "h_hour": value} for (kind, key_id), value in own.items() if kind == "hour"]
+        components = [{"co_id": key_id, "co_name": value} for (kind, key_id), value in own.items() if kind == "component"]
+
+        # committed on its own, a failing fact batch can no longer take new dimension rows down with it
+        with db_connection.checkout() as session:
+            if dates:
+                session.execute(MERGE_DATE, dates)
+            if hours:
+                session.execute(MERGE_HOUR, hours)
+            if components:
+                session.execute(MERGE_COMPONENT, components)
+
+    def ensure(self, db_connection: Connection, rows: TabularRows) -> int:
+        if not self.loaded:
+            self.load(db_connection)
+
+        wanted: Dict[DimensionKey, object] = {}
+        wanted.update({("date", d_id): d_date for d_id, d_date in rows.dates.items()})
+        wanted.update({("hour", h_id): h_hour for h_id, h_hour in rows.hours.items()})
+        wanted.update({("component", co_id): co_name for co_id, co_name in rows.components.items()})
+
+        created_dates = 0
+        while True:
+            own, waits = self._claim(wanted)
+            if own:
+                try:
+                    self._insert(db_connection, own)
+                    with self._lock:
+                        for kind, key_id in own:
+                            self.known[kind].add(key_id)
+                    created_dates += sum(1 for kind, _ in own if kind == "date")
+                finally:
+                    with self._lock:
+                        for key in own:
+                            self._pending.pop(key).set()
+            if not waits:
+                return created_dates
+            for event in waits:
+                event.wait()
+            # the other creator may have failed, claim whatever is still unknown
+            wanted = {key: value for key, value in wanted.items() if key not in own}
+
+dimension_registry: DimensionRegistry = DimensionRegistry()
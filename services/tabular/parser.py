@@ -0,0 +1,91 @@
+import services.utils
+import threading
+from collections import OrderedDict
+from services.tabular.resolver import component_resolver
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# (pa_id, d_id, h_id, co_id, v_value)
+FactRow = Tuple[str, str, str, str, Any]
+
+class TabularRows:
+    def __init__(self):
+        self.facts: List[FactRow] = []
+        self.dates: Dict[str, str] = {}
+        self.hours: Dict[str, int] = {}
+        self.components: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.facts)
+
+    def extend(self, other: "TabularRows") -> None:
+        self.facts.extend(other.facts)
+        self.dates.update(other.dates)
+        self.hours.update(other.hours)
+        self.components.update(other.components)
+
+    def is_empty(self) -> bool:
+        return not (self.facts or self.dates or self.hours or self.components)
+
+def parse_price_overview(pa_id: str, json_data: Dict[str, Any], rows: Optional[TabularRows] = None) -> TabularRows:
+    rows = rows if rows is not None else TabularRows()
+    resolver = component_resolver
+    resolve = resolver.resolve
+    add_fact = rows.facts.append
+
+    if "energy" not in json_data:
+        raise ValueError(f"Invalid JSON structure for postal area {pa_id}")
+
+    for date_component_config in services.utils.config.DATE_COMPONENTS_CONFIG:
+        hours_json = json_data["energy"][date_component_config]
+
+        for hour_json in hours_json:
+            date = hour_json["date"]
+            hour = hour_json["hour"]
+
+            # Generate unique IDs
+            date_id = resolver.date_id(date)
+            hour_id = resolver.hour_id(hour)
+            rows.dates[date_id] = date
+            rows.hours[hour_id] = hour
+
+            for price_component in hour_json["priceComponents"]:
+                component = resolve(price_component["type"])
+                if component is not None:
+                    component_name, component_id = component
+                    rows.components[component_id] = component_name
+                    add_fact((pa_id, date_id, hour_id, component_id, price_component["priceExcludingVat"]))
+
+    return rows
+
+def fan_out(template: TabularRows, pa_ids: Iterable[str]) -> TabularRows:
+    # template facts carry no pa_id, copy them once per mapped postal area
+    rows = TabularRows()
+    rows.dates.update(template.dates)
+    rows.hours.update(template.hours)
+    rows.components.update(template.components)
+    add_facts = rows.facts.extend
+    for pa_id in pa_ids:
+        add_facts((pa_id,) + fact[1:] for fact in template.facts)
+    return rows
+
+class PayloadRowsCache:
+    def __init__(self, maxsize: int):
+        self.maxsize: int = maxsize
+        self._templates: "OrderedDict[str, TabularRows]" = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+    def get(self, pl_id: str, json_data: Dict[str, Any]) -> TabularRows:
+        with self._lock:
+            template = self._templates.get(pl_id)
+            if template is not None:
+                self._templates.move_to_end(pl_id)
+                return template
+
+        template = parse_price_overview("", json_data)
+        with self._lock:
+            self._templates[pl_id] = template
+            if len(self._templates) > self.maxsize:
+                self._templates.popitem(last=False)
+        return template
+
+payload_rows_cache: PayloadRowsCache = PayloadRowsCache(maxsize=services.utils.config.RESOLVER_CACHE_SIZE)
@@ -0,0 +1,80 @@
+import json
+import threading
+from queue import Queue
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from services.tabular.parser import TabularRows, parse_price_overview, fan_out
+from services.tabular.writer import TabularWriter
+from typing import Callable, Deque, Iterable, List, Optional, Sequence, Tuple
+
+# (pa_id, error message)
+ParseError = Tuple[str, str]
+# (pa_ids sharing the payload, payload json)
+PayloadGroup = Tuple[List[str], str]
+
+def parse_groups(groups: Sequence[PayloadGroup]) -> Tuple[TabularRows, List[ParseError]]:
+    rows = TabularRows()
+    errors: List[ParseError] = []
+    for pa_ids, payload in groups:
+        try:
+            template = parse_price_overview("", json.loads(payload))
+            rows.extend(fan_out(template, pa_ids))
+        except Exception as e:
+            errors.extend((pa_id, str(e)) for pa_id in pa_ids)
+    return rows, errors
+
+def count_areas(groups: Sequence[PayloadGroup]) -> int:
+    return sum(len(pa_ids) for pa_ids, _ in groups)
+
+class TabularPipeline:
+    def __init__(self, writer: TabularWriter, logger: Callable[..., None], workers: int):
+        self.writer: TabularWriter = writer
+        self.logger: Callable[..., None] = logger
+        self.workers: int = max(1, workers)
+        self.max_pending: int = self.workers * 2
+        self._queue: Queue = Queue(maxsize=self.max_pending)
+
+    def _write_loop(self) -> None:
+        while True:
+            rows: Optional[TabularRows] = self._queue.get()
+            try:
+                if rows is None:
+                    self.writer.flush()
+                    return
+                self.writer.add(rows)
+            except Exception as e:
+                self.logger(f"\nError writing tabular batch: {e}")
+            finally:
+                self._queue.task_done()
+
+    def run(self, chunks: Iterable[Sequence[PayloadGroup]], total: int) -> None:
+        writer_thread = threading.Thread(target=self._write_loop, daemon=True)
+        writer_thread.start()
+
+        index = 0
+        pending: Deque[Tuple[Future, int]] = deque()
+
+        def collect() -> None:
+            nonlocal index
+            future, size = pending.popleft()
+            rows, errors = future.result()
+            for pa_id, error in errors:
+                self.logger(f"\nError processing postal area {pa_id}: {error}")
+            self._queue.put(rows)
+            index += size
+            self.logger(f"\r{index}/{total} | New Tabular Data: {self.writer.inserted}")
+
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                for chunk in chunks:
+                    pending.append((pool.submit(parse_groups, chunk), count_areas(chunk)))
+                    while len(pending) >= self.max_pending:
+                        collect()
+
+                while pending:
+                    collect()
+        finally:
+            self._queue.put(None)
+            writer_thread.join()
+
+        self.logger(f"\r{index}/{total} | New Tabular Data: {self.writer.inserted}")
@@ -0,0 +1,32 @@
+import services.utils
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+class ComponentResolver:
+    def __init__(self, price_components_config: List[Dict[str, Any]], cache_size: int):
+        # alias -> (canonical name, co_id)
+        self.components: Dict[str, Tuple[str, str]] = {}
+        for price_component_config in price_components_config:
+            name = price_component_config["name"]
+            component_id = services.utils.md5_hash(name)
+            for alias in price_component_config["alias"]:
+                self.components.setdefault(alias, (name, component_id))
+
+        self.date_id = lru_cache(maxsize=cache_size)(self._date_id)
+        self.hour_id = lru_cache(maxsize=cache_size)(self._hour_id)
+
+    def resolve(self, component_type: str) -> Optional[Tuple[str, str]]:
+        return self.components.get(component_type)
+
+    @staticmethod
+    def _date_id(date: str) -> str:
+        return services.utils.md5_hash(date)
+
+    @staticmethod
+    def _hour_id(hour: int) -> str:
+        return services.utils.md5_hash(str(hour))
+
+component_resolver: ComponentResolver = ComponentResolver(
+    price_components_config=services.utils.config.PRICE_COMPONENTS_CONFIG,
+    cache_size=services.utils.config.RESOLVER_CACHE_SIZE
+)
@@ -0,0 +1,218 @@
+from sqlalchemy import text, TextClause
+from sqlalchemy.orm import Session
+from database.connection import Connection
+from services.schema_manager import FACT_COLUMNS, fact_queries, schema_mode
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+GEO_LEVELS = ("country", "province", "city")
+PERIODS = ("hour", "day", "month")
+
+# (table, id column, name column) of every geo level, postal areas are only served from t_value
+GEO_TABLES: Dict[str, Tuple[str, str, str]] = {
+    "country": ("t_country", "c_id", "c_name"),
+    "province": ("t_province", "p_id", "p_name"),
+    "city": ("t_city", "ci_id", "ci_name"),
+    "postal_area": ("t_postal_area", "pa_id", "pa_code"),
+}
+
+# every fact of one date attached to all of its geo levels, hours and components stay keys until grouped
+FACTS_BY_LEVEL = """
+    WITH facts AS (
+        SELECT t_country.c_id, t_province.p_id, t_city.ci_id, v.{h_key} AS h_key, v.{co_key} AS co_key,
+            CAST(v.v_value AS FLOAT) AS v_value
+        FROM {facts} v
+        JOIN t_postal_area ON t_postal_area.{pa_key} = v.{pa_key}
+        JOIN t_city ON t_city.ci_id = t_postal_area.ci_id
+        JOIN t_province ON t_province.p_id = t_city.p_id
+        JOIN t_country ON t_country.c_id = t_province.c_id
+        WHERE v.{d_key} = (SELECT t_date.{d_key} FROM t_date WHERE t_date.d_id = :d_id)
+    ), leveled AS (
+        SELECT 'country' AS lvl, c_id AS geo_id, h_key, co_key, v_value FROM facts
+        UNION ALL SELECT 'province', p_id, h_key, co_key, v_value FROM facts
+        UNION ALL SELECT 'city', ci_id, h_key, co_key, v_value FROM facts
+    )
+"""
+
+DELETE_ROLLUP_HOUR = text("DELETE FROM t_rollup_hour WHERE d_id = :d_id;")
+DELETE_ROLLUP_DAY = text("DELETE FROM t_rollup_day WHERE d_id = :d_id;")
+
+# PERCENTILE_CONT is a window function in T-SQL, the grouped MAX() just picks the per-partition value
+REFRESH_ROLLUP_HOUR = fact_queries(FACTS_BY_LEVEL + """
+    , ranked AS (
+        SELECT lvl, geo_id, h_key, co_key, v_value,
+            PERCENTILE_CONT(0.25) WITHIN GROUP (ORDER BY v_value) OVER (PARTITION BY lvl, geo_id, h_key, co_key) AS p25,
+            PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY v_value) OVER (PARTITION BY lvl, geo_id, h_key, co_key) AS p50,
+            PERCENTILE_CONT(0.75) WITHIN GROUP (ORDER BY v_value) OVER (PARTITION BY lvl, geo_id, h_key, co_key) AS p75
+        FROM leveled
+    ), grouped AS (
+        SELECT lvl, geo_id, co_key, h_key, MIN(v_value) AS v_min, AVG(v_value) AS v_avg, MAX(v_value) AS v_max,
+            MAX(p25) AS p25, MAX(p50) AS p50, MAX(p75) AS p75, COUNT(*) AS v_count
+        FROM ranked
+        GROUP BY lvl, geo_id, co_key, h_key
+    )
+    INSERT INTO t_rollup_hour (rh_level, rh_geo_id, co_id, d_id, h_id, rh_min, rh_avg, rh_max, rh_p25, rh_p50, rh_p75, rh_count)
+    SELECT g.lvl, g.geo_id, t_component.co_id, :d_id, t_hour.h_id, g.v_min, g.v_avg, g.v_max, g.p25, g.p50, g.p75, g.v_count
+    FROM grouped g
+    JOIN t_component ON t_component.{co_key} = g.co_key
+    JOIN t_hour ON t_hour.{h_key} = g.h_key;
+""")
+
+REFRESH_ROLLUP_DAY = fact_queries(FACTS_BY_LEVEL + """
+    , ranked AS (
+        SELECT lvl, geo_id, co_key, v_value,
+            PERCENTILE_CONT(0.25) WITHIN GROUP (ORDER BY v_value) OVER (PARTITION BY lvl, geo_id, co_key) AS p25,
+            PERCENTILE_CONT(0.5) WITHIN GROUP (ORDER BY v_value) OVER (PARTITION BY lvl, geo_id, co_key) AS p50,
+            PERCENTILE_CONT(0.75) WITHIN GROUP (ORDER BY v_value) OVER (PARTITION BY lvl, geo_id, co_key) AS p75
+        FROM leveled
+    ), grouped AS (
+        SELECT lvl, geo_id, co_key, MIN(v_value) AS v_min, AVG(v_value) AS v_avg, MAX(v_value) AS v_max,
+            MAX(p25) AS p25, MAX(p50) AS p50, MAX(p75) AS p75, COUNT(*) AS v_count
+        FROM ranked
+        GROUP BY lvl, geo_id, co_key
+    )
+    INSERT INTO t_rollup_day (rd_level, rd_geo_id, co_id, d_id, rd_min, rd_avg, rd_max, rd_p25, rd_p50, rd_p75, rd_count)
+    SELECT g.lvl, g.geo_id, t_component.co_id, :d_id, g.v_min, g.v_avg, g.v_max, g.p25, g.p50, g.p75, g.v_count
+    FROM grouped g
+    JOIN t_component ON t_component.{co_key} = g.co_key;
+""")
+
+def _build_query(level: str, period: str, compact: bool = False) -> TextClause:
+    geo_table, geo_id, geo_name = GEO_TABLES[level]
+    filters = """
+        WHERE t_component.co_name = :component
+          AND t_date.d_date BETWEEN :start AND :end
+          AND (:geo_id IS NULL OR {geo_column} = :geo_id)
+    """
+
+    if level == "postal_area":
+        # finer than any rollup, aggregated straight from the fact table
+        bucket = {
+            "hour": ("t_date.d_date, t_hour.h_hour", "t_date.d_date AS d_date, t_hour.h_hour AS h_hour"),
+            "day": ("t_date.d_date", "t_date.d_date AS d_date, NULL AS h_hour"),
+            "month": ("DATEFROMPARTS(YEAR(t_date.d_date), MONTH(t_date.d_date), 1)", "DATEFROMPARTS(YEAR(t_date.d_date), MONTH(t_date.d_date), 1) AS d_date, NULL AS h_hour"),
+        }[period]
+        columns = FACT_COLUMNS[compact]
+        return text(f"""
+            SELECT t_postal_area.pa_id AS geo_id, t_postal_area.pa_code AS geo_name, {bucket[1]},
+                MIN(v.v_value) AS v_min, AVG(CAST(v.v_value AS FLOAT)) AS v_avg, MAX(v.v_value) AS v_max,
+                NULL AS v_p25, NULL AS v_p50, NULL AS v_p75, COUNT(*) AS v_count
+            FROM {columns["facts"]} v
+            JOIN t_postal_area ON t_postal_area.{columns["pa_key"]} = v.{columns["pa_key"]}
+            JOIN t_date ON t_date.{columns["d_key"]} = v.{columns["d_key"]}
+            JOIN t_hour ON t_hour.{columns["h_key"]} = v.{columns["h_key"]}
+            JOIN t_component ON t_component.{columns["co_key"]} = v.{columns["co_key"]}
+            {filters.format(geo_column="t_postal_area.pa_id")}
+            GROUP BY t_postal_area.pa_id, t_postal_area.pa_code, {bucket[0]}
+            ORDER BY geo_name, d_date{", h_hour" if period == "hour" else ""};
+        """)
+
+    geo_join = f"JOIN {geo_table} ON {geo_table}.{geo_id} = r.{{prefix}}_geo_id"
+
+    if period == "hour":
+        return text(f"""
+            SELECT r.rh_geo_id AS geo_id, {geo_table}.{geo_name} AS geo_name, t_date.d_date AS d_date, t_hour.h_hour AS h_hour,
+                r.rh_min AS v_min, r.rh_avg AS v_avg, r.rh_max AS v_max,
+                r.rh_p25 AS v_p25, r.rh_p50 AS v_p50, r.rh_p75 AS v_p75, r.rh_count AS v_count
+            FROM t_rollup_hour r
+            {geo_join.format(prefix="rh")}
+            JOIN t_date ON t_date.d_id = r.d_id
+            JOIN t_hour ON t_hour.h_id = r.h_id
+            JOIN t_component ON t_component.co_id = r.co_id
+            {filters.format(geo_column="r.rh_geo_id")}
+              AND r.rh_level = '{level}'
+            ORDER BY geo_name, d_date, h_hour;
+        """)
+
+    if period == "day":
+        return text(f"""
+            SELECT r.rd_geo_id AS geo_id, {geo_table}.{geo_name} AS geo_name, t_date.d_date AS d_date, NULL AS h_hour,
+                r.rd_min AS v_min, r.rd_avg AS v_avg, r.rd_max AS v_max,
+                r.rd_p25 AS v_p25, r.rd_p50 AS v_p50, r.rd_p75 AS v_p75, r.rd_count AS v_count
+            FROM t_rollup_day r
+            {geo_join.format(prefix="rd")}
+            JOIN t_date ON t_date.d_id = r.d_id
+            JOIN t_component ON t_component.co_id = r.co_id
+            {filters.format(geo_column="r.rd_geo_id")}
+              AND r.rd_level = '{level}'
+            ORDER BY geo_name, d_date;
+        """)
+
+    # months are combined from the daily rollup, percentiles are not additive and stay empty
+    return text(f"""
+        SELECT r.rd_geo_id AS geo_id, {geo_table}.{geo_name} AS geo_name,
+            DATEFROMPARTS(YEAR(t_date.d_date), MONTH(t_date.d_date), 1) AS d_date, NULL AS h_hour,
+            MIN(r.rd_min) AS v_min, SUM(r.rd_avg * r.rd_count) / SUM(r.rd_count) AS v_avg, MAX(r.rd_max) AS v_max,
+            NULL AS v_p25, NULL AS v_p50, NULL AS v_p75, SUM(r.rd_count) AS v_count
+        FROM t_rollup_day r
+        {geo_join.format(prefix="rd")}
+        JOIN t_date ON t_date.d_id = r.d_id
+        JOIN t_component ON t_component.co_id = r.co_id
+        {filters.format(geo_column="r.rd_geo_id")}
+          AND r.rd_level = '{level}'
+        GROUP BY r.rd_geo_id, {geo_table}.{geo_name}, DATEFROMPARTS(YEAR(t_date.d_date), MONTH(t_date.d_date), 1)
+        ORDER BY geo_name, d_date;
+    """)
+
+# per storage mode, only the postal area queries read the fact table
+ROLLUP_QUERIES: Dict[Tuple[str, str], Dict[bool, TextClause]] = {
+    (level, period): {compact: _build_query(level, period, compact) for compact in FACT_COLUMNS}
+    for level in GEO_TABLES
+    for period in PERIODS
+}
+
+class RollupManager:
+    def __init__(self, db_connection: Connection, logger: Callable[..., None]):
+        self.db_connection: Connection = db_connection
+        self.logger: Callable[..., None] = logger
+
+    def refresh_date(self, session: Session, d_id: str) -> None:
+        # a date is rebuilt as a whole, late postal areas of the same day are picked up on the next refresh
+        params = {"d_id": d_id}
+        compact = schema_mode.compact(self.db_connection, session)
+        session.execute(DELETE_ROLLUP_HOUR, params)
+        session.execute(REFRESH_ROLLUP_HOUR[compact], params)
+        session.execute(DELETE_ROLLUP_DAY, params)
+        session.execute(REFRESH_ROLLUP_DAY[compact], params)
+
+    def refresh(self, d_ids: Iterable[str]) -> int:
+        refreshed = 0
+        for d_id in d_ids:
+            with self.db_connection.get_session() as session:
+                try:
+                    self.refresh_date(session, d_id)
+                    session.commit()
+                    refreshed += 1
+                except Exception as e:
+                    session.rollback()
+                    self.logger(f"Error refreshing rollups for {d_id}: {e}")
+        return refreshed
+
+    @staticmethod
+    def source(level: str, period: str) -> str:
+        # coarsest stored grain that still answers the request
+        if level == "postal_area":
+            return "t_value"
+        return "t_rollup_hour" if period == "hour" else "t_rollup_day"
+
+    def query(
+        self,
+        component: str,
+        start: date,
+        end: date,
+        level: str = "country",
+        period: str = "day",
+        geo_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        if (level, period) not in ROLLUP_QUERIES:
+            raise ValueError(f"Unsupported rollup: level={level}, period={period}")
+
+        with self.db_connection.get_session() as session:
+            compact = schema_mode.compact(self.db_connection, session)
+            result = session.execute(ROLLUP_QUERIES[(level, period)][compact], {
+                "component": component,
+                "start": start,
+                "end": end,
+                "geo_id": geo_id
+            })
+            return [dict(row._mapping) for row in result]
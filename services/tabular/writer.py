@@ -0,0 +1,117 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from database.connection import Connection
+from services.tabular.parser import TabularRows, FactRow
+from services.tabular.dimensions import DimensionRegistry, dimension_registry
+from services.utils import config
+from services.result_cache import data_generation
+from services.schema_manager import schema_mode
+from typing import List, Optional, Set
+
+CREATE_STAGE = text("""
+    IF OBJECT_ID('tempdb..#t_value_stage') IS NOT NULL DROP TABLE #t_value_stage;
+    CREATE TABLE #t_value_stage (
+        pa_id VARCHAR(32) NOT NULL,
+        d_id VARCHAR(32) NOT NULL,
+        h_id VARCHAR(32) NOT NULL,
+        co_id VARCHAR(32) NOT NULL,
+        v_value DECIMAL(10,8)
+    );
+""")
+
+INSERT_STAGE = text("""
+    INSERT INTO #t_value_stage (pa_id, d_id, h_id, co_id, v_value)
+    VALUES (:pa_id, :d_id, :h_id, :co_id, :v_value)
+""")
+
+# insert-if-not-exists for the whole batch, duplicates inside the batch collapse to one row
+MERGE_STAGE = text("""
+    INSERT INTO t_value (pa_id, d_id, h_id, co_id, v_value)
+    SELECT s.pa_id, s.d_id, s.h_id, s.co_id, MAX(s.v_value)
+    FROM #t_value_stage s
+    WHERE NOT EXISTS (
+        SELECT 1 FROM t_value v WITH (UPDLOCK, HOLDLOCK)
+        WHERE v.pa_id = s.pa_id AND v.d_id = s.d_id AND v.h_id = s.h_id AND v.co_id = s.co_id
+    )
+    GROUP BY s.pa_id, s.d_id, s.h_id, s.co_id;
+""")
+
+# compact mode: the staged md5 ids are swapped for their surrogate keys on the way in
+MERGE_STAGE_COMPACT = text("""
+    INSERT INTO t_value_compact (d_key, pa_key, h_key, co_key, v_value)
+    SELECT t_date.d_key, t_postal_area.pa_key, t_hour.h_key, t_component.co_key, MAX(s.v_value)
+    FROM #t_value_stage s
+    JOIN t_date ON t_date.d_id = s.d_id
+    JOIN t_postal_area ON t_postal_area.pa_id = s.pa_id
+    JOIN t_hour ON t_hour.h_id = s.h_id
+    JOIN t_component ON t_component.co_id = s.co_id
+    WHERE NOT EXISTS (
+        SELECT 1 FROM t_value_compact v WITH (UPDLOCK, HOLDLOCK)
+        WHERE v.d_key = t_date.d_key AND v.pa_key = t_postal_area.pa_key
+          AND v.h_key = t_hour.h_key AND v.co_key = t_component.co_key
+    )
+    GROUP BY t_date.d_key, t_postal_area.pa_key, t_hour.h_key, t_component.co_key;
+""")
+
+DROP_STAGE = text("DROP TABLE #t_value_stage;")
+
+class TabularWriter:
+    def __init__(
+        self,
+        db_connection: Connection,
+        dimensions: Optional[DimensionRegistry] = None,
+        batch_size: Optional[int] = None
+    ):
+        self.db_connection: Connection = db_connection
+        self.dimensions: DimensionRegistry = dimensions or dimension_registry
+        self.batch_size: int = batch_size or config.TRANSFORM_BATCH_SIZE
+        self.rows: TabularRows = TabularRows()
+        self.inserted: int = 0
+        self.touched_dates: Set[str] = set()
+
+    def add(self, rows: TabularRows) -> int:
+        self.rows.extend(rows)
+        if len(self.rows) >= self.batch_size:
+            return self.flush()
+        return 0
+
+    def flush(self) -> int:
+        if self.rows.is_empty():
+            return 0
+
+        rows, self.rows = self.rows, TabularRows()
+        new_dates = self.dimensions.ensure(self.db_connection, rows)
+        with self.db_connection.get_session() as session:
+            for attempt in range(2):
+                try:
+                    inserted = self._insert_facts(session, rows.facts)
+                    session.commit()
+                    break
+                except Exception:
+                    session.rollback()
+                    # t_value may have been migrated to compact by another process since the mode was cached
+                    if attempt or not schema_mode.refresh(session):
+                        raise
+
+        self.inserted += inserted
+        if inserted:
+            # dates that need their rollups rebuilt
+            self.touched_dates.update(rows.dates)
+        if new_dates:
+            data_generation.bump(self.db_connection)
+        return inserted
+
+    def _insert_facts(self, session: Session, facts: List[FactRow]) -> int:
+        if not facts:
+            return 0
+
+        session.execute(CREATE_STAGE)
+        session.execute(INSERT_STAGE, [
+            {"pa_id": pa_id, "d_id": d_id, "h_id": h_id, "co_id": co_id, "v_value": v_value}
+            for pa_id, d_id, h_id, co_id, v_value in facts
+        ])
+        compact = schema_mode.compact(self.db_connection, session)
+        result = session.execute(MERGE_STAGE_COMPACT if compact else MERGE_STAGE)
+        inserted = max(result.rowcount or 0, 0)
+        session.execute(DROP_STAGE)
+        return inserted
@@ -0,0 +1,57 @@
+import gzip
+import json
+from services.json_archive import JsonArchiveReader, JsonArchiveWriter, archive_paths, parse_index_line
+
+def test_identical_payloads_are_stored_once(tmp_path):
+    writer = JsonArchiveWriter(base_dir=str(tmp_path), compresslevel=6)
+    first = writer.append("2026-10-17", "NL", "1011", "a" * 32, '{"price": 1}')
+    second = writer.append("2026-10-17", "NL", "1012", "a" * 32, '{"price": 1}')
+    third = writer.append("2026-10-17", "NL", "1013", "b" * 32, '{"price": 2}')
+    writer.close()
+
+    assert (first.offset, first.length) == (second.offset, second.length)
+    assert third.offset == first.offset + first.length
+
+    reader = JsonArchiveReader(base_dir=str(tmp_path))
+    assert reader.days() == ["2026-10-17"]
+    assert reader.countries("2026-10-17") == ["NL"]
+    assert reader.get("2026-10-17", "NL", "1012") == {"price": 1}
+    assert reader.get("2026-10-17", "NL", "1013") == {"price": 2}
+    assert reader.get("2026-10-17", "NL", "9999") is None
+
+def test_archive_reads_as_plain_jsonl(tmp_path):
+    writer = JsonArchiveWriter(base_dir=str(tmp_path), compresslevel=6)
+    writer.append("2026-10-17", "NL", "1011", "a" * 32, '{"price": 1}')
+    writer.append("2026-10-17", "NL", "1012", "b" * 32, '{"price": 2}')
+    writer.close()
+
+    archive_path, _ = archive_paths(str(tmp_path), "2026-10-17", "NL")
+    with gzip.open(archive_path, "rt", encoding="utf-8") as f:
+        assert [json.loads(line) for line in f] == [{"price": 1}, {"price": 2}]
+
+def test_reopened_writer_keeps_deduplicating(tmp_path):
+    writer = JsonArchiveWriter(base_dir=str(tmp_path), compresslevel=6)
+    first = writer.append("2026-10-17", "NL", "1011", "a" * 32, '{"price": 1}')
+    writer.close()
+    writer = JsonArchiveWriter(base_dir=str(tmp_path), compresslevel=6)
+    again = writer.append("2026-10-17", "NL", "1012", "a" * 32, '{"price": 1}')
+    writer.close()
+    assert again.offset == first.offset
+
+def test_iter_payloads_groups_codes_and_uses_the_latest_fetch(tmp_path):
+    writer = JsonArchiveWriter(base_dir=str(tmp_path), compresslevel=6)
+    writer.append("2026-10-17", "NL", "1011", "a" * 32, '{"price": 1}')
+    writer.append("2026-10-17", "NL", "1012", "a" * 32, '{"price": 1}')
+    writer.append("2026-10-17", "NL", "1013", "b" * 32, '{"price": 2}')
+    # re-fetched, now answers with the second payload
+    writer.append("2026-10-17", "NL", "1011", "b" * 32, '{"price": 2}')
+    writer.close()
+
+    reader = JsonArchiveReader(base_dir=str(tmp_path))
+    payloads = [(pl_id, sorted(pa_codes), payload) for pl_id, pa_codes, payload in reader.iter_payloads("2026-10-17", "NL")]
+    assert payloads == [("a" * 32, ["1012"], '{"price": 1}'), ("b" * 32, ["1011", "1013"], '{"price": 2}')]
+    assert reader.get("2026-10-17", "NL", "1011") == {"price": 2}
+
+def test_parse_index_line_skips_torn_lines():
+    assert parse_index_line("1011\tabc\t0\t42\n").length == 42
+    assert parse_index_line("1011\tabc\t0") is None
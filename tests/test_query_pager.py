@@ -0,0 +1,43 @@
+import pytest
+from services.query_pager import decode_cursor, encode_cursor, is_pageable, page_query
+
+QUERY = "SELECT pa_id FROM t_postal_area ORDER BY pa_id"
+
+@pytest.mark.parametrize("query_text", [
+    QUERY,
+    QUERY + ";",
+    "WITH areas AS (SELECT pa_id FROM t_postal_area) SELECT pa_id FROM areas ORDER BY (pa_id)",
+    "SELECT pa_id, ROW_NUMBER() OVER (ORDER BY pa_id) AS n FROM t_postal_area ORDER BY n DESC",
+])
+def test_trailing_top_level_order_by_is_pageable(query_text):
+    assert is_pageable(query_text)
+
+@pytest.mark.parametrize("query_text", [
+    "SELECT pa_id FROM t_postal_area",
+    "SELECT ROW_NUMBER() OVER (ORDER BY pa_id) FROM t_postal_area",
+    "SELECT * FROM (SELECT pa_id FROM t_postal_area ORDER BY pa_id OFFSET 0 ROWS) x",
+    "WITH areas AS (SELECT TOP 5 pa_id FROM t_postal_area ORDER BY pa_id) SELECT pa_id FROM areas",
+    "SELECT 'order by' FROM t_postal_area",
+    "SELECT pa_id FROM t_postal_area -- ORDER BY pa_id",
+    QUERY + " OFFSET 10 ROWS",
+    QUERY + " FOR JSON PATH",
+    QUERY + " OPTION (RECOMPILE)",
+    "UPDATE t_postal_area SET pa_name = pa_name ORDER BY pa_id",
+])
+def test_other_queries_are_not_pageable(query_text):
+    assert not is_pageable(query_text)
+
+def test_page_query_appends_offset_fetch():
+    assert page_query(QUERY + ";  ", 20, 11) == QUERY + " OFFSET 20 ROWS FETCH NEXT 11 ROWS ONLY;"
+
+def test_cursor_round_trip():
+    assert decode_cursor(QUERY, encode_cursor(QUERY, 500)) == 500
+
+def test_cursor_of_another_query_is_rejected():
+    with pytest.raises(ValueError, match="another query"):
+        decode_cursor(QUERY + " DESC", encode_cursor(QUERY, 500))
+
+@pytest.mark.parametrize("cursor", ["not base64!", "bnVsbA==", "e30=", "ä"])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(QUERY, cursor)
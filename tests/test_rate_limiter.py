@@ -0,0 +1,67 @@
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from services.bot.rate_limiter import RateLimiter
+
+def make_limiter(**settings) -> RateLimiter:
+    defaults = {
+        "name": "test",
+        "initial_rate": 10.0,
+        "min_rate": 1.0,
+        "max_rate": 20.0,
+        "burst": 5.0,
+        "increase": 1.0,
+        "decrease": 0.5,
+        "target_latency": 2.0
+    }
+    return RateLimiter(**{**defaults, **settings})
+
+def test_burst_is_served_without_waiting():
+    limiter = make_limiter()
+    assert [limiter._reserve() for _ in range(5)] == [0.0] * 5
+    assert limiter._reserve() > 0
+
+def test_overload_halves_the_rate_down_to_the_minimum():
+    limiter = make_limiter()
+    limiter.feedback(429, 0.1)
+    assert limiter.rate == 5.0
+    assert limiter.throttled == 1
+    for _ in range(10):
+        limiter.feedback(None, 0.1)
+    assert limiter.rate == 1.0
+
+def test_success_grows_the_rate_up_to_the_maximum():
+    limiter = make_limiter(initial_rate=19.9)
+    limiter.feedback(200, 0.1)
+    assert 19.9 < limiter.rate <= 20.0
+    for _ in range(100):
+        limiter.feedback(200, 0.1)
+    assert limiter.rate == 20.0
+
+def test_slow_responses_back_off_gently():
+    limiter = make_limiter()
+    limiter.feedback(200, 5.0)
+    assert 5.0 < limiter.rate < 10.0
+
+def test_retry_after_blocks_the_limiter():
+    limiter = make_limiter()
+    limiter.feedback(503, 0.1, "30")
+    assert limiter._reserve() > 25
+
+def test_parse_retry_after():
+    assert RateLimiter.parse_retry_after(None) is None
+    assert RateLimiter.parse_retry_after("12") == 12.0
+    assert RateLimiter.parse_retry_after("-3") == 0.0
+    assert RateLimiter.parse_retry_after("soon") is None
+    retry_at = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=60), usegmt=True)
+    assert 50 < RateLimiter.parse_retry_after(retry_at) <= 60
+
+def test_cap_limits_and_restores_the_share():
+    limiter = make_limiter()
+    limiter.cap(2.0)
+    assert (limiter.max_rate, limiter.min_rate, limiter.rate, limiter.burst) == (2.0, 1.0, 2.0, 2.0)
+    limiter.cap(0.5)
+    assert (limiter.min_rate, limiter.burst) == (0.5, 1.0)
+    # a larger share gets the configured bounds back, the rate grows into it
+    limiter.cap(10.0)
+    assert (limiter.max_rate, limiter.min_rate, limiter.burst) == (10.0, 1.0, 5.0)
+    assert limiter.rate == 0.5
@@ -0,0 +1,64 @@
+import asyncio
+import time
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("dotenv")
+
+from services.result_cache import DataGeneration, ResultCache
+
+def make_cache(maxsize: int = 10, ttl: float = 60) -> ResultCache:
+    return ResultCache(generation=DataGeneration(), maxsize=maxsize, ttl=ttl)
+
+def test_get_or_load_caches_until_the_generation_moves():
+    cache = make_cache()
+    calls = []
+    load = lambda: calls.append(1) or len(calls)
+    assert cache.get_or_load("key", load) == 1
+    assert cache.get_or_load("key", load) == 1
+    cache.generation.bump()
+    assert cache.get_or_load("key", load) == 2
+    assert cache.stats()["invalidations"] == 1
+
+def test_a_bump_while_loading_is_served_but_not_kept():
+    cache = make_cache()
+
+    def load():
+        cache.generation.bump()
+        return "stale"
+
+    assert cache.get_or_load("key", load) == "stale"
+    assert cache.get("key") == (False, None)
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    cache = make_cache(ttl=10)
+    now = time.monotonic()
+    cache.put("key", "value")
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+    assert cache.get("key") == (False, None)
+    assert cache.stats()["expirations"] == 1
+
+def test_least_recently_used_entries_are_evicted():
+    cache = make_cache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.stats()["evictions"] == 1
+
+def test_observe_starts_a_generation_when_the_database_marker_moves():
+    generation = DataGeneration()
+    first = generation.observe(7)
+    assert generation.observe(7) == first
+    assert generation.observe(8) == first + 1
+
+def test_get_or_load_async():
+    cache = make_cache()
+
+    async def load():
+        return "value"
+
+    assert asyncio.run(cache.get_or_load_async("key", load)) == "value"
+    assert cache.get("key") == (True, "value")
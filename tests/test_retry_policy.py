@@ -0,0 +1,32 @@
+from services.bot.retry_policy import RetryPolicy
+
+def make_policy() -> RetryPolicy:
+    return RetryPolicy(max_attempts=3, base_delay=2, max_delay=10, budget_ratio=0.1, min_budget=5, status_codes=[429, 503])
+
+def test_from_config_reads_the_retry_policy():
+    policy = RetryPolicy.from_config({"max_attempts": 2, "base_delay": 1, "max_delay": 4, "budget_ratio": 0.5, "min_budget": 1, "status_codes": [500]})
+    assert policy.max_attempts == 2
+    assert policy.status_codes == [500]
+    assert RetryPolicy.from_config().max_attempts > 0
+
+def test_only_transient_failures_are_retried():
+    policy = make_policy()
+    assert policy.is_retryable(None)
+    assert policy.is_retryable(429)
+    assert not policy.is_retryable(404)
+
+def test_attempts_are_limited():
+    policy = make_policy()
+    assert policy.can_retry(2)
+    assert not policy.can_retry(3)
+
+def test_backoff_is_jittered_below_the_exponential_bound():
+    policy = make_policy()
+    for attempts, bound in [(0, 2), (1, 2), (2, 4), (3, 8), (10, 10)]:
+        delays = [policy.backoff(attempts) for _ in range(200)]
+        assert all(0 <= delay <= bound for delay in delays)
+
+def test_budget_scales_with_the_run_and_keeps_a_minimum():
+    policy = make_policy()
+    assert policy.budget(10) == 5
+    assert policy.budget(1000) == 100
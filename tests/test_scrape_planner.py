@@ -0,0 +1,27 @@
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("dotenv")
+
+from services.bot.scrape_planner import class_signature
+from services.utils import config
+
+def payload(power: float, **extra) -> dict:
+    hours = [{"hour": hour, "price": power} for hour in range(24)]
+    return {"energy": {config.DATE_COMPONENTS_CONFIG[0]: hours}, **extra}
+
+def test_payloads_without_hours_have_no_class():
+    assert class_signature({}) is None
+    assert class_signature({"energy": {}}) is None
+    assert class_signature({"energy": {config.DATE_COMPONENTS_CONFIG[0]: []}}) is None
+
+def test_signature_ignores_key_order():
+    first = {"grid": {"fee": 1}, **payload(0.2)}
+    second = {**payload(0.2), "grid": {"fee": 1}}
+    assert class_signature(first) == class_signature(second)
+
+def test_power_price_is_part_of_the_class():
+    assert class_signature(payload(0.2)) != class_signature(payload(0.3))
+
+def test_every_other_component_is_part_of_the_class():
+    assert class_signature(payload(0.2, grid={"fee": 1})) != class_signature(payload(0.2, grid={"fee": 2}))